@@ -0,0 +1,142 @@
+import copy
+import math
+import numpy as np
+import constants
+from amoeba_kernels import cell_neighbors
+from amoeba_rules import AmoebaRules
+from amoeba_state import AmoebaState
+
+
+class AmoebaFork(AmoebaRules):
+    def __init__(self, map_state, bacteria, rng, amoeba_size, metabolism, density, periphery, eatable_bacteria,
+                 player_byte=0, owned=True):
+        """Copy of the engine state, taken while the player decides on a move, that applies the engine rules.
+
+            The board and the bacteria are shared with the parent fork until the first write. The RNG is always
+            cloned, so bacteria spawns in a fork never advance the game RNG.
+
+            A fork alternates between two phases like the engine: it is created, or returned by advance(), waiting for
+            a move, which simulate() tries on a copy and apply() plays in place. After apply() the state waits for
+            advance() to move the bacteria, and simulate() or apply() raise a RuntimeError until it is called.
+
+            Args:
+                map_state (numpy array): int8 board, -1 bacteria, 0 empty, 1 interior and 2 periphery
+                bacteria (numpy array): (N, 2) array of bacteria positions in engine order
+                rng (np.random.Generator): generator of the parent, cloned
+                amoeba_size (int): current size of the amoeba
+                metabolism (float): the percentage of amoeba cells, that can move
+                density (float): density of bacteria on the map
+                periphery (List[Tuple[int, int]]): periphery the pending move is checked against
+                eatable_bacteria (List[Tuple[int, int]]): bacteria eaten before the pending move is applied
+                player_byte (int): info byte of the player
+                owned (bool): False if map_state and bacteria are still shared with the parent
+        """
+        self.map_state = map_state
+        self.bacteria = bacteria
+        self.rng = copy.deepcopy(rng)
+        self.amoeba_size = amoeba_size
+        self.metabolism = metabolism
+        self.density = density
+        self.periphery = periphery
+        self.eatable_bacteria = eatable_bacteria
+        self.player_byte = player_byte
+        self.owned = owned
+        self.move_status = None
+
+    def fork(self):
+        return AmoebaFork(self.map_state, self.bacteria, self.rng, self.amoeba_size, self.metabolism, self.density,
+                          self.periphery, self.eatable_bacteria, self.player_byte, owned=False)
+
+    def simulate(self, retract, move, info=0):
+        """Apply a move to a fork of this state and return the resulting percept, this state is left untouched.
+
+            Args:
+                retract (List[Tuple[int, int]]): cells on the periphery that the amoeba retracts
+                move (List[Tuple[int, int]]): positions the retracted cells move to
+                info (int): info byte returned with the move
+            Returns:
+                AmoebaState: state after the move, as the engine would pass it as last_percept next turn
+        """
+        return self.fork().apply(retract, move, info)
+
+    def apply(self, retract, move, info=0):
+        """Apply a move in place, the outcome of the rule check is stored in move_status."""
+        if self.periphery is None:
+            raise RuntimeError("apply() must be followed by advance()")
+        self.own()
+        self.eat_bacteria(self.eatable_bacteria)
+        self.move_status = self.resolve_action((retract, move, info), self.periphery)
+        self.add_bacteria()
+
+        periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(False)
+        self.periphery, self.eatable_bacteria = None, None
+        return AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells)
+
+    def advance(self):
+        """Move the bacteria after apply() and return the percept for the next decision."""
+        self.own()
+        self.bacteria_move()
+        periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(True)
+        self.periphery, self.eatable_bacteria = periphery, eatable_bacteria
+        return AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells, fork=self.fork)
+
+    def own(self):
+        if not self.owned:
+            self.map_state = np.copy(self.map_state)
+            self.bacteria = np.copy(self.bacteria)
+            self.owned = True
+
+    def eat_bacteria(self, bacteria):
+        if len(bacteria) == 0:
+            return
+
+        eaten = np.array(bacteria).reshape(-1, 2)
+        remaining = ~np.isin(self.bacteria[:, 0] * constants.map_dim + self.bacteria[:, 1],
+                             eaten[:, 0] * constants.map_dim + eaten[:, 1])
+        self.bacteria = self.bacteria[remaining]
+        self.map_state[eaten[:, 0], eaten[:, 1]] = 2
+        self.amoeba_size += len(eaten)
+
+    def add_bacteria(self):
+        # same draw as the engine, np.argwhere lists the empty cells in the order of find_indices
+        new_bacteria = self.rng.choice(np.argwhere(self.map_state == 0), replace=False, size=math.floor(
+            self.density * (constants.total_cells - self.amoeba_size)) - len(self.bacteria))
+        self.bacteria = np.concatenate([self.bacteria, new_bacteria])
+        self.map_state[new_bacteria[:, 0], new_bacteria[:, 1]] = -1
+
+    def check_move(self, retract, move, periphery):
+        if not set(retract).issubset(set(periphery)):
+            return False
+
+        new_periphery = np.array(list(set(periphery).difference(set(retract))), dtype=np.int64).reshape(-1, 2)
+        nbrs = cell_neighbors(new_periphery)
+        candidates = nbrs[self.map_state[nbrs[:, :, 0], nbrs[:, :, 1]] < 1]
+        movable = set(retract).union(map(tuple, candidates.tolist()))
+        if not set(move).issubset(movable):
+            return False
+
+        return self.is_connected(retract, move)
+
+    def flood_connected(self, retract, move):
+        amoeba = self.map_state > 0
+        for i, j in retract:
+            amoeba[i][j] = False
+        for i, j in move:
+            amoeba[i][j] = True
+
+        cells = set(np.flatnonzero(amoeba).tolist())
+        if not cells:
+            return True
+
+        stack = [cells.pop()]
+        while stack:
+            x, y = divmod(stack.pop(), constants.map_dim)
+            for nbr in (x * constants.map_dim + (y - 1) % constants.map_dim,
+                        x * constants.map_dim + (y + 1) % constants.map_dim,
+                        ((x - 1) % constants.map_dim) * constants.map_dim + y,
+                        ((x + 1) % constants.map_dim) * constants.map_dim + y):
+                if nbr in cells:
+                    cells.remove(nbr)
+                    stack.append(nbr)
+
+        return not cells
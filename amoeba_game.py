@@ -1,11 +1,21 @@
 import os
+import json
+import pickle
 import time
+import functools
 import signal
 import numpy as np
 import math
 import matplotlib.pyplot as plt
 from matplotlib import colors
 from amoeba_state import AmoebaState
+from amoeba_rules import AmoebaRules
+from occupancy import OccupancyProfile
+from bacteria_field import BacteriaField
+from amoeba_fork import AmoebaFork
+from stall_detector import StallDetector, stall_reasons
+from invariants import check_board
+from debug_overlay import DebugOverlay, draw_overlays
 import constants
 from utils import *
 from glob import glob
@@ -20,12 +30,23 @@ from players.g7_player import Player as G7_Player
 from players.g8_player import Player as G8_Player
 
 
-class AmoebaGame:
+class AmoebaGame(AmoebaRules):
     def __init__(self, args):
         self.start_time = time.time()
         self.use_gui = not args.no_gui
         self.use_vid = not args.no_vid
         self.do_logging = not args.disable_logging
+        self.use_env_cache = args.env_cache
+        self.checkpoint_path = args.checkpoint
+        self.checkpoint_every = args.checkpoint_every
+        self.allow_fork = args.allow_fork
+        self.stall_detector = StallDetector(args.stall_turns, args.repeat_limit, args.invalid_turns)
+        self.check_invariants = args.check_invariants
+        self.overlay = DebugOverlay(args.debug_overlay)
+        self.overlays = []
+        self.use_bacteria_field = args.bacteria_field
+        self.bacteria_field = None
+        self.invariant_failures = 0
         if not self.use_gui:
             self.use_timeout = not args.disable_timeout
         else:
@@ -77,6 +98,7 @@ class AmoebaGame:
         else:
             self.logger.info("Initialise random number generator with seed {}".format(args.seed))
 
+        self.seed = args.seed
         self.rng = np.random.default_rng(args.seed)
 
         self.player = None
@@ -90,6 +112,8 @@ class AmoebaGame:
         self.turns = 0
         self.max_turns = args.final
         self.game_end = self.max_turns
+        self.outcome = constants.game_max_turns
+        self.move_status = None
         self.density = args.density
         self.bacteria = []
         self.map_state = np.zeros((constants.map_dim, constants.map_dim), dtype=int)
@@ -98,8 +122,12 @@ class AmoebaGame:
         self.player_byte = 0
         self.history = []
 
-        self.initialize(args.size)
-        self.add_player(args.player)
+        if args.resume:
+            self.add_player(args.player)
+            self.load_checkpoint(args.resume)
+        else:
+            self.initialize(args.size)
+            self.add_player(args.player)
         self.play_game()
         self.end_time = time.time()
 
@@ -177,30 +205,151 @@ class AmoebaGame:
         return player_logger
 
     def initialize(self, sl):
-        for i in range(sl):
-            for j in range(sl):
-                if i == 0 or i == (sl - 1) or j == 0 or j == (sl - 1):
-                    self.map_state[50 - (sl // 2) + i][50 - (sl // 2) + j] = 2
-                else:
-                    self.map_state[50 - (sl // 2) + i][50 - (sl // 2) + j] = 1
+        # the cache is only meaningful when the run is reproducible
+        cacheable = self.use_env_cache and self.seed is not None
+        if not (cacheable and self.load_env_cache()):
+            for i in range(sl):
+                for j in range(sl):
+                    if i == 0 or i == (sl - 1) or j == 0 or j == (sl - 1):
+                        self.map_state[50 - (sl // 2) + i][50 - (sl // 2) + j] = 2
+                    else:
+                        self.map_state[50 - (sl // 2) + i][50 - (sl // 2) + j] = 1
 
-        self.bacteria = [tuple(i) for i in self.rng.choice(self.find_indices(0), replace=False, size=math.floor(
-            self.density * (constants.total_cells - self.amoeba_size)))]
+            self.bacteria = [tuple(i) for i in self.rng.choice(self.find_indices(0), replace=False, size=math.floor(
+                self.density * (constants.total_cells - self.amoeba_size)))]
 
-        for i, j in self.bacteria:
-            self.map_state[i][j] = -1
+            for i, j in self.bacteria:
+                self.map_state[i][j] = -1
+
+            if cacheable:
+                self.save_env_cache()
 
         if self.use_gui:
             self.frame_rendering()
         elif self.use_vid:
             self.history.append(self.get_state())
 
+        self.occupancy = OccupancyProfile(self.map_state > 0)
+        if self.use_bacteria_field:
+            self.bacteria_field = BacteriaField(self.bacteria)
         periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(False)
-        self.after_last_move = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells)
+        self.after_last_move = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells,
+                                           occupancy=self.occupancy.copy())
+
+    def get_env_cache_path(self):
+        return os.path.join("precomp", "env", "s{}_A{}_d{}.npz".format(self.seed, self.start_size, self.density))
+
+    def load_env_cache(self):
+        """Load the initial board, bacteria and the RNG state right after the initial bacteria draw.
+
+            Returns:
+                bool: True if a cache entry for (seed, A, d) was found and loaded
+        """
+        cache_path = self.get_env_cache_path()
+        if not os.path.isfile(cache_path):
+            return False
 
-    def find_indices(self, value):
-        result = np.where(self.map_state == value)
-        return list(zip(result[0], result[1]))
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache['map_dim']) != constants.map_dim:
+                return False
+            self.map_state = cache['map_state'].astype(int)
+            self.bacteria = [tuple(i) for i in cache['bacteria']]
+            self.rng.bit_generator.state = json.loads(str(cache['rng_state']))
+
+        self.logger.info("Loaded initial environment from {}".format(cache_path))
+        return True
+
+    def save_env_cache(self):
+        cache_path = self.get_env_cache_path()
+        save_npz_atomic(cache_path,
+                        map_dim=constants.map_dim,
+                        map_state=self.map_state.astype(np.int8),
+                        bacteria=np.array(self.bacteria, dtype=np.int64).reshape(-1, 2),
+                        rng_state=json.dumps(self.rng.bit_generator.state))
+
+        self.logger.info("Saved initial environment to {}".format(cache_path))
+
+    def save_checkpoint(self, path):
+        """Snapshot the full game state at the end of the current turn.
+
+            The RNG and the player are pickled together, so a player holding a reference to the game RNG still
+            shares it after a resume. The stall detector counters are saved too, so a resumed game ends on a stall at
+            the same turn as an uninterrupted one.
+        """
+        try:
+            player_state = pickle.dumps((self.rng, self.player))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            player_state = b""
+            self.logger.error("Could not pickle {}, checkpoint will restart the player: {}".format(self.player_name, e))
+
+        save_npz_atomic(path,
+                        map_dim=constants.map_dim,
+                        params=np.array([self.metabolism, self.start_size, self.density]),
+                        player_name=self.player_name,
+                        turns=self.turns,
+                        amoeba_size=self.amoeba_size,
+                        player_byte=self.player_byte,
+                        map_state=self.map_state.astype(np.int8),
+                        bacteria=np.array(self.bacteria, dtype=np.int64).reshape(-1, 2),
+                        rng_state=json.dumps(self.rng.bit_generator.state),
+                        stall_state=json.dumps(self.stall_detector.get_state()),
+                        player_state=np.frombuffer(player_state, dtype=np.uint8))
+
+        self.logger.info("Saved checkpoint of turn {} to {}".format(self.turns, path))
+
+    def load_checkpoint(self, path):
+        """Restore a game saved by save_checkpoint.
+
+            Resuming with a different player than the one that was checkpointed keeps the board and the RNG state
+            but starts the new player fresh, which allows forking one mid-game state into several variants. The stall
+            detector continues from the saved counters, a checkpoint saved without them restarts it from zero.
+        """
+        with np.load(path, allow_pickle=False) as checkpoint:
+            if int(checkpoint['map_dim']) != constants.map_dim:
+                raise ValueError("Checkpoint {} was saved for a different map size".format(path))
+            if not np.allclose(checkpoint['params'], [self.metabolism, self.start_size, self.density]):
+                raise ValueError("Checkpoint {} was saved with m, A, d = {}".format(path, checkpoint['params']))
+
+            self.turns = int(checkpoint['turns'])
+            if self.turns >= self.max_turns:
+                raise ValueError("Checkpoint {} was saved at turn {}, the game ends after turn {}".format(
+                    path, self.turns, self.max_turns))
+            self.amoeba_size = int(checkpoint['amoeba_size'])
+            self.player_byte = int(checkpoint['player_byte'])
+            self.map_state = checkpoint['map_state'].astype(int)
+            self.bacteria = [tuple(i) for i in checkpoint['bacteria']]
+            player_name = str(checkpoint['player_name'])
+            player_state = checkpoint['player_state'].tobytes()
+            rng_state = json.loads(str(checkpoint['rng_state']))
+            stall_state = json.loads(str(checkpoint['stall_state'])) if 'stall_state' in checkpoint else None
+
+        if player_name == self.player_name and player_state:
+            self.rng, self.player = pickle.loads(player_state)
+        else:
+            # the info byte belongs to the checkpointed player, a fresh player starts from an empty byte
+            self.player_byte = 0
+            self.rng.bit_generator.state = rng_state
+            self.logger.info("Starting {} fresh from the checkpoint of {}".format(self.player_name, player_name))
+
+        if stall_state is not None:
+            self.stall_detector.set_state(stall_state)
+        else:
+            self.stall_detector = StallDetector(self.stall_detector.stall_turns, self.stall_detector.repeat_limit,
+                                                self.stall_detector.invalid_turns)
+
+        self.logger.info("Resumed from checkpoint {} at turn {}".format(path, self.turns))
+
+        if self.use_gui:
+            self.frame_rendering()
+        elif self.use_vid:
+            self.history.append(self.get_state())
+
+        self.occupancy = OccupancyProfile(self.map_state > 0)
+        if self.use_bacteria_field:
+            self.bacteria_field = BacteriaField(self.bacteria)
+        periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(False)
+        self.after_last_move = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells,
+                                           occupancy=self.occupancy.copy())
 
     def play_game(self):
         while self.turns != self.max_turns:
@@ -210,38 +359,67 @@ class AmoebaGame:
             if self.amoeba_size >= self.goal_size:
                 self.goal_reached = True
                 self.game_end = self.turns
+                self.outcome = constants.game_goal_reached
                 print("Goal size achieved!\n\nTurns taken: {}\nFinal size: {}\nGoal size: {}".format(self.turns,
                                                                                                      self.amoeba_size,
                                                                                                      self.goal_size))
                 break
+            if self.stall_detector.enabled():
+                stall = self.stall_detector.update(self.amoeba_size, self.map_state, self.move_status)
+                if stall is not None:
+                    self.game_end = self.turns
+                    self.outcome = stall
+                    print("Game stalled: {}".format(stall_reasons[stall]))
+                    self.logger.info("Game ended early at turn {}: {}".format(self.turns, stall_reasons[stall]))
+                    break
+            # saved once the stall detector has seen the turn, a game that ended this turn is not saved
+            if self.checkpoint_every and self.turns % self.checkpoint_every == 0:
+                self.save_checkpoint(self.checkpoint_path)
 
         if not self.goal_reached:
             print("Goal size not achieved...\n\nFinal size: {}\nGoal size: {}".format(self.amoeba_size, self.goal_size))
+        if self.check_invariants:
+            self.logger.info("Invariants checked every {} turns, {} broken".format(self.check_invariants,
+                                                                            self.invariant_failures))
 
     def play_turn(self):
         self.bacteria_move()
         periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(True)
-        before_state = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells)
+        sampled = self.check_invariants and self.turns % self.check_invariants == 0
+        if sampled:
+            self.verify_invariants("before the move", edited=True)
+        before_state = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells,
+                                   overlay=self.overlay, occupancy=self.occupancy.copy())
+        if self.bacteria_field:
+            before_state.bacteria_field = self.bacteria_field.copy()
+        if self.allow_fork:
+            before_state.fork = functools.partial(self.fork, periphery, eatable_bacteria)
         returned_action = self.player.move(
             last_percept=self.after_last_move,
             current_percept=before_state,
             info=self.player_byte
         )
+        self.overlays = self.overlay.flush()
         self.eat_bacteria(eatable_bacteria)
-        if self.check_action(returned_action):
-            retract, move, self.player_byte = returned_action
-            if self.check_move(retract, move, periphery):
-                print("Move Accepted!")
-                self.logger.debug("Received move from {}".format(self.player_name))
-                self.amoeba_move(retract, move)
-            else:
-                print("Valid move, but causes separation, hence cancelled.")
-                self.logger.info("Invalid move from {} as it does not follow the rules".format(self.player_name))
+        move_status = self.resolve_action(returned_action, periphery)
+        self.move_status = move_status
+        if move_status == constants.move_accepted:
+            print("Move Accepted!")
+            self.logger.debug("Received move from {}".format(self.player_name))
+        elif move_status == constants.move_separated:
+            print("Valid move, but causes separation, hence cancelled.")
+            self.logger.info("Invalid move from {} as it does not follow the rules".format(self.player_name))
         else:
             print("Invalid move")
             self.logger.info("Invalid move from {} as it doesn't follow the return format".format(self.player_name))
 
+        info_fields = self.decode_player_byte()
+        if info_fields:
+            self.logger.debug("Info byte from {}: {} {}".format(self.player_name, self.player_byte, info_fields))
+
         self.add_bacteria()
+        if sampled:
+            self.verify_invariants("after the move", density=self.density)
 
         if self.use_gui:
             self.frame_rendering()
@@ -249,191 +427,68 @@ class AmoebaGame:
             self.history.append(self.get_state())
 
         periphery, eatable_bacteria, movable_cells, amoeba = self.get_periphery_info(False)
-        self.after_last_move = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells)
+        self.after_last_move = AmoebaState(self.amoeba_size, amoeba, periphery, eatable_bacteria, movable_cells,
+                                           occupancy=self.occupancy.copy())
 
     def bacteria_move(self):
-        for i, (x, y) in enumerate(self.bacteria):
-            avail = {'up': self.map_state[x][(y - 1) % constants.map_dim] == 0,
-                     'down': self.map_state[x][(y + 1) % constants.map_dim] == 0,
-                     'left': self.map_state[(x - 1) % constants.map_dim][y] == 0,
-                     'right': self.map_state[(x + 1) % constants.map_dim][y] == 0}
-            free_cells = [i for i in list(avail.keys()) if avail[i]]
-            move = None
-            if len(free_cells) == 2:
-                move = self.rng.choice(free_cells, replace=False)
-            elif len(free_cells) == 3:
-                if 'up' in free_cells and 'down' in free_cells:
-                    move = free_cells[-1]
-                else:
-                    move = free_cells[0]
-
-            if move:
-                self.map_state[x][y] = 0
-                if move == 'up':
-                    y = (y - 1) % constants.map_dim
-                elif move == 'down':
-                    y = (y + 1) % constants.map_dim
-                elif move == 'left':
-                    x = (x - 1) % constants.map_dim
-                else:
-                    x = (x + 1) % constants.map_dim
-
-                self.map_state[x][y] = -1
-                self.bacteria[i] = (x, y)
-
-    def get_periphery_info(self, edit):
-        periphery = self.find_indices(2)
-        eatable_bacteria = []
-        movable_cells = []
-        rem_idx = []
-        for i, j in periphery:
-            nbr = self.find_movable_neighbor(i, j)
-            rem = True
-            for x, y in nbr:
-                if (x, y) not in eatable_bacteria and (x, y) not in movable_cells:
-                    if self.map_state[x][y] == -1:
-                        eatable_bacteria.append((x, y))
-                    else:
-                        rem = False
-                        movable_cells.append((x, y))
-                elif self.map_state[x][y] == 0:
-                    rem = False
-
-            if rem and edit:
-                self.map_state[i][j] = 1
-                rem_idx.append((i, j))
-
-        periphery = list(set(periphery).difference(set(rem_idx)))
-
-        amoeba = np.copy(self.map_state)
-        amoeba[amoeba < 0] = 0
-        amoeba[amoeba > 0] = 1
-
-        return periphery, eatable_bacteria, movable_cells, amoeba
-
-    def find_movable_neighbor(self, x, y):
-        out = []
-        if self.map_state[x][(y - 1) % constants.map_dim] < 1:
-            out.append((x, (y - 1) % constants.map_dim))
-        if self.map_state[x][(y + 1) % constants.map_dim] < 1:
-            out.append((x, (y + 1) % constants.map_dim))
-        if self.map_state[(x - 1) % constants.map_dim][y] < 1:
-            out.append(((x - 1) % constants.map_dim, y))
-        if self.map_state[(x + 1) % constants.map_dim][y] < 1:
-            out.append(((x + 1) % constants.map_dim, y))
-
-        return out
-
-    def find_neighbor(self, x, y, val):
-        out = []
-        if self.map_state[x][(y - 1) % constants.map_dim] == val:
-            out.append((x, (y - 1) % constants.map_dim))
-        if self.map_state[x][(y + 1) % constants.map_dim] == val:
-            out.append((x, (y + 1) % constants.map_dim))
-        if self.map_state[(x - 1) % constants.map_dim][y] == val:
-            out.append(((x - 1) % constants.map_dim, y))
-        if self.map_state[(x + 1) % constants.map_dim][y] == val:
-            out.append(((x + 1) % constants.map_dim, y))
-
-        return out
+        if not self.bacteria_field:
+            return super().bacteria_move()
+        before = list(self.bacteria)
+        super().bacteria_move()
+        for old, new in zip(before, self.bacteria):
+            if old != new:
+                self.bacteria_field.move(old, new)
 
     def eat_bacteria(self, bacteria):
-        for i, j in bacteria:
-            self.bacteria.remove((i, j))
-            self.map_state[i][j] = 2
-            self.amoeba_size += 1
+        super().eat_bacteria(bacteria)
+        self.occupancy.update(added=bacteria)
+        if self.bacteria_field:
+            self.bacteria_field.remove(bacteria)
 
-    def check_action(self, action):
-        if not action:
-            return False
-        if type(action) is not tuple:
-            return False
-        if len(action) != 3:
-            return False
-        if type(action[2]) is not int:
-            return False
-        if action[2] < 0 or action[2] >= 256:
-            return False
-        if type(action[0]) is not list or type(action[1]) is not list:
-            return False
-        if len(action[0]) != len(set(action[0])) or len(action[1]) != len(set(action[1])):
-            return False
-        if len(action[0]) != len(action[1]) or len(action[0]) > math.ceil(self.metabolism * self.amoeba_size):
-            return False
-
-        return True
-
-    def check_move(self, retract, move, periphery):
-        if not set(retract).issubset(set(periphery)):
-            return False
-
-        movable = retract[:]
-        new_periphery = list(set(periphery).difference(set(retract)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
-
-        if not set(move).issubset(set(movable)):
-            return False
-
-        amoeba = np.copy(self.map_state)
-        amoeba[amoeba < 0] = 0
-        amoeba[amoeba > 0] = 1
-
-        for i, j in retract:
-            amoeba[i][j] = 0
-
-        for i, j in move:
-            amoeba[i][j] = 1
-
-        tmp = np.where(amoeba == 1)
-        result = list(zip(tmp[0], tmp[1]))
-        check = np.zeros((constants.map_dim, constants.map_dim), dtype=int)
-
-        stack = result[0:1]
-        while len(stack):
-            a, b = stack.pop()
-            check[a][b] = 1
-
-            if (a, (b - 1) % constants.map_dim) in result and check[a][(b - 1) % constants.map_dim] == 0:
-                stack.append((a, (b - 1) % constants.map_dim))
-            if (a, (b + 1) % constants.map_dim) in result and check[a][(b + 1) % constants.map_dim] == 0:
-                stack.append((a, (b + 1) % constants.map_dim))
-            if ((a - 1) % constants.map_dim, b) in result and check[(a - 1) % constants.map_dim][b] == 0:
-                stack.append(((a - 1) % constants.map_dim, b))
-            if ((a + 1) % constants.map_dim, b) in result and check[(a + 1) % constants.map_dim][b] == 0:
-                stack.append(((a + 1) % constants.map_dim, b))
-
-        return (amoeba == check).all()
+    def add_bacteria(self):
+        spawned = len(self.bacteria)
+        super().add_bacteria()
+        if self.bacteria_field:
+            self.bacteria_field.add(self.bacteria[spawned:])
 
     def amoeba_move(self, retract, move):
-        for i, j in retract:
-            self.map_state[i][j] = 0
-            nbr = self.find_neighbor(i, j, 1)
-            for x, y in nbr:
-                self.map_state[x][y] = 2
-
-        for i, j in move:
-            self.map_state[i][j] = 2
-            nbr = self.find_neighbor(i, j, 2)
-            for x, y in nbr:
-                if len(self.find_movable_neighbor(x, y)) == 0:
-                    self.map_state[x][y] = 1
-
-    def add_bacteria(self):
-        new_bacteria = [tuple(i) for i in self.rng.choice(self.find_indices(0), replace=False, size=math.floor(
-            self.density * (constants.total_cells - self.amoeba_size)) - len(self.bacteria))]
-        self.bacteria += new_bacteria
-        for i, j in new_bacteria:
-            self.map_state[i][j] = -1
+        super().amoeba_move(retract, move)
+        self.occupancy.update(removed=retract, added=move)
+
+    def verify_invariants(self, when, **kwargs):
+        """Log every broken board invariant, see invariants.check_board for the arguments."""
+        problems = check_board(self.map_state, self.bacteria, self.amoeba_size, **kwargs)
+        if not np.array_equal(self.occupancy.occupied, self.map_state > 0):
+            problems.append("occupancy profile does not match the amoeba")
+        if self.bacteria_field and not np.array_equal(self.bacteria_field.counts,
+                                                      BacteriaField(self.bacteria).counts):
+            problems.append("bacteria field does not match the bacteria")
+        for problem in problems:
+            print("Invariant broken at turn {} {}: {}".format(self.turns, when, problem))
+            self.logger.error("Invariant broken at turn {} {}: {}".format(self.turns, when, problem))
+        self.invariant_failures += len(problems)
+
+    def fork(self, periphery, eatable_bacteria):
+        """Copy the engine state at the point where the player is asked to move, see AmoebaFork."""
+        return AmoebaFork(self.map_state.astype(np.int8), np.array(self.bacteria, dtype=np.int64).reshape(-1, 2),
+                          self.rng, self.amoeba_size, self.metabolism, self.density, periphery, eatable_bacteria,
+                          self.player_byte)
+
+    def decode_player_byte(self):
+        """Fields of the info byte by name if the player declares an info_codec, an empty dict otherwise."""
+        codec = getattr(self.player, "info_codec", None)
+        if codec is None:
+            return {}
+        return codec.decode(self.player_byte)
 
     def get_state(self):
         return_dict = dict()
         return_dict['amoeba_size'] = self.amoeba_size
         return_dict['bacteria'] = self.bacteria[:]
         return_dict['map_state'] = np.copy(self.map_state)
+        return_dict['info'] = self.player_byte
+        return_dict['info_fields'] = self.decode_player_byte()
+        return_dict['overlays'] = self.overlays
         return return_dict
 
     def frame_rendering(self):
@@ -473,6 +528,7 @@ class AmoebaGame:
         ax.set_xlim([0, 100])
         ax.set_ylim([0, 100])
         ax.invert_yaxis()
+        draw_overlays(ax, self.overlays)
 
         msg = "In progress..."
         if self.amoeba_size >= self.goal_size:
@@ -538,6 +594,7 @@ class AmoebaGame:
             ax.set_xlim([0, 100])
             ax.set_ylim([0, 100])
             ax.invert_yaxis()
+            draw_overlays(ax, state.get('overlays', []))
 
             msg = "In progress..."
             if state['amoeba_size'] >= self.goal_size:
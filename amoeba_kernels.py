@@ -0,0 +1,97 @@
+import numpy as np
+import constants
+
+# neighbor order of find_movable_neighbor: up, down, left, right
+STEP_X = np.array([0, 0, -1, 1])
+STEP_Y = np.array([-1, 1, 0, 0])
+
+
+def neighbor_values(board):
+    """(4, ...) array with the value of the up, down, left and right neighbor of every cell on the torus.
+
+        Works on a single (H, W) board as well as on a (G, H, W) batch of boards.
+    """
+    return np.stack([np.roll(board, 1, axis=-1), np.roll(board, -1, axis=-1),
+                     np.roll(board, 1, axis=-2), np.roll(board, -1, axis=-2)])
+
+
+def any_neighbor(mask):
+    """True where at least one of the four neighbors is set."""
+    return (np.roll(mask, 1, axis=-1) | np.roll(mask, -1, axis=-1) |
+            np.roll(mask, 1, axis=-2) | np.roll(mask, -1, axis=-2))
+
+
+def neighbor_count(mask):
+    """Number of set neighbors of every cell."""
+    mask = mask.astype(np.int8)
+    return (np.roll(mask, 1, axis=-1) + np.roll(mask, -1, axis=-1) +
+            np.roll(mask, 1, axis=-2) + np.roll(mask, -1, axis=-2))
+
+
+def exposure(amoeba_map, empty=0):
+    """Number of empty neighbors of every cell, as G4 scores retract candidates."""
+    return neighbor_count(amoeba_map == empty)
+
+
+def periphery_mask(amoeba):
+    """Amoeba cells with at least one neighbor outside the amoeba."""
+    amoeba = amoeba > 0
+    return amoeba & any_neighbor(~amoeba)
+
+
+def movable_mask(map_state):
+    """Cells that are not amoeba and border the periphery (2) of an engine map, bacteria included."""
+    return (map_state < 1) & any_neighbor(map_state == 2)
+
+
+def cell_neighbors(cells):
+    """(N, 4, 2) array of the neighbors of an (N, 2) array of cells in the order up, down, left, right."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    x, y = cells[:, 0:1], cells[:, 1:2]
+    return np.stack([(x + STEP_X) % constants.map_dim, (y + STEP_Y) % constants.map_dim], axis=2)
+
+
+def free_neighbors(cells, free):
+    """Neighbors of cells where the boolean map free is set, possibly repeated."""
+    nbrs = cell_neighbors(cells)
+    nbrs = nbrs[free[nbrs[:, :, 0], nbrs[:, :, 1]]]
+    return list(map(tuple, nbrs.tolist()))
+
+
+def cells_of(mask):
+    """Cells of a boolean map as a list of tuples in row-major order."""
+    return list(map(tuple, np.argwhere(mask).tolist()))
+
+
+def periphery_info(map_state, edit):
+    """Vectorized AmoebaRules.get_periphery_info, the lists come out in the same order as the scalar loop.
+
+        Args:
+            map_state (numpy array): engine map, updated in place if edit is True
+            edit (bool): turn periphery cells without an empty neighbor into interior cells
+        Returns:
+            Tuple[List, List, List, numpy array]: periphery, eatable bacteria, movable cells and the amoeba map
+    """
+    cells = np.argwhere(map_state == 2)
+    nbrs = cell_neighbors(cells)
+    values = map_state[nbrs[:, :, 0], nbrs[:, :, 1]]
+
+    # movable neighbors in the order they are first visited while scanning the periphery
+    candidates = nbrs[values < 1]
+    _, first = np.unique(candidates[:, 0] * constants.map_dim + candidates[:, 1], return_index=True)
+    candidates = candidates[np.sort(first)]
+    is_bacteria = map_state[candidates[:, 0], candidates[:, 1]] == -1
+    eatable_bacteria = list(map(tuple, candidates[is_bacteria].tolist()))
+    movable_cells = list(map(tuple, candidates[~is_bacteria].tolist()))
+
+    periphery = list(map(tuple, cells.tolist()))
+    rem_idx = []
+    if edit:
+        rem = ~(values == 0).any(axis=1)
+        map_state[cells[rem, 0], cells[rem, 1]] = 1
+        rem_idx = list(map(tuple, cells[rem].tolist()))
+    periphery = list(set(periphery).difference(set(rem_idx)))
+
+    amoeba = (map_state > 0).astype(int)
+
+    return periphery, eatable_bacteria, movable_cells, amoeba
@@ -0,0 +1,218 @@
+import math
+import numpy as np
+import constants
+from amoeba_kernels import periphery_info
+from connectivity import NEIGHBORS, sources_connected
+
+
+class AmoebaRules:
+    """Game rules shared by the engine and its forks.
+
+        Subclasses provide map_state, bacteria, rng, amoeba_size, metabolism and density.
+    """
+
+    # cells is_connected searches around a move before it falls back to flood filling the board
+    local_search_limit = 1000
+
+    def resolve_action(self, action, periphery):
+        """Validate a player action and apply it if it follows the rules.
+
+            Returns:
+                int: constants.move_accepted, constants.move_separated or constants.move_malformed
+        """
+        if not self.check_action(action):
+            return constants.move_malformed
+
+        retract, move, self.player_byte = action
+        if not self.check_move(retract, move, periphery):
+            return constants.move_separated
+
+        self.amoeba_move(retract, move)
+        return constants.move_accepted
+
+    def find_indices(self, value):
+        result = np.where(self.map_state == value)
+        return list(zip(result[0], result[1]))
+
+    def bacteria_move(self):
+        for i, (x, y) in enumerate(self.bacteria):
+            avail = {'up': self.map_state[x][(y - 1) % constants.map_dim] == 0,
+                     'down': self.map_state[x][(y + 1) % constants.map_dim] == 0,
+                     'left': self.map_state[(x - 1) % constants.map_dim][y] == 0,
+                     'right': self.map_state[(x + 1) % constants.map_dim][y] == 0}
+            free_cells = [i for i in list(avail.keys()) if avail[i]]
+            move = None
+            if len(free_cells) == 2:
+                move = self.rng.choice(free_cells, replace=False)
+            elif len(free_cells) == 3:
+                if 'up' in free_cells and 'down' in free_cells:
+                    move = free_cells[-1]
+                else:
+                    move = free_cells[0]
+
+            if move:
+                self.map_state[x][y] = 0
+                if move == 'up':
+                    y = (y - 1) % constants.map_dim
+                elif move == 'down':
+                    y = (y + 1) % constants.map_dim
+                elif move == 'left':
+                    x = (x - 1) % constants.map_dim
+                else:
+                    x = (x + 1) % constants.map_dim
+
+                self.map_state[x][y] = -1
+                self.bacteria[i] = (x, y)
+
+    def get_periphery_info(self, edit):
+        return periphery_info(self.map_state, edit)
+
+    def find_movable_neighbor(self, x, y):
+        out = []
+        if self.map_state[x][(y - 1) % constants.map_dim] < 1:
+            out.append((x, (y - 1) % constants.map_dim))
+        if self.map_state[x][(y + 1) % constants.map_dim] < 1:
+            out.append((x, (y + 1) % constants.map_dim))
+        if self.map_state[(x - 1) % constants.map_dim][y] < 1:
+            out.append(((x - 1) % constants.map_dim, y))
+        if self.map_state[(x + 1) % constants.map_dim][y] < 1:
+            out.append(((x + 1) % constants.map_dim, y))
+
+        return out
+
+    def find_neighbor(self, x, y, val):
+        out = []
+        if self.map_state[x][(y - 1) % constants.map_dim] == val:
+            out.append((x, (y - 1) % constants.map_dim))
+        if self.map_state[x][(y + 1) % constants.map_dim] == val:
+            out.append((x, (y + 1) % constants.map_dim))
+        if self.map_state[(x - 1) % constants.map_dim][y] == val:
+            out.append(((x - 1) % constants.map_dim, y))
+        if self.map_state[(x + 1) % constants.map_dim][y] == val:
+            out.append(((x + 1) % constants.map_dim, y))
+
+        return out
+
+    def eat_bacteria(self, bacteria):
+        for i, j in bacteria:
+            self.bacteria.remove((i, j))
+            self.map_state[i][j] = 2
+            self.amoeba_size += 1
+
+    def check_action(self, action):
+        if not action:
+            return False
+        if type(action) is not tuple:
+            return False
+        if len(action) != 3:
+            return False
+        if type(action[2]) is not int:
+            return False
+        if action[2] < 0 or action[2] >= 256:
+            return False
+        if type(action[0]) is not list or type(action[1]) is not list:
+            return False
+        if len(action[0]) != len(set(action[0])) or len(action[1]) != len(set(action[1])):
+            return False
+        if len(action[0]) != len(action[1]) or len(action[0]) > math.ceil(self.metabolism * self.amoeba_size):
+            return False
+
+        return True
+
+    def check_move(self, retract, move, periphery):
+        if not set(retract).issubset(set(periphery)):
+            return False
+
+        movable = set(retract)
+        new_periphery = list(set(periphery).difference(set(retract)))
+        for i, j in new_periphery:
+            movable.update(self.find_movable_neighbor(i, j))
+
+        if not set(move).issubset(movable):
+            return False
+
+        return self.is_connected(retract, move)
+
+    def is_connected(self, retract, move):
+        """True if the amoeba is connected after retracting retract and extending to move.
+
+            The rules keep the amoeba on the board connected, so every cell that stays reaches a neighbor of a
+            retracted cell without crossing a retracted cell. It is therefore enough that those neighbors and the
+            extended cells end up in one component. That is searched for around the changed cells first, the
+            whole board is only flood filled when the search visits local_search_limit cells without an answer.
+        """
+        dim = constants.map_dim
+        occupied = (self.map_state > 0).tobytes()
+        removed = {x * dim + y for x, y in retract if occupied[x * dim + y]}
+        added = {x * dim + y for x, y in move}
+
+        def inside(cell):
+            return cell in added or (occupied[cell] and cell not in removed)
+
+        sources = set(added)
+        for cell in removed:
+            sources.update(nbr for nbr in NEIGHBORS[cell] if inside(nbr))
+        if not removed and added:
+            # nothing leaves the amoeba, it takes part through one of its cells next to an extended cell
+            anchor = next((nbr for cell in added for nbr in NEIGHBORS[cell] if nbr not in added and occupied[nbr]),
+                          None)
+            if anchor is None:
+                return self.flood_connected(retract, move)
+            sources.add(anchor)
+
+        connected = sources_connected(sources, inside, self.local_search_limit)
+        if connected is None:
+            return self.flood_connected(retract, move)
+        return connected
+
+    def flood_connected(self, retract, move):
+        amoeba = np.copy(self.map_state)
+        amoeba[amoeba < 0] = 0
+        amoeba[amoeba > 0] = 1
+
+        for i, j in retract:
+            amoeba[i][j] = 0
+
+        for i, j in move:
+            amoeba[i][j] = 1
+
+        tmp = np.where(amoeba == 1)
+        result = list(zip(tmp[0], tmp[1]))
+        check = np.zeros((constants.map_dim, constants.map_dim), dtype=int)
+
+        stack = result[0:1]
+        while len(stack):
+            a, b = stack.pop()
+            check[a][b] = 1
+
+            if (a, (b - 1) % constants.map_dim) in result and check[a][(b - 1) % constants.map_dim] == 0:
+                stack.append((a, (b - 1) % constants.map_dim))
+            if (a, (b + 1) % constants.map_dim) in result and check[a][(b + 1) % constants.map_dim] == 0:
+                stack.append((a, (b + 1) % constants.map_dim))
+            if ((a - 1) % constants.map_dim, b) in result and check[(a - 1) % constants.map_dim][b] == 0:
+                stack.append(((a - 1) % constants.map_dim, b))
+            if ((a + 1) % constants.map_dim, b) in result and check[(a + 1) % constants.map_dim][b] == 0:
+                stack.append(((a + 1) % constants.map_dim, b))
+
+        return (amoeba == check).all()
+
+    def amoeba_move(self, retract, move):
+        for i, j in retract:
+            self.map_state[i][j] = 0
+            nbr = self.find_neighbor(i, j, 1)
+            for x, y in nbr:
+                self.map_state[x][y] = 2
+
+        for i, j in move:
+            self.map_state[i][j] = 2
+            nbr = self.find_neighbor(i, j, 2)
+            for x, y in nbr:
+                if len(self.find_movable_neighbor(x, y)) == 0:
+                    self.map_state[x][y] = 1
+
+    def add_bacteria(self):
+        new_bacteria = [tuple(i) for i in self.rng.choice(self.find_indices(0), replace=False, size=math.floor(
+            self.density * (constants.total_cells - self.amoeba_size)) - len(self.bacteria))]
+        self.bacteria += new_bacteria
+        for i, j in new_bacteria:
+            self.map_state[i][j] = -1
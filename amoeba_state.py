@@ -1,5 +1,14 @@
+import numpy as np
+import torus
+from connectivity import ConnectivityOracle
+from debug_overlay import DISABLED
+from occupancy import OccupancyProfile
+from move_candidates import MoveCandidates
+
+
 class AmoebaState:
-    def __init__(self, current_size, amoeba_map, periphery, bacteria, movable_cells):
+    def __init__(self, current_size, amoeba_map, periphery, bacteria, movable_cells, fork=None, overlay=None,
+                 occupancy=None, bacteria_field=None):
         """
             Args:
                 current_size (int): current size of the amoeba
@@ -7,9 +16,75 @@ class AmoebaState:
                 periphery (List[Tuple[int, int]]: list of cells on the periphery of the amoeba
                 bacteria (List[Tuple[int, int]]: list of bacteria known to the amoeba
                 movable_cells (List[Tuple[int, int]]: list of movable positions given the current amoeba state
+                fork (Callable[[], AmoebaFork], optional): returns a copy of the engine state for lookahead search,
+                    only set on the current percept when the game runs with --allow_fork
+                overlay (DebugOverlay, optional): debug overlays of the current turn, pushes are dropped unless the
+                    game runs with --debug_overlay
+                occupancy (OccupancyProfile, optional): per-column and per-row occupancy of the amoeba, built from
+                    amoeba_map on first use when not given
+                bacteria_field (BacteriaField, optional): bacteria density grid and nearest bacteria query of the
+                    whole board, only set on the current percept when the game runs with --bacteria_field
         """
         self.current_size = current_size
         self.amoeba_map = amoeba_map
         self.periphery = periphery
         self.bacteria = bacteria
         self.movable_cells = movable_cells
+        self.fork = fork
+        self.overlay = overlay if overlay is not None else DISABLED
+        self._occupancy = occupancy
+        self.bacteria_field = bacteria_field
+        self._centroid = None
+        self._candidates = None
+        self._map_state = None
+        self._oracle = None
+
+    @property
+    def occupancy(self):
+        if self._occupancy is None:
+            self._occupancy = OccupancyProfile(self.amoeba_map > 0)
+        return self._occupancy
+
+    @property
+    def candidates(self):
+        """MoveCandidates of the percept, built on first use and shared by every caller after that"""
+        if self._candidates is None:
+            self._candidates = MoveCandidates(self.current_size, self.amoeba_map, self.periphery, self.movable_cells,
+                                              self.bacteria)
+        return self._candidates
+
+    @property
+    def map_state(self):
+        """Read-only copy of amoeba_map with the bacteria eaten this turn set to 1, the cells the amoeba holds once
+        the engine has eaten them"""
+        if self._map_state is None:
+            self._map_state = np.copy(self.amoeba_map)
+            if len(self.bacteria):
+                x, y = zip(*self.bacteria)
+                self._map_state[list(x), list(y)] = 1
+            self._map_state.setflags(write=False)
+        return self._map_state
+
+    @property
+    def oracle(self):
+        """ConnectivityOracle of map_state, cells outside map_state are free to extend to"""
+        if self._oracle is None:
+            self._oracle = ConnectivityOracle(self.map_state, self.periphery, self.map_state < 1)
+        return self._oracle
+
+    @property
+    def bounds(self):
+        """((low x, high x), (low y, high y)) smallest bounding box of the amoeba on the torus, see torus.bounds"""
+        return self.occupancy.x_extent(), self.occupancy.y_extent()
+
+    @property
+    def centroid(self):
+        """(x, y) mean position of the amoeba cells on the torus, see torus.line_mean"""
+        if self._centroid is None:
+            self._centroid = (torus.line_mean(self.occupancy.column_counts),
+                              torus.line_mean(self.occupancy.row_counts))
+        return self._centroid
+
+    def unwrapped_cells(self):
+        """Amoeba cells as an (N, 2) array with coordinates moved into bounds, see torus.unwrap_cells"""
+        return torus.unwrap_cells(np.argwhere(self.occupancy.occupied), self.bounds)
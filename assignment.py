@@ -0,0 +1,77 @@
+import heapq
+import constants
+
+
+class RetractIndex:
+    def __init__(self, retracts, bucket=8):
+        """Retract candidates bucketed on a coarse grid, to list them by distance to a cell without sorting them all.
+
+            Distances are plain euclidean distances between coordinates like math.dist, ties keep the order of
+            retracts, so nearest lists the same cells in the same order as sorting retracts by math.dist would.
+
+            Args:
+                retracts (List[Tuple[int, int]]): candidate cells in priority order
+                bucket (int): side of the square buckets
+        """
+        self.bucket = bucket
+        self.buckets = {}
+        for index, cell in enumerate(retracts):
+            self.buckets.setdefault(self.bucket_of(cell), {})[cell] = index
+
+    def bucket_of(self, cell):
+        return cell[0] // self.bucket, cell[1] // self.bucket
+
+    def remove(self, cell):
+        del self.buckets[self.bucket_of(cell)][cell]
+
+    def nearest(self, target):
+        """Candidates closest to target first, generated ring of buckets by ring of buckets as they are asked for.
+
+            A candidate removed while the generator is in use may still come out of it.
+        """
+        tx, ty = target
+        bx, by = self.bucket_of(target)
+        last_ring = constants.map_dim // self.bucket + 1
+        heap = []
+        for ring in range(last_ring + 1):
+            for i in range(bx - ring, bx + ring + 1):
+                for j in range(by - ring, by + ring + 1):
+                    if max(abs(i - bx), abs(j - by)) != ring:
+                        continue
+                    for (x, y), index in self.buckets.get((i, j), {}).items():
+                        heapq.heappush(heap, ((x - tx) ** 2 + (y - ty) ** 2, index, (x, y)))
+            # a candidate outside the searched rings is more than ring * bucket away along one axis
+            bound = (ring * self.bucket + 1) ** 2
+            while heap and (heap[0][0] < bound or ring == last_ring):
+                yield heapq.heappop(heap)[2]
+
+
+def assign_moves(extends, retracts, limit, check_move, bucket=8):
+    """Pair every extend, in priority order, with the closest retract that keeps the move legal, as the morph of G2
+    and G8 does, without sorting every retract for every extend.
+
+        Which retract is paired with which extend does not matter to the engine, it only takes the two lists, but
+        pairing by distance decides which retracts are picked first.
+
+        Args:
+            extends (List[Tuple[int, int]]): cells to extend to, most wanted first
+            retracts (List[Tuple[int, int]]): cells that may be retracted, ties in distance are broken by this order
+            limit (int): number of cells the amoeba can move this turn
+            check_move (Callable[[List, List], bool]): True if retracting and extending the given cells is legal
+            bucket (int): side of the buckets of RetractIndex
+        Returns:
+            Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]: retracts and extends, paired by position
+    """
+    index = RetractIndex(retracts, bucket)
+    chosen_retracts = []
+    chosen_extends = []
+    for extend in extends:
+        if len(chosen_extends) >= limit:
+            break
+        for retract in index.nearest(extend):
+            if check_move(chosen_retracts + [retract], chosen_extends + [extend]):
+                chosen_retracts.append(retract)
+                chosen_extends.append(extend)
+                index.remove(retract)
+                break
+    return chosen_retracts, chosen_extends
@@ -0,0 +1,92 @@
+import numpy as np
+import constants
+
+
+def torus_distance(a, b):
+    """Number of steps between two cells on the torus moving up, down, left or right."""
+    dx = abs(int(a[0]) - int(b[0])) % constants.map_dim
+    dy = abs(int(a[1]) - int(b[1])) % constants.map_dim
+    return min(dx, constants.map_dim - dx) + min(dy, constants.map_dim - dy)
+
+
+class BacteriaField:
+    def __init__(self, bacteria, bins=10):
+        """Coarse bacteria density grid of the whole board and a spatial index of the bacteria.
+
+            The board is cut into bins x bins square bins, counts[i][j] is the number of bacteria in the bin holding
+            the cells with x // bin_size == i and y // bin_size == j. The engine keeps it up to date as bacteria move,
+            are eaten and spawn, players get a copy on the current percept when the game runs with --bacteria_field.
+
+            Args:
+                bacteria (List[Tuple[int, int]]): bacteria positions
+                bins (int): number of bins along each side, has to divide the map size
+        """
+        if constants.map_dim % bins:
+            raise ValueError("{} bins do not divide a map of size {}".format(bins, constants.map_dim))
+        self.bins = bins
+        self.bin_size = constants.map_dim // bins
+        self.counts = np.zeros((bins, bins), dtype=int)
+        self.cells = {}
+        self.add(bacteria)
+
+    def copy(self):
+        field = BacteriaField.__new__(BacteriaField)
+        field.bins = self.bins
+        field.bin_size = self.bin_size
+        field.counts = self.counts.copy()
+        field.cells = {key: set(cells) for key, cells in self.cells.items()}
+        return field
+
+    def bin_of(self, cell):
+        return int(cell[0]) // self.bin_size, int(cell[1]) // self.bin_size
+
+    def add(self, cells):
+        for x, y in cells:
+            cell = (int(x), int(y))
+            key = self.bin_of(cell)
+            self.cells.setdefault(key, set()).add(cell)
+            self.counts[key] += 1
+
+    def remove(self, cells):
+        for x, y in cells:
+            cell = (int(x), int(y))
+            key = self.bin_of(cell)
+            self.cells[key].remove(cell)
+            self.counts[key] -= 1
+
+    def move(self, old, new):
+        self.remove([old])
+        self.add([new])
+
+    def density(self):
+        """Fraction of the cells of every bin holding a bacterium, a bins x bins float array."""
+        return self.counts / self.bin_size ** 2
+
+    def nearest(self, cell, k=1):
+        """The k bacteria closest to cell on the torus, see torus_distance.
+
+            Bins are searched ring by ring around the bin of cell and the search stops as soon as no bacterium of
+            a ring further out can be closer than the k found so far.
+
+            Returns:
+                List[Tuple[int, int]]: up to k bacteria, closest first
+        """
+        bx, by = self.bin_of(cell)
+        found = []
+        seen = set()
+        for ring in range(self.bins // 2 + 1):
+            for i in range(-ring, ring + 1):
+                for j in range(-ring, ring + 1):
+                    if max(abs(i), abs(j)) != ring:
+                        continue
+                    key = ((bx + i) % self.bins, (by + j) % self.bins)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    found += [(torus_distance(cell, other), other) for other in self.cells.get(key, ())]
+            found.sort()
+            found = found[:k]
+            # any bacterium outside the searched rings is at least ring * bin_size + 1 steps away
+            if len(found) == k and found[-1][0] <= ring * self.bin_size + 1:
+                break
+        return [other for _, other in found]
@@ -0,0 +1,81 @@
+import logging
+from typing import List, Tuple
+import numpy as np
+import numpy.typing as npt
+import constants
+from amoeba_state import AmoebaState
+from connectivity import ConnectivityOracle
+from debug_overlay import DISABLED
+from move_candidates import MoveCandidates
+
+
+class BasePlayer:
+    def __init__(self, rng: np.random.Generator, logger: logging.Logger, metabolism: float, goal_size: int,
+                 precomp_dir: str) -> None:
+        """Percept bookkeeping shared by the players, subclasses implement move and call store_current_percept first.
+
+            The views derived from a percept (map with the bacteria folded in, candidate masks, cut cells,
+            connectivity oracle) are built lazily on the AmoebaState itself, so every caller of a turn shares one
+            copy of each and they follow the engine's rules instead of a copy kept by every group.
+
+            Args:
+                rng (np.random.Generator): numpy random number generator, use this for same player behavior across run
+                logger (logging.Logger): logger use this like logger.info("message")
+                metabolism (float): the percentage of amoeba cells, that can move
+                goal_size (int): the size the amoeba must reach
+                precomp_dir (str): Directory path to store/load pre-computation
+        """
+        self.rng = rng
+        self.logger = logger
+        self.metabolism = metabolism
+        self.goal_size = goal_size
+        self.precomp_dir = precomp_dir
+
+        # Class accessible percept variables, written at the start of each turn
+        self.percept: AmoebaState = None
+        self.current_size: int = None
+        self.amoeba_map: npt.NDArray = None
+        self.bacteria_cells: List[Tuple[int, int]] = None
+        self.retractable_cells: List[Tuple[int, int]] = None
+        self.extendable_cells: List[Tuple[int, int]] = None
+        self.candidates: MoveCandidates = None
+        self.num_available_moves: int = None
+        self.overlay = DISABLED
+
+    def store_current_percept(self, current_percept: AmoebaState) -> None:
+        self.percept = current_percept
+        self.current_size = current_percept.current_size
+        self.amoeba_map = current_percept.amoeba_map
+        self.retractable_cells = current_percept.periphery
+        self.bacteria_cells = current_percept.bacteria
+        self.overlay = current_percept.overlay
+        self.extendable_cells = current_percept.movable_cells
+        self.candidates = current_percept.candidates
+        # the engine also counts the bacteria eaten this turn (candidates.max_moves), this budget leaves them out
+        self.num_available_moves = int(np.ceil(self.metabolism * current_percept.current_size))
+
+    @property
+    def map_state(self) -> npt.NDArray:
+        """Amoeba map of the current percept with the bacteria folded in, see AmoebaState.map_state"""
+        return self.percept.map_state
+
+    @property
+    def oracle(self) -> ConnectivityOracle:
+        return self.percept.oracle
+
+    @property
+    def cut_cells(self) -> set:
+        """Amoeba cells that cannot be retracted on their own, see MoveCandidates.cut_cells"""
+        return self.candidates.cut_cells
+
+    def check_move(self, retracts: List[Tuple[int, int]], extends: List[Tuple[int, int]]) -> bool:
+        return self.oracle.check_move(retracts, extends)
+
+    def find_movable_neighbor(self, x: int, y: int) -> List[Tuple[int, int]]:
+        """Neighbors of (x, y) outside map_state in the order up, down, left, right"""
+        out = []
+        for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            nx, ny = nx % constants.map_dim, ny % constants.map_dim
+            if self.map_state[nx, ny] < 1:
+                out.append((nx, ny))
+        return out
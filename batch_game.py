@@ -0,0 +1,241 @@
+import argparse
+import logging
+import os
+import time
+import numpy as np
+import constants
+from amoeba_fork import AmoebaFork
+from amoeba_kernels import STEP_X, STEP_Y, any_neighbor, cells_of, neighbor_values
+from amoeba_state import AmoebaState
+
+UP, DOWN, LEFT, RIGHT = range(4)
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT])
+
+
+class PlayerBatch:
+    def __init__(self, players):
+        """Batched player interface on top of one regular player per game.
+
+            Args:
+                players (List[Player]): one player per game, each with the usual move(last_percept,
+                    current_percept, info) method
+        """
+        self.players = players
+
+    def move(self, last_percepts, current_percepts, infos):
+        """Returns one action per game, None for games that already ended."""
+        actions = []
+        for player, last_percept, current_percept, info in zip(self.players, last_percepts, current_percepts, infos):
+            if current_percept is None:
+                actions.append(None)
+            else:
+                actions.append(player.move(last_percept=last_percept, current_percept=current_percept, info=info))
+        return actions
+
+
+class BatchAmoebaGame:
+    def __init__(self, seeds, player, metabolism, size, density, max_turns):
+        """Runs many games with the same parameters in lockstep on one (G, H, W) int8 board tensor.
+
+            Bacteria motion, periphery extraction, eating and spawning are computed with one set of array operations
+            per turn for all games, moves are validated and applied per game with the engine rules (AmoebaRules).
+
+            Differences to AmoebaGame, which makes results statistically but not bitwise equal:
+                * all bacteria move at the same time based on the board before the move, when several bacteria want
+                  the same cell the first one in row-major order wins and the others stay
+                * one RNG seeded from all seeds drives the whole batch
+                * percept lists are in row-major order
+
+            Args:
+                seeds (List[int]): one seed per game
+                player: batched player, move(last_percepts, current_percepts, infos) returns a list of actions
+                metabolism (float): the percentage of amoeba cells, that can move
+                size (int): length of a side of the initial amoeba square
+                density (float): density of bacteria on the map
+                max_turns (int): the maximum number of turns
+        """
+        self.num_games = len(seeds)
+        self.rng = np.random.default_rng(seeds)
+        self.player = player
+        self.metabolism = metabolism
+        self.start_size = size
+        self.density = density
+        self.max_turns = max_turns
+        self.goal_size = 4 * size ** 2
+        self.turns = 0
+
+        self.boards = np.zeros((self.num_games, constants.map_dim, constants.map_dim), dtype=np.int8)
+        self.amoeba_size = np.full(self.num_games, size ** 2, dtype=np.int64)
+        self.player_bytes = [0] * self.num_games
+        self.game_end = np.full(self.num_games, max_turns, dtype=np.int64)
+        self.goal_reached = np.zeros(self.num_games, dtype=bool)
+        self.move_status = np.zeros(self.num_games, dtype=np.int64)
+
+        # the rules of the engine, applied in place on the board of each game
+        self.rules = [AmoebaFork(self.boards[g], np.zeros((0, 2), dtype=np.int64), None, size ** 2, metabolism,
+                                 density, [], []) for g in range(self.num_games)]
+
+        self.initialize(size)
+
+    def initialize(self, sl):
+        start = constants.map_dim // 2 - sl // 2
+        self.boards[:, start:start + sl, start:start + sl] = 2
+        self.boards[:, start + 1:start + sl - 1, start + 1:start + sl - 1] = 1
+        self.add_bacteria()
+
+        self.after_last_move = self.get_percepts(self.get_periphery_info(False))
+
+    def active(self):
+        return ~self.goal_reached
+
+    def play_game(self):
+        while self.turns != self.max_turns and self.active().any():
+            self.turns += 1
+            self.play_turn()
+
+            reached = self.active() & (self.amoeba_size >= self.goal_size)
+            self.game_end[reached] = self.turns
+            self.goal_reached |= reached
+
+    def play_turn(self):
+        active = self.active()
+        self.bacteria_move(active)
+        info = self.get_periphery_info(True, active)
+        before_states = self.get_percepts(info, active)
+
+        actions = self.player.move(self.after_last_move, before_states, self.player_bytes)
+
+        periphery, eatable, _ = info
+        self.eat_bacteria(eatable)
+        for g in np.flatnonzero(active):
+            rules = self.rules[g]
+            rules.amoeba_size = int(self.amoeba_size[g])
+            rules.player_byte = self.player_bytes[g]
+            self.move_status[g] = rules.resolve_action(actions[g], before_states[g].periphery)
+            self.player_bytes[g] = rules.player_byte
+
+        self.add_bacteria(active)
+        self.after_last_move = self.get_percepts(self.get_periphery_info(False, active), active)
+
+    def bacteria_move(self, active):
+        g, x, y = np.nonzero((self.boards == -1) & active[:, None, None])
+        nbr_x = (x[:, None] + STEP_X) % constants.map_dim
+        nbr_y = (y[:, None] + STEP_Y) % constants.map_dim
+        empty = self.boards[g[:, None], nbr_x, nbr_y] == 0
+        free_count = empty.sum(axis=1)
+
+        # two free cells: pick one at random, three free cells: move away from the blocked side
+        first_free = empty.argmax(axis=1)
+        second_free = 3 - empty[:, ::-1].argmax(axis=1)
+        random_pick = np.where(self.rng.random(len(g)) < 0.5, first_free, second_free)
+        direction = np.where(free_count == 2, random_pick, OPPOSITE[(~empty).argmax(axis=1)])
+
+        movers = (free_count == 2) | (free_count == 3)
+        g, x, y, d = g[movers], x[movers], y[movers], direction[movers]
+        new_x = (x + STEP_X[d]) % constants.map_dim
+        new_y = (y + STEP_Y[d]) % constants.map_dim
+
+        # one bacterium per target cell, the first in row-major order
+        target = (g * constants.map_dim + new_x) * constants.map_dim + new_y
+        _, winners = np.unique(target, return_index=True)
+
+        self.boards[g[winners], x[winners], y[winners]] = 0
+        self.boards[g[winners], new_x[winners], new_y[winners]] = -1
+
+    def get_periphery_info(self, edit, active=None):
+        """Vectorized AmoebaRules.get_periphery_info for all games, returns boolean masks instead of lists."""
+        periphery = self.boards == 2
+        if active is not None:
+            periphery &= active[:, None, None]
+        nbrs = neighbor_values(self.boards)
+
+        touches_periphery = any_neighbor(periphery)
+        eatable = (self.boards == -1) & touches_periphery
+        movable = (self.boards == 0) & touches_periphery
+
+        if edit:
+            enclosed = periphery & ~(nbrs == 0).any(axis=0)
+            self.boards[enclosed] = 1
+            periphery &= ~enclosed
+
+        return periphery, eatable, movable
+
+    def get_percepts(self, info, active=None):
+        periphery, eatable, movable = info
+        percepts = []
+        for g in range(self.num_games):
+            if active is not None and not active[g]:
+                percepts.append(None)
+                continue
+
+            amoeba = (self.boards[g] > 0).astype(int)
+            percepts.append(AmoebaState(int(self.amoeba_size[g]), amoeba, cells_of(periphery[g]),
+                                        cells_of(eatable[g]), cells_of(movable[g])))
+        return percepts
+
+    def eat_bacteria(self, eatable):
+        self.boards[eatable] = 2
+        self.amoeba_size += eatable.sum(axis=(1, 2))
+
+    def add_bacteria(self, active=None):
+        boards = self.boards.reshape(self.num_games, -1)
+        target = np.floor(self.density * (constants.total_cells - self.amoeba_size)).astype(np.int64)
+        missing = target - (boards == -1).sum(axis=1)
+        if active is not None:
+            missing[~active] = 0
+        most = int(missing.max())
+        if most <= 0:
+            return
+
+        # a uniform sample of empty cells per game: the empty cells with the smallest random keys
+        keys = self.rng.random(boards.shape)
+        keys[boards != 0] = 2.0
+        candidates = np.argpartition(keys, most - 1, axis=1)[:, :most]
+        order = np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+
+        chosen = np.arange(most)[None, :] < missing[:, None]
+        games = np.broadcast_to(np.arange(self.num_games)[:, None], candidates.shape)
+        boards[games[chosen], candidates[chosen]] = -1
+
+
+if __name__ == '__main__':
+    import amoeba_game
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", "-g", type=int, default=100, help="Number of games to run in lockstep")
+    parser.add_argument("--metabolism", "-m", type=float, default=1.0, help="Value between 0 and 1 (including 1) that "
+                                                                            "indicates what proportion of the amoeba "
+                                                                            "is allowed to retract in one turn")
+    parser.add_argument("--size", "-A", type=int, default=15, help="length of a side of the initial amoeba square "
+                                                                   "(min=3, max=50")
+    parser.add_argument("--final", "-l", type=int, default=1000, help="the maximum number of days")
+    parser.add_argument("--density", "-d", type=float, default=0.3, help="Density of bacteria on the map")
+    parser.add_argument("--seed", "-s", type=int, default=2, help="Seed of the first game, game i uses seed + i")
+    parser.add_argument("--player", "-p", default="d", help="Specifying player")
+    args = parser.parse_args()
+
+    if args.player.lower() == 'd':
+        player_class = amoeba_game.DefaultPlayer
+    else:
+        player_class = getattr(amoeba_game, "G{}_Player".format(args.player))
+
+    logger = logging.getLogger(__name__)
+    logger.disabled = True
+    goal_size = 4 * args.size ** 2
+    precomp_dir = os.path.join("precomp", "batch")
+    os.makedirs(precomp_dir, exist_ok=True)
+
+    seeds = [args.seed + i for i in range(args.games)]
+    players = [player_class(rng=np.random.default_rng(seed), logger=logger, metabolism=args.metabolism,
+                            goal_size=goal_size, precomp_dir=precomp_dir) for seed in seeds]
+
+    start_time = time.time()
+    game = BatchAmoebaGame(seeds, PlayerBatch(players), args.metabolism, args.size, args.density, args.final)
+    game.play_game()
+    elapsed = time.time() - start_time
+
+    print("Goal reached in {}/{} games".format(game.goal_reached.sum(), game.num_games))
+    print("Mean final size: {:.1f}, mean turns: {:.1f}".format(game.amoeba_size.mean(), game.game_end.mean()))
+    print("Time taken: {:.3f}s ({:.2f} games/s, {:.1f} turns/s per game)".format(
+        elapsed, game.num_games / elapsed, game.num_games * game.turns / elapsed))
@@ -0,0 +1,79 @@
+import argparse
+import logging
+import time
+import numpy as np
+import constants
+from amoeba_kernels import periphery_info
+from amoeba_rules import AmoebaRules
+from players.default_player import Player as DefaultPlayer
+
+
+class Board(AmoebaRules):
+    def __init__(self, map_state):
+        self.map_state = map_state
+
+
+def comb(teeth):
+    """Engine map of a comb with a backbone on row 0 and teeth spanning the map on every second column."""
+    map_state = np.zeros((constants.map_dim, constants.map_dim), dtype=np.int8)
+    map_state[0, :2 * teeth] = 1
+    map_state[:, 0:2 * teeth:2] = 1
+    map_state[map_state > 0] = 2
+    periphery_info(map_state, True)
+    return map_state
+
+
+def list_movable_cells(player, retract, periphery, amoeba_map, bacteria, mini):
+    """find_movable_cells as it was before, with list membership, kept as the baseline."""
+    movable = []
+    new_periphery = list(set(periphery).difference(set(retract)))
+    for i, j in new_periphery:
+        nbr = player.find_movable_neighbor(i, j, amoeba_map, bacteria)
+        for x, y in nbr:
+            if (x, y) not in movable:
+                movable.append((x, y))
+
+    movable += retract
+
+    return movable[:mini]
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teeth", "-t", type=int, nargs="+", default=[5, 10, 20, 40],
+                        help="Number of comb teeth of each run, every tooth adds about 100 periphery cells")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Number of calls timed per run")
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logger.disabled = True
+    player = DefaultPlayer(rng=np.random.default_rng(2), logger=logger, metabolism=1.0, goal_size=10000,
+                           precomp_dir="")
+
+    print("{:>9} {:>12} {:>12} {:>15}".format("periphery", "list (ms)", "set (ms)", "check_move (ms)"))
+    for teeth in args.teeth:
+        map_state = comb(teeth)
+        board = Board(map_state)
+        periphery = list(map(tuple, np.argwhere(map_state == 2).tolist()))
+        amoeba_map = (map_state > 0).astype(int)
+        retract = periphery[:5]
+        mini = len(periphery)
+
+        list_time, expected = timed(lambda: list_movable_cells(player, retract, periphery, amoeba_map, [], mini),
+                                    args.repeat)
+        set_time, movable = timed(lambda: player.find_movable_cells(retract, periphery, amoeba_map, [], mini),
+                                  args.repeat)
+        if movable != expected:
+            raise RuntimeError("find_movable_cells changed its output for {} teeth".format(teeth))
+        move = movable[:len(retract)]
+        check_time, _ = timed(lambda: board.check_move(retract, move, periphery), args.repeat)
+
+        print("{:>9} {:>12.2f} {:>12.2f} {:>15.2f}".format(len(periphery), 1000 * list_time, 1000 * set_time,
+                                                           1000 * check_time))
@@ -0,0 +1,65 @@
+import numpy as np
+import constants
+
+
+class CellSet:
+    def __init__(self, indices=()):
+        """Set of board cells kept as sorted, unique linear indices x * map_dim + y in a numpy array.
+
+            Set operations run on the index arrays, or on a board mask when the other operand is a map, and cells
+            only become tuples when cells() or iteration asks for them.
+
+            Args:
+                indices (numpy array): linear indices of the cells, in any order, possibly repeated
+        """
+        self.indices = np.unique(np.asarray(indices, dtype=np.int64))
+
+    @classmethod
+    def _wrap(cls, indices):
+        cell_set = cls.__new__(cls)
+        cell_set.indices = indices
+        return cell_set
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Cells where a board map is non zero."""
+        return cls._wrap(np.flatnonzero(mask).astype(np.int64))
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Cells of a list of tuples or of an (N, 2) array, taken modulo the map size."""
+        cells = np.asarray(list(cells) if isinstance(cells, (set, frozenset)) else cells, dtype=np.int64)
+        cells = cells.reshape(-1, 2) % constants.map_dim
+        return cls(cells[:, 0] * constants.map_dim + cells[:, 1])
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(self.cells())
+
+    def _in(self, other):
+        """Boolean array, True for the cells of this set that are in other, a CellSet or a board map."""
+        if isinstance(other, CellSet):
+            return np.isin(self.indices, other.indices, assume_unique=True)
+        return np.asarray(other).ravel()[self.indices] > 0
+
+    def intersection(self, other):
+        return CellSet._wrap(self.indices[self._in(other)])
+
+    def difference(self, other):
+        return CellSet._wrap(self.indices[~self._in(other)])
+
+    def array(self):
+        """Cells as an (N, 2) array in row-major order."""
+        return np.stack(np.divmod(self.indices, constants.map_dim), axis=1)
+
+    def cells(self):
+        """Cells as a list of tuples in row-major order."""
+        return list(map(tuple, self.array().tolist()))
+
+    def mask(self, dtype=bool):
+        """Board map set to 1 on the cells."""
+        board = np.zeros(constants.map_dim * constants.map_dim, dtype=dtype)
+        board[self.indices] = 1
+        return board.reshape(constants.map_dim, constants.map_dim)
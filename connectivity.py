@@ -0,0 +1,136 @@
+from collections import deque
+import numpy as np
+import constants
+
+
+def _neighbor_table(dim):
+    """Flat indices of the up, down, left and right neighbor of every cell on the torus."""
+    table = []
+    for x in range(dim):
+        for y in range(dim):
+            table.append((x * dim + (y - 1) % dim, x * dim + (y + 1) % dim,
+                          ((x - 1) % dim) * dim + y, ((x + 1) % dim) * dim + y))
+    return table
+
+
+NEIGHBORS = _neighbor_table(constants.map_dim)
+
+
+def sources_connected(sources, inside, limit=None):
+    """True if all sources lie in one component of the cells where inside(cell) holds.
+
+        The searches from all sources run at the same time and are merged with a union-find when they meet, so the
+        search stops as soon as everything is merged instead of flood filling the whole component.
+
+        Args:
+            sources (Set[int]): flat indices of the cells that must be connected
+            inside (Callable[[int], bool]): True for the flat index of a cell the search may walk through
+            limit (int): give up after visiting this many cells, None to search until the answer is known
+        Returns:
+            bool: whether the sources are connected, None if the search gave up
+    """
+    if len(sources) <= 1:
+        return True
+
+    parent = {cell: cell for cell in sources}
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    groups = len(sources)
+    owner = {cell: cell for cell in sources}
+    queue = deque(sources)
+    while queue:
+        if limit is not None and len(owner) > limit:
+            return None
+        cell = queue.popleft()
+        for nbr in NEIGHBORS[cell]:
+            if not inside(nbr):
+                continue
+            if nbr not in owner:
+                owner[nbr] = owner[cell]
+                queue.append(nbr)
+                continue
+            a, b = find(owner[cell]), find(owner[nbr])
+            if a != b:
+                parent[a] = b
+                groups -= 1
+                if groups == 1:
+                    return True
+    return False
+
+
+class ConnectivityOracle:
+    def __init__(self, occupied, periphery, free):
+        """Answers whether the amoeba stays connected after a move, built once per turn from the percept.
+
+            The components of the occupied cells are labelled once. A query only searches outward from the cells
+            next to the change: every remaining cell of a component touched by the retracts reaches one of those
+            cells without passing through the change, so the amoeba is connected after the move iff the neighbors
+            of the retracts, the extends and one cell of every untouched component end up in one component, which
+            sources_connected searches for from all of these cells at once.
+
+            Args:
+                occupied (numpy array): map, cells > 0 count as amoeba
+                periphery (List[Tuple[int, int]]): cells that can be retracted
+                free (numpy array): map, True where a periphery cell can extend to
+        """
+        self.dim = occupied.shape[1]
+        self.occupied = bytearray((np.asarray(occupied) > 0).ravel().astype(np.uint8).tobytes())
+        self.free = bytearray(np.asarray(free, dtype=bool).ravel().astype(np.uint8).tobytes())
+        self.periphery = set(self.flat(periphery))
+
+        # component label of every occupied cell and one anchor cell per component
+        self.label = {}
+        self.anchors = []
+        for start in np.flatnonzero(np.asarray(occupied) > 0).tolist():
+            if start in self.label:
+                continue
+            component = len(self.anchors)
+            self.anchors.append(start)
+            self.label[start] = component
+            stack = [start]
+            while stack:
+                cell = stack.pop()
+                for nbr in NEIGHBORS[cell]:
+                    if self.occupied[nbr] and nbr not in self.label:
+                        self.label[nbr] = component
+                        stack.append(nbr)
+
+    def flat(self, cells):
+        return [x * self.dim + y for x, y in cells]
+
+    def check_move(self, retract, extend):
+        """Same answer as the check_move of the engine: retracts on the periphery, extends next to the remaining
+        periphery (or onto a retracted cell) and the amoeba still connected."""
+        retract = set(self.flat(retract))
+        extend = set(self.flat(extend))
+        if not retract.issubset(self.periphery):
+            return False
+
+        remaining = self.periphery.difference(retract)
+        for cell in extend:
+            if cell in retract:
+                continue
+            if not (self.free[cell] and any(nbr in remaining for nbr in NEIGHBORS[cell])):
+                return False
+
+        return self._connected(retract, extend)
+
+    def is_connected(self, retract, extend):
+        """True if the amoeba is connected after retracting retract and extending to extend."""
+        return self._connected(set(self.flat(retract)), set(self.flat(extend)))
+
+    def _connected(self, retract, extend):
+        def inside(cell):
+            return cell in extend or (self.occupied[cell] and cell not in retract)
+
+        touched = {self.label[cell] for cell in retract if cell in self.label}
+        sources = set(extend)
+        sources.update(anchor for component, anchor in enumerate(self.anchors) if component not in touched)
+        for cell in retract:
+            sources.update(nbr for nbr in NEIGHBORS[cell] if inside(nbr))
+        return sources_connected(sources, inside)
@@ -7,3 +7,15 @@ vis_width = 960
 vis_height = 720
 
 timeout = 60 * 10
+
+# outcome of resolving a player action
+move_accepted = 0
+move_separated = 1
+move_malformed = 2
+
+# outcome of a game
+game_goal_reached = 0
+game_max_turns = 1
+game_stall_size = 2
+game_stall_repeat = 3
+game_stall_invalid = 4
@@ -0,0 +1,60 @@
+# marker style of each kind of overlay cell on the rendered frames
+OVERLAY_STYLES = {
+    "target": dict(marker="s", markerfacecolor="none", markeredgecolor="red"),
+    "retract": dict(marker="s", markerfacecolor="none", markeredgecolor="forestgreen"),
+    "extend": dict(marker="o", markerfacecolor="none", markeredgecolor="tab:purple"),
+}
+
+
+class DebugOverlay:
+    def __init__(self, enabled=False):
+        """Cells a player marks for debugging, drawn on the frame of the turn when the game is rendered.
+
+            Players push overlays from move() through current_percept.overlay, the engine collects them after the
+            move and draws them with the replay, so no plotting or file writing happens while the move is timed.
+            When the game runs without --debug_overlay every push returns right away, players can check enabled
+            before building anything expensive to push.
+
+            Args:
+                enabled (bool): keep pushed overlays, drop them otherwise
+        """
+        self.enabled = enabled
+        self.pending = []
+
+    def push(self, retract=(), extend=(), target=(), label=""):
+        """Mark cells of the current turn.
+
+            Args:
+                retract (List[Tuple[int, int]]): cells the player retracts
+                extend (List[Tuple[int, int]]): cells the player extends to
+                target (List[Tuple[int, int]]): cells of the formation the player aims for
+                label (str): name shown in the legend of the frame
+        """
+        if not self.enabled:
+            return
+        self.pending.append({"label": label, "retract": list(retract), "extend": list(extend),
+                             "target": list(target)})
+
+    def flush(self):
+        """Overlays pushed since the last flush."""
+        overlays, self.pending = self.pending, []
+        return overlays
+
+
+# shared by percepts built without an overlay, pushes to it are always dropped
+DISABLED = DebugOverlay()
+
+
+def draw_overlays(ax, overlays, markersize=2):
+    """Draw the overlays of a turn on a frame plotted like AmoebaGame.frame_rendering."""
+    for overlay in overlays:
+        for kind, style in OVERLAY_STYLES.items():
+            cells = overlay[kind]
+            if not cells:
+                continue
+            x, y = zip(*cells)
+            label = "{} {}".format(overlay["label"], kind) if overlay["label"] else kind
+            ax.plot([i + 0.5 for i in x], [j + 0.5 for j in y], linestyle="none", markersize=markersize,
+                    label=label, **style)
+    if overlays:
+        ax.legend(loc="upper right", fontsize="x-small")
@@ -0,0 +1,327 @@
+import argparse
+import copy
+import math
+import sys
+import time
+import numpy as np
+import constants
+from amoeba_fork import AmoebaFork
+from amoeba_rules import AmoebaRules
+from reference_rules import ReferenceRules
+
+PASS = ([], [], 0)
+ACTION_KINDS = ("valid", "numpy", "duplicate", "overflow", "mismatch", "foreign", "malformed", "pass")
+ACTION_WEIGHTS = (0.45, 0.15, 0.06, 0.06, 0.06, 0.1, 0.08, 0.04)
+
+
+class Board:
+    def __init__(self, map_state, bacteria, rng, amoeba_size, metabolism, density):
+        """Game state without a player or logging, the rules come from the subclass."""
+        self.map_state = map_state
+        self.bacteria = bacteria
+        self.rng = rng
+        self.amoeba_size = amoeba_size
+        self.metabolism = metabolism
+        self.density = density
+        self.player_byte = 0
+
+
+class ReferenceBoard(Board, ReferenceRules):
+    pass
+
+
+class RulesBoard(Board, AmoebaRules):
+    pass
+
+
+def rules_engine(start):
+    return RulesBoard(np.copy(start.map_state), list(start.bacteria), copy.deepcopy(start.rng), start.amoeba_size,
+                      start.metabolism, start.density)
+
+
+def fork_engine(start):
+    return AmoebaFork(start.map_state.astype(np.int8), np.array(start.bacteria, dtype=np.int64).reshape(-1, 2),
+                      start.rng, start.amoeba_size, start.metabolism, start.density, None, None)
+
+
+# engines checked against the reference, built from the reference board at turn 0
+ENGINES = {"rules": rules_engine, "fork": fork_engine}
+
+
+def new_game(seed, size, metabolism, density):
+    """Reference board at turn 0, set up like AmoebaGame.initialize."""
+    board = ReferenceBoard(np.zeros((constants.map_dim, constants.map_dim), dtype=int), [],
+                           np.random.default_rng(seed), size ** 2, metabolism, density)
+    for i in range(size):
+        for j in range(size):
+            if i == 0 or i == (size - 1) or j == 0 or j == (size - 1):
+                board.map_state[50 - (size // 2) + i][50 - (size // 2) + j] = 2
+            else:
+                board.map_state[50 - (size // 2) + i][50 - (size // 2) + j] = 1
+
+    board.bacteria = [tuple(i) for i in board.rng.choice(board.find_indices(0), replace=False, size=math.floor(
+        density * (constants.total_cells - board.amoeba_size)))]
+    for i, j in board.bacteria:
+        board.map_state[i][j] = -1
+    return board
+
+
+def sample(rng, cells, k):
+    k = min(k, len(cells))
+    return [cells[i] for i in rng.choice(len(cells), size=k, replace=False)]
+
+
+def random_action(rng, periphery, movable, amoeba_size, metabolism):
+    """Action of a random player, mostly moves the rules accept, the rest borderline or malformed.
+
+        Args:
+            rng (np.random.Generator): generator of the player, separate from the game RNG
+            periphery (List[Tuple[int, int]]): periphery of the percept
+            movable (List[Tuple[int, int]]): movable cells of the percept
+            amoeba_size (int): current size of the amoeba
+            metabolism (float): the percentage of amoeba cells, that can move
+        Returns:
+            Tuple[str, object]: kind of the action and the action
+    """
+    kind = ACTION_KINDS[rng.choice(len(ACTION_KINDS), p=ACTION_WEIGHTS)]
+    limit = math.ceil(metabolism * amoeba_size)
+    k = int(rng.integers(0, min(limit, len(periphery)) + 1))
+    retract = sample(rng, periphery, k)
+    move = sample(rng, movable + retract, len(retract))
+    info = int(rng.integers(256))
+
+    if kind == "numpy":
+        # what players get from rng.choice on a list of cells
+        retract = [tuple(c) for c in np.array(retract, dtype=np.int64).reshape(-1, 2)]
+        move = [tuple(c) for c in np.array(move, dtype=np.int64).reshape(-1, 2)]
+    elif kind == "duplicate" and retract:
+        retract, move = retract + retract[:1], move + move[:1]
+    elif kind == "overflow":
+        retract = sample(rng, periphery, limit + 1)
+        move = sample(rng, movable + retract, len(retract))
+    elif kind == "mismatch" and move:
+        move = move[:-1]
+    elif kind == "foreign":
+        # cells anywhere on the map, hardly ever on the periphery or next to it
+        far = [tuple(c) for c in rng.integers(0, constants.map_dim, (len(retract), 2)).tolist()]
+        if rng.random() < 0.5:
+            retract = far
+        else:
+            move = far
+    elif kind == "malformed":
+        return kind, [None, [], (retract, move), [retract, move, info], (retract, move, 256), (retract, move, -1),
+                      (retract, move, np.int64(info)), (tuple(retract), move, info),
+                      (retract, move, float(info))][rng.integers(9)]
+    elif kind == "pass":
+        return kind, PASS
+    return kind, (retract, move, info)
+
+
+def cells(bacteria):
+    return [tuple(c) for c in np.asarray(bacteria, dtype=np.int64).reshape(-1, 2).tolist()]
+
+
+def compare(turn, phase, reference, engine, expected=None, actual=None):
+    """First divergence between the two boards after a phase, None if they agree.
+
+        Returns:
+            dict: turn, phase and a list of differences
+    """
+    details = []
+    if reference.amoeba_size != engine.amoeba_size:
+        details.append("amoeba_size: reference {}, engine {}".format(reference.amoeba_size, engine.amoeba_size))
+    diff = np.argwhere(reference.map_state != engine.map_state)
+    for x, y in diff[:10].tolist():
+        details.append("map_state ({}, {}): reference {}, engine {}".format(x, y, reference.map_state[x][y],
+                                                                          engine.map_state[x][y]))
+    if len(diff) > 10:
+        details.append("... {} cells differ".format(len(diff)))
+    ref_bacteria, eng_bacteria = cells(reference.bacteria), cells(engine.bacteria)
+    if ref_bacteria != eng_bacteria:
+        index = next((i for i, (a, b) in enumerate(zip(ref_bacteria, eng_bacteria)) if a != b),
+                     min(len(ref_bacteria), len(eng_bacteria)))
+        details.append("bacteria[{}]: reference {}, engine {} ({} vs {} bacteria)".format(
+            index, ref_bacteria[index:index + 1], eng_bacteria[index:index + 1], len(ref_bacteria),
+            len(eng_bacteria)))
+    if isinstance(expected, tuple):
+        for name, a, b in zip(("periphery", "eatable_bacteria", "movable_cells"), expected, actual):
+            if cells(a) != cells(b):
+                details.append("{}: reference {} cells, engine {} cells, first difference at {}".format(
+                    name, len(a), len(b), next((i for i, (p, q) in enumerate(zip(cells(a), cells(b))) if p != q),
+                                               min(len(a), len(b)))))
+        if not np.array_equal(expected[3], actual[3]):
+            details.append("amoeba map differs")
+    elif expected != actual:
+        details.append("result: reference {}, engine {}".format(expected, actual))
+
+    if details:
+        return {"turn": turn, "phase": phase, "details": details}
+    return None
+
+
+def play(start, engine, turns, choose):
+    """Play the reference and an engine in lockstep and compare them after every phase of a turn.
+
+        Args:
+            start (ReferenceBoard): board at turn 0, left untouched
+            engine (str): key of ENGINES
+            turns (int): number of turns to play
+            choose (Callable): returns the action of a turn from the turn number and the reference percept
+        Returns:
+            dict: first divergence, None if the engine agrees with the reference on every turn
+    """
+    reference = copy.deepcopy(start)
+    board = ENGINES[engine](start)
+    for turn in range(turns):
+        reference.bacteria_move()
+        board.bacteria_move()
+        found = compare(turn, "bacteria_move", reference, board)
+        if found:
+            return found
+
+        expected = reference.get_periphery_info(True)
+        actual = board.get_periphery_info(True)
+        found = compare(turn, "get_periphery_info", reference, board, expected, actual)
+        if found:
+            return found
+
+        action = choose(turn, expected, reference)
+        reference.eat_bacteria(expected[1])
+        board.eat_bacteria(actual[1])
+        found = compare(turn, "eat_bacteria", reference, board)
+        if found:
+            return found
+
+        status = reference.resolve_action(copy.deepcopy(action), expected[0])
+        found = compare(turn, "resolve_action", reference, board, status,
+                        board.resolve_action(copy.deepcopy(action), actual[0]))
+        if found:
+            return found
+
+        reference.add_bacteria()
+        board.add_bacteria()
+        found = compare(turn, "add_bacteria", reference, board)
+        if found:
+            return found
+
+        found = compare(turn, "get_periphery_info", reference, board, reference.get_periphery_info(False),
+                        board.get_periphery_info(False))
+        if found:
+            return found
+    return None
+
+
+def replay(actions):
+    return lambda turn, percept, board: actions[turn]
+
+
+def smaller_actions(action):
+    """Actions with one cell less than action, in the order they are tried."""
+    if not (isinstance(action, (tuple, list)) and len(action) == 3 and isinstance(action[0], list)
+            and isinstance(action[1], list)):
+        return
+    retract, move, info = action
+    for i in range(max(len(retract), len(move))):
+        yield type(action)((retract[:i] + retract[i + 1:], move[:i] + move[i + 1:], info))
+    for i in range(len(retract)):
+        yield type(action)((retract[:i] + retract[i + 1:], move, info))
+    for i in range(len(move)):
+        yield type(action)((retract, move[:i] + move[i + 1:], info))
+
+
+def shrink(start, engine, actions, divergence):
+    """Shortest action history found that still makes the engine diverge.
+
+        Earlier actions are replaced by passes one at a time, then the action of the diverging turn loses cells
+        one at a time, every change is kept if the engine still diverges.
+
+        Returns:
+            Tuple[List, dict]: the actions up to the divergence and the divergence they cause
+    """
+    actions = actions[:divergence["turn"] + 1]
+    turn = 0
+    while turn < len(actions) - 1:
+        if actions[turn] != PASS:
+            trial = actions[:turn] + [PASS] + actions[turn + 1:]
+            found = play(start, engine, len(trial), replay(trial))
+            if found:
+                actions, divergence = trial[:found["turn"] + 1], found
+        turn += 1
+
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in smaller_actions(actions[-1]):
+            trial = actions[:-1] + [candidate]
+            found = play(start, engine, len(trial), replay(trial))
+            if found and found["turn"] == len(trial) - 1:
+                actions, divergence, shrunk = trial, found, True
+                break
+    return actions, divergence
+
+
+def check_seed(seed, engine, turns, size=None, metabolism=None, density=None, minimize=True):
+    """Play one seed with random actions, game parameters that are None are drawn from the seed.
+
+        Returns:
+            str: report of the first divergence, None if the engine agrees with the reference
+    """
+    params = np.random.default_rng([seed, 0])
+    size = size or int(params.integers(3, 16))
+    metabolism = metabolism or float(params.uniform(0.05, 1.0))
+    density = density or float(params.uniform(0.01, 0.5))
+    start = new_game(seed, size, metabolism, density)
+
+    player = np.random.default_rng([seed, 1])
+    actions = []
+    kinds = []
+
+    def choose(turn, percept, board):
+        kind, action = random_action(player, percept[0], percept[2], board.amoeba_size, board.metabolism)
+        kinds.append(kind)
+        actions.append(action)
+        return action
+
+    divergence = play(start, engine, turns, choose)
+    if divergence is None:
+        return None
+
+    kind = kinds[divergence["turn"]] if divergence["turn"] < len(kinds) else None
+    if minimize:
+        actions, divergence = shrink(start, engine, actions, divergence)
+    lines = ["Seed {} (A={}, m={:.3f}, d={:.3f}), engine {}: diverged at turn {} in {}".format(
+        seed, size, metabolism, density, engine, divergence["turn"], divergence["phase"])]
+    if divergence["turn"] < len(actions):
+        played = sum(action != PASS for action in actions[:-1])
+        lines.append("    action ({}): {}".format(kind, actions[divergence["turn"]]))
+        lines.append("    {} earlier turns with a non-pass action".format(played))
+    lines += ["    " + detail for detail in divergence["details"]]
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the engine rules turn by turn with the reference rules")
+    parser.add_argument("--seeds", "-n", type=int, default=200, help="Number of seeds to check")
+    parser.add_argument("--seed", "-s", type=int, default=1, help="First seed, seed i is seed + i")
+    parser.add_argument("--turns", "-t", type=int, default=30, help="Turns played per seed")
+    parser.add_argument("--engine", "-e", choices=list(ENGINES) + ["all"], default="all", help="Engine to check")
+    parser.add_argument("--size", "-A", type=int, default=None, help="Initial amoeba side, drawn per seed if not set")
+    parser.add_argument("--metabolism", "-m", type=float, default=None, help="Drawn per seed if not set")
+    parser.add_argument("--density", "-d", type=float, default=None, help="Drawn per seed if not set")
+    parser.add_argument("--no_shrink", action="store_true", help="Report divergences without minimizing them")
+    args = parser.parse_args()
+
+    engines = list(ENGINES) if args.engine == "all" else [args.engine]
+    start_time = time.time()
+    diverged = 0
+    for seed in range(args.seed, args.seed + args.seeds):
+        for engine in engines:
+            report = check_seed(seed, engine, args.turns, args.size, args.metabolism, args.density,
+                                not args.no_shrink)
+            if report:
+                diverged += 1
+                print(report)
+
+    print("{} seeds x {} turns on {}: {} divergences, time taken: {:.1f}s".format(
+        args.seeds, args.turns, ", ".join(engines), diverged, time.time() - start_time))
+    sys.exit(1 if diverged else 0)
@@ -0,0 +1,142 @@
+import argparse
+import sys
+import time
+import numpy as np
+import constants
+from amoeba_fork import AmoebaFork
+from connectivity import ConnectivityOracle
+from differential import RulesBoard
+
+SHAPES = ("blob", "thread", "wrap", "fallback")
+
+
+def grow(rng, start, size, pick):
+    """Connected set of cells grown one cell at a time from start on the torus.
+
+        Args:
+            pick (Callable[[List], int]): index of the frontier cell the next cell is attached to
+    """
+    cells = {start}
+    frontier = [start]
+    while len(cells) < size and frontier:
+        i = pick(frontier)
+        x, y = frontier[i]
+        free = [nbr for nbr in ((x, (y - 1) % constants.map_dim), (x, (y + 1) % constants.map_dim),
+                                ((x - 1) % constants.map_dim, y), ((x + 1) % constants.map_dim, y)) if nbr not in cells]
+        if not free:
+            frontier.pop(i)
+            continue
+        cell = free[int(rng.integers(len(free)))]
+        cells.add(cell)
+        frontier.append(cell)
+    return cells
+
+
+def random_shape(rng, kind):
+    """Connected amoeba of the given kind, as a list of cells.
+
+        blob: random growth from a random cell, compact with holes and bays
+        thread: one cell wide random walk, mostly cut cells where a single retract splits the amoeba
+        wrap: blob or thread grown around a corner of the map, so it crosses both borders
+        fallback: large blob, checked with a local search limit small enough to fall back to the flood fill
+    """
+    start = tuple(int(v) for v in rng.integers(0, constants.map_dim, 2))
+    if kind == "wrap":
+        start = tuple(int(v) % constants.map_dim for v in rng.integers(-2, 2, 2))
+        kind = "thread" if rng.random() < 0.5 else "blob"
+
+    if kind == "thread":
+        # grow from the newest cell only, which gives a winding line
+        return list(grow(rng, start, int(rng.integers(10, 300)), lambda frontier: len(frontier) - 1))
+
+    size = int(rng.integers(400, 1200)) if kind == "fallback" else int(rng.integers(5, 400))
+    return list(grow(rng, start, size, lambda frontier: int(rng.integers(len(frontier)))))
+
+
+def random_query(rng, cells, occupied):
+    """Retracts and extends around one spot of the amoeba, small enough to split it now and then.
+
+        Retracts are amoeba cells, extends are empty cells next to the amoeba, possibly a retracted cell again.
+    """
+    center = np.array(cells[int(rng.integers(len(cells)))])
+    spread = int(rng.integers(1, 8))
+    near = [cell for cell in cells if np.abs((np.array(cell) - center + 50) % constants.map_dim - 50).max() <= spread]
+    retract = [near[i] for i in rng.choice(len(near), size=int(rng.integers(0, min(len(near), 6) + 1)),
+                                           replace=False)]
+
+    border = set()
+    for x, y in near:
+        for nbr in ((x, (y - 1) % constants.map_dim), (x, (y + 1) % constants.map_dim),
+                    ((x - 1) % constants.map_dim, y), ((x + 1) % constants.map_dim, y)):
+            if not occupied[nbr]:
+                border.add(nbr)
+    border = sorted(border)
+    move = [border[i] for i in rng.choice(len(border), size=int(rng.integers(0, min(len(border), 6) + 1)),
+                                          replace=False)] if border else []
+    if retract and rng.random() < 0.1:
+        move.append(retract[0])
+    return retract, move
+
+
+def check_seed(seed, queries, kind):
+    """Answers of every connectivity check of the engine for random moves on one random amoeba.
+
+        Returns:
+            List[str]: one report per query where the checks disagree
+    """
+    rng = np.random.default_rng([seed, SHAPES.index(kind)])
+    cells = random_shape(rng, kind)
+    map_state = np.zeros((constants.map_dim, constants.map_dim), dtype=int)
+    for cell in cells:
+        map_state[cell] = 1
+    # bacteria next to the amoeba must not count as part of it
+    empty = np.argwhere(map_state == 0)
+    bacteria = [tuple(cell) for cell in empty[rng.choice(len(empty), size=300, replace=False)].tolist()]
+    for cell in bacteria:
+        map_state[cell] = -1
+
+    rules = RulesBoard(map_state, bacteria, rng, len(cells), 1.0, 0.0)
+    if kind == "fallback":
+        rules.local_search_limit = int(rng.integers(1, 20))
+    fork = AmoebaFork(map_state.astype(np.int8), np.array(bacteria, dtype=np.int64), rng, len(cells), 1.0, 0.0,
+                      None, None)
+    oracle = ConnectivityOracle(map_state, cells, map_state < 1)
+
+    reports = []
+    for _ in range(queries):
+        retract, move = random_query(rng, cells, map_state > 0)
+        answers = {
+            "is_connected": rules.is_connected(retract, move),
+            "flood_connected": rules.flood_connected(retract, move),
+            "fork flood_connected": fork.flood_connected(retract, move),
+            "ConnectivityOracle": oracle.is_connected(retract, move),
+        }
+        if len(set(answers.values())) > 1:
+            reports.append("Seed {} ({}, {} cells, local search limit {}): retract {}, move {}\n    {}".format(
+                seed, kind, len(cells), rules.local_search_limit, retract, move,
+                ", ".join("{} {}".format(name, answer) for name, answer in answers.items())))
+    return reports
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the local connectivity search of the engine with the flood "
+                                                 "fill and the connectivity oracle on random amoebas")
+    parser.add_argument("--seeds", "-n", type=int, default=50, help="Number of amoebas per shape")
+    parser.add_argument("--seed", "-s", type=int, default=1, help="First seed, seed i is seed + i")
+    parser.add_argument("--queries", "-q", type=int, default=60, help="Random moves checked per amoeba")
+    parser.add_argument("--shape", choices=list(SHAPES) + ["all"], default="all", help="Shape of the amoebas")
+    args = parser.parse_args()
+
+    shapes = list(SHAPES) if args.shape == "all" else [args.shape]
+    start_time = time.time()
+    mismatches = 0
+    for kind in shapes:
+        for seed in range(args.seed, args.seed + args.seeds):
+            for report in check_seed(seed, args.queries, kind):
+                mismatches += 1
+                print(report)
+
+    print("{} queries on {} amoebas ({}): {} mismatches, time taken: {:.1f}s".format(
+        args.seeds * args.queries * len(shapes), args.seeds * len(shapes), ", ".join(shapes), mismatches,
+        time.time() - start_time))
+    sys.exit(1 if mismatches else 0)
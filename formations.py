@@ -0,0 +1,190 @@
+import atexit
+import os
+from collections import OrderedDict
+import numpy as np
+import constants
+from precomp_store import PrecompStore
+
+# shared caches, one per formation family and store path, so that players of the same group reuse templates
+_caches = {}
+
+
+class FormationCache:
+    def __init__(self, maxsize=256, store=None):
+        """Bounded LRU cache of formation templates keyed by size and generator parameters.
+
+            Cached boards are read-only, callers translate them with translate() which returns a new array. Array
+            templates built during the game are written to the store at exit and memory-mapped from it on a later
+            miss, other templates (sets or tuples of offsets) are only kept in memory.
+
+            Args:
+                maxsize (int): maximum number of templates kept, the least recently used one is evicted first
+                store (PrecompStore): store the array templates are loaded from and saved to, None to keep them in
+                    memory
+        """
+        self.maxsize = maxsize
+        self.store = store
+        self.templates = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_name(key):
+        return "_".join(str(part) for part in key)
+
+    def get(self, key, build):
+        """Return the template for key, loading it from the store or calling build() to create it on a miss."""
+        if key in self.templates:
+            self.hits += 1
+            self.templates.move_to_end(key)
+            return self.templates[key]
+
+        self.misses += 1
+        name = self.file_name(key)
+        if self.store is not None and self.store.has(name):
+            template = self.store.load(name)
+        else:
+            template = build()
+            if isinstance(template, np.ndarray):
+                template.setflags(write=False)
+                if self.store is not None:
+                    self.pending[name] = template
+        self.templates[key] = template
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+        return template
+
+    def save(self):
+        """Write the array templates built since the last save to the store."""
+        if self.store is None:
+            return
+        for name, template in self.pending.items():
+            self.store.save(name, template)
+        self.pending = {}
+
+
+def formation_cache(name, precomp_dir=None, maxsize=256, version=1):
+    """Shared cache for a formation family, persisted to precomp_dir/formations_<name> at exit if given.
+
+        Args:
+            name (str): formation family, usually the group of the player
+            precomp_dir (str): directory path passed to the player, None to keep the templates in memory
+            maxsize (int): see FormationCache
+            version (int): version of the generators of the family, bump it whenever they change so that
+                templates stored by an older version are not reused
+    """
+    key = (name, precomp_dir, version)
+    if key not in _caches:
+        store = PrecompStore(os.path.join(precomp_dir, "formations_{}".format(name)), version=version) \
+            if precomp_dir else None
+        _caches[key] = FormationCache(maxsize, store)
+        atexit.register(_caches[key].save)
+    return _caches[key]
+
+
+def translate(template, shift_x=0, shift_y=0):
+    """Copy of a board template moved by (shift_x, shift_y) on the torus."""
+    return np.roll(template, (shift_x, shift_y), axis=(0, 1))
+
+
+class Formation:
+    def __init__(self, cells=None):
+        """Cells of a formation as an (N, 2) index array, the board mask is only built when it is asked for.
+
+            Generators add whole rows, columns and strided runs of cells at once with add(), coordinates are taken
+            modulo the map size and a cell added twice counts once.
+
+            Args:
+                cells (numpy array, optional): (N, 2) array of cells to start from
+        """
+        self.parts = []
+        self._mask = None
+        if cells is not None:
+            self.parts.append(np.asarray(cells, dtype=np.int64).reshape(-1, 2) % constants.map_dim)
+
+    def add(self, xs, ys):
+        """Add the cells (xs[i], ys[i]), scalars and arrays are broadcast against each other."""
+        xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64))
+        self.parts.append(np.stack((xs.ravel(), ys.ravel()), axis=1) % constants.map_dim)
+        self._mask = None
+
+    def merge(self, other):
+        """Add the cells of another Formation or of a board mask."""
+        if isinstance(other, Formation):
+            self.parts += other.parts
+            self._mask = None
+        else:
+            self.add(*np.nonzero(other))
+
+    @property
+    def cells(self):
+        if not self.parts:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(self.parts)
+
+    @property
+    def mask(self):
+        """int8 board, 1 on the cells of the formation. Built once, do not write to it."""
+        if self._mask is None:
+            self._mask = np.zeros((constants.map_dim, constants.map_dim), dtype=np.int8)
+            cells = self.cells
+            self._mask[cells[:, 0], cells[:, 1]] = 1
+        return self._mask
+
+    def count(self):
+        return int(np.count_nonzero(self.mask))
+
+
+def rake(length, start_x, start_y, spacing, phase, back=-1):
+    """Two cell wide bar along y with a tooth on the other side every spacing rows.
+
+        Args:
+            length (int): rows of the bar, from start_y down
+            start_x (int): column of the bar the teeth are attached to
+            start_y (int): first row
+            spacing (int): a row holds a tooth when y % spacing == phase, y taken modulo the map size
+            phase (int): see spacing
+            back (int): -1 for the second column of the bar on the left and the teeth on the right, 1 for the
+                mirrored rake
+        Returns:
+            Formation: cells of the rake
+    """
+    ys = np.arange(start_y, start_y + length) % constants.map_dim
+    formation = Formation()
+    formation.add([[start_x], [start_x + back]], ys)
+    formation.add(start_x - back, ys[ys % spacing == phase])
+    return formation
+
+
+def bar(length, end_x, y):
+    """length cells along x to the left of end_x (excluded) on row y."""
+    formation = Formation()
+    formation.add(end_x - np.arange(1, length + 1), y)
+    return formation
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FormationCache(store=PrecompStore(tmp_dir))
+        board = cache.get(("rake", 30, 50, 35, 2, 0), lambda: rake(30, 50, 35, 2, 0).mask)
+        offsets = cache.get(("offsets", 3), lambda: frozenset({(0, 0), (0, 1)}))
+        assert cache.misses == 2 and not board.flags.writeable
+        cache.save()
+
+        # templates built by an earlier run are memory-mapped, only array templates are stored
+        warm = FormationCache(store=PrecompStore(tmp_dir))
+        stored = warm.get(("rake", 30, 50, 35, 2, 0), lambda: None)
+        assert isinstance(stored, np.memmap) and stored.dtype == board.dtype and np.array_equal(stored, board)
+        assert warm.get(("offsets", 3), lambda: offsets) is offsets
+
+        # a new generator version does not see the templates of the old one
+        newer = FormationCache(store=PrecompStore(tmp_dir, version=2))
+        assert newer.get(("rake", 30, 50, 35, 2, 0), lambda: "rebuilt") == "rebuilt"
+
+    # caches of the same family with different paths are kept apart
+    assert formation_cache("check") is not formation_cache("check", "precomp_check")
+    assert formation_cache("check").store is None
+    print("FormationCache checks passed")
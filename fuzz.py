@@ -0,0 +1,215 @@
+import argparse
+import copy
+import sys
+import time
+import numpy as np
+import constants
+from amoeba_game import AmoebaGame
+from bacteria_field import BacteriaField
+from differential import Board, cells, new_game, fork_engine, random_action
+from invariants import check_board
+from occupancy import OccupancyProfile
+
+
+class FuzzPlayer:
+    def __init__(self, rng, logger, metabolism, goal_size, precomp_dir):
+        """Player returning random actions, most of them valid, the rest borderline or malformed.
+
+            Takes the arguments of a regular player so it can be plugged into the engine as well.
+        """
+        self.rng = rng
+        self.logger = logger
+        self.metabolism = metabolism
+        self.goal_size = goal_size
+        self.kind = None
+
+    def move(self, last_percept, current_percept, info):
+        self.kind, action = random_action(self.rng, current_percept.periphery, current_percept.movable_cells,
+                                          current_percept.current_size, self.metabolism)
+        return action
+
+
+class GameBoard(Board, AmoebaGame):
+    """AmoebaGame without a player, logging or rendering: the engine's own rules with bacteria kept as a list, plus
+    the occupancy profile and bacteria field it keeps up to date."""
+
+    @classmethod
+    def from_board(cls, board):
+        game = cls(np.copy(board.map_state), list(board.bacteria), copy.deepcopy(board.rng), board.amoeba_size,
+                   board.metabolism, board.density)
+        game.occupancy = OccupancyProfile(game.map_state > 0)
+        game.bacteria_field = BacteriaField(game.bacteria)
+        return game
+
+    def copy(self):
+        game = GameBoard(np.copy(self.map_state), list(self.bacteria), copy.deepcopy(self.rng), self.amoeba_size,
+                         self.metabolism, self.density)
+        game.player_byte = self.player_byte
+        game.occupancy = self.occupancy.copy()
+        game.bacteria_field = self.bacteria_field.copy()
+        return game
+
+
+def engine_problems(fork, game, expected=None, actual=None):
+    """Differences between the fork and the game engine after the same steps, with their results if given."""
+    problems = []
+    if fork.amoeba_size != game.amoeba_size:
+        problems.append("amoeba_size: fork {}, game {}".format(fork.amoeba_size, game.amoeba_size))
+    diff = np.argwhere(fork.map_state != game.map_state)
+    if len(diff):
+        x, y = diff[0]
+        problems.append("map_state differs on {} cells, first ({}, {}): fork {}, game {}".format(
+            len(diff), x, y, fork.map_state[x, y], game.map_state[x, y]))
+    if cells(fork.bacteria) != cells(game.bacteria):
+        problems.append("bacteria differ: fork {}, game {} bacteria".format(len(fork.bacteria), len(game.bacteria)))
+    if isinstance(expected, tuple):
+        for name, a, b in zip(("periphery", "eatable_bacteria", "movable_cells"), expected, actual):
+            if cells(a) != cells(b):
+                problems.append("{}: fork {} cells, game {} cells".format(name, len(a), len(b)))
+    elif expected != actual:
+        problems.append("result: fork {}, game {}".format(expected, actual))
+    return problems
+
+
+def play(game, info, action):
+    """One turn of the game engine with the given action, as the fuzzer plays it on a fork, returns the move status."""
+    game.eat_bacteria(info[1])
+    status = game.resolve_action(copy.deepcopy(action), info[0])
+    game.add_bacteria()
+    return status
+
+
+def tracking_problems(game):
+    """Differences between the views the game engine updates in place and the ones rebuilt from its board."""
+    problems = []
+    if not np.array_equal(game.occupancy.occupied, game.map_state > 0):
+        problems.append("game occupancy profile does not match the amoeba")
+    if not np.array_equal(game.bacteria_field.counts, BacteriaField(game.bacteria).counts):
+        problems.append("game bacteria field does not match the bacteria")
+    return problems
+
+
+def action_problems(status, action, before, after):
+    """Rules of a single action: a rejected action leaves the board alone, an accepted one moves the cells."""
+    if status != constants.move_accepted:
+        if not np.array_equal(before, after):
+            return ["rejected action (status {}) changed {} cells".format(
+                status, int((before != after).sum()))]
+        return []
+
+    retract, move, _ = action
+    problems = []
+    moved = {tuple(map(int, cell)) for cell in move}
+    if any(after[cell] <= 0 for cell in moved):
+        problems.append("accepted action left an extended cell outside the amoeba")
+    if any(after[tuple(map(int, cell))] > 0 for cell in retract if tuple(map(int, cell)) not in moved):
+        problems.append("accepted action left a retracted cell in the amoeba")
+    if int((before > 0).sum()) != int((after > 0).sum()):
+        problems.append("accepted action changed the amoeba size")
+    return problems
+
+
+def fuzz_seed(seed, turns, actions, size=None, metabolism=None, density=None, engine_every=100):
+    """Fuzz one game: every turn, actions random actions are applied to forks of the engine state and the board is
+    checked after each of them, the game then continues with the last accepted one.
+
+        GameBoard, the engine with bacteria as a list, plays every turn and every engine_every-th action too, and its
+        board has to match the one of the fork. It is about ten times slower than the fork, so checking every action
+        (engine_every=1) costs most of the throughput, 0 leaves it out.
+
+        Returns:
+            Tuple[int, str]: number of actions checked and a report of the first broken rule, None if none
+    """
+    params = np.random.default_rng([seed, 0])
+    size = size or int(params.integers(3, 16))
+    metabolism = metabolism or float(params.uniform(0.05, 1.0))
+    density = density or float(params.uniform(0.01, 0.5))
+    start = new_game(seed, size, metabolism, density)
+    state = fork_engine(start)
+    game = GameBoard.from_board(start) if engine_every else None
+    player = FuzzPlayer(np.random.default_rng([seed, 2]), None, metabolism, 4 * size ** 2, None)
+
+    def report(turn, step, problems, action=None):
+        lines = ["Seed {} (A={}, m={:.3f}, d={:.3f}): turn {}, {}".format(seed, size, metabolism, density, turn,
+                                                                         step)]
+        if action is not None:
+            lines.append("    action ({}): {}".format(player.kind, action))
+        lines += ["    " + problem for problem in problems]
+        return "\n".join(lines)
+
+    steps = 0
+    for turn in range(turns):
+        percept = state.advance()
+        problems = check_board(state.map_state, state.bacteria, state.amoeba_size, edited=True)
+        if game:
+            game.bacteria_move()
+            game_info = game.get_periphery_info(True)
+            problems += engine_problems(state, game, (percept.periphery, percept.bacteria, percept.movable_cells),
+                                        game_info[:3])
+            problems += tracking_problems(game)
+        if problems:
+            return steps, report(turn, "after get_periphery_info", problems)
+
+        chosen = None
+        for _ in range(actions):
+            fork = state.fork()
+            fork.own()
+            action = player.move(None, percept, fork.player_byte)
+            fork.eat_bacteria(fork.eatable_bacteria)
+            expected_size = state.amoeba_size + len(fork.eatable_bacteria)
+            before = np.copy(fork.map_state)
+            status = fork.resolve_action(copy.deepcopy(action), fork.periphery)
+            problems = action_problems(status, action, before, fork.map_state)
+            fork.add_bacteria()
+            problems += check_board(fork.map_state, fork.bacteria, fork.amoeba_size, density)
+            if fork.amoeba_size != expected_size:
+                problems.append("amoeba_size is {}, {} cells plus {} eaten bacteria expected".format(
+                    fork.amoeba_size, state.amoeba_size, len(fork.eatable_bacteria)))
+            if game and steps % engine_every == 0:
+                game_fork = game.copy()
+                game_status = play(game_fork, game_info, action)
+                problems += engine_problems(fork, game_fork, status, game_status)
+            steps += 1
+            if problems:
+                return steps, report(turn, "action {}".format(steps), problems, action)
+            if chosen is None or status == constants.move_accepted:
+                chosen = fork, action, status
+
+        state, action, status = chosen
+        if game:
+            # the game follows the fork the fuzzer continues with, whether that action was sampled or not
+            problems = engine_problems(state, game, status, play(game, game_info, action))
+            if problems:
+                return steps, report(turn, "continued action", problems, action)
+    return steps, None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throw random actions at the engine rules and check the board "
+                                                 "after every one of them")
+    parser.add_argument("--seeds", "-n", type=int, default=20, help="Number of seeds to fuzz")
+    parser.add_argument("--seed", "-s", type=int, default=1, help="First seed, seed i is seed + i")
+    parser.add_argument("--turns", "-t", type=int, default=50, help="Turns played per seed")
+    parser.add_argument("--actions", "-k", type=int, default=100, help="Random actions checked per turn")
+    parser.add_argument("--size", "-A", type=int, default=None, help="Initial amoeba side, drawn per seed if not set")
+    parser.add_argument("--metabolism", "-m", type=float, default=None, help="Drawn per seed if not set")
+    parser.add_argument("--density", "-d", type=float, default=None, help="Drawn per seed if not set")
+    parser.add_argument("--engine_every", "-e", type=int, default=100,
+                        help="Also play every e-th action with the game engine and compare the boards, 0 to disable")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    total = 0
+    failed = 0
+    for seed in range(args.seed, args.seed + args.seeds):
+        steps, failure = fuzz_seed(seed, args.turns, args.actions, args.size, args.metabolism, args.density,
+                                   args.engine_every)
+        total += steps
+        if failure:
+            failed += 1
+            print(failure)
+
+    elapsed = time.time() - start_time
+    print("{} actions on {} seeds, {} failed, time taken: {:.1f}s ({:.0f} actions/s)".format(
+        total, args.seeds, failed, elapsed, total / elapsed))
+    sys.exit(1 if failed else 0)
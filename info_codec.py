@@ -0,0 +1,56 @@
+class InfoCodec:
+    def __init__(self, *fields):
+        """Bit-field schema of the info byte a player passes to itself between turns.
+
+            Fields are declared from the least significant bit upward, e.g. InfoCodec(("shifted", 1), ("xmax", 7))
+            stores shifted in bit 0 and xmax in bits 1 to 7. Decoding a byte is a lookup in a table built once for
+            all 256 values, encoding is integer shifts, neither allocates strings.
+
+            Args:
+                fields (Tuple[str, int]): name and width in bits of every field
+        """
+        self.names = tuple(name for name, _ in fields)
+        self.shifts = {}
+        self.masks = {}
+        offset = 0
+        for name, width in fields:
+            self.shifts[name] = offset
+            self.masks[name] = (1 << width) - 1
+            offset += width
+        if offset > 8:
+            raise ValueError("Fields use {} bits, the info byte has 8".format(offset))
+
+        self.table = [self._unpack(byte) for byte in range(256)]
+
+    def _unpack(self, info):
+        return tuple((info >> self.shifts[name]) & self.masks[name] for name in self.names)
+
+    def unpack(self, info):
+        """Values of all fields of info, in declaration order."""
+        if 0 <= info < 256:
+            return self.table[info]
+        return self._unpack(info)
+
+    def pack(self, **values):
+        """Info byte holding the given field values, fields that are not given are 0."""
+        info = 0
+        for name, value in values.items():
+            if not 0 <= value <= self.masks[name]:
+                raise ValueError("{}={} does not fit in {} bits".format(name, value, self.masks[name].bit_length()))
+            info |= int(value) << self.shifts[name]
+        return info
+
+    def get(self, info, name):
+        return (info >> self.shifts[name]) & self.masks[name]
+
+    def replace(self, info, **values):
+        """Copy of info with the given fields set to new values."""
+        for name, value in values.items():
+            if not 0 <= value <= self.masks[name]:
+                raise ValueError("{}={} does not fit in {} bits".format(name, value, self.masks[name].bit_length()))
+            info = (int(info) & ~(self.masks[name] << self.shifts[name])) | (int(value) << self.shifts[name])
+        return info
+
+    def decode(self, info):
+        """Field values of info by name, used by the engine for logs and replays."""
+        return dict(zip(self.names, self.unpack(info)))
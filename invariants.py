@@ -0,0 +1,71 @@
+import math
+import numpy as np
+import constants
+from amoeba_kernels import any_neighbor
+from connectivity import NEIGHBORS
+
+
+def is_single_component(mask):
+    """True if the set cells of a boolean map form one 4-connected component on the torus, or there are none."""
+    cells = np.flatnonzero(mask).tolist()
+    if not cells:
+        return True
+
+    occupied = np.asarray(mask, dtype=bool).tobytes()
+    seen = {cells[0]}
+    stack = [cells[0]]
+    while stack:
+        for nbr in NEIGHBORS[stack.pop()]:
+            if occupied[nbr] and nbr not in seen:
+                seen.add(nbr)
+                stack.append(nbr)
+    return len(seen) == len(cells)
+
+
+def check_board(map_state, bacteria, amoeba_size, density=None, edited=False):
+    """Rules of the board the engine has to keep, returns a description of every one that is broken.
+
+        Args:
+            map_state (numpy array): engine map, -1 bacteria, 0 empty, 1 interior and 2 periphery
+            bacteria (List[Tuple[int, int]]): bacteria positions, a list of tuples or an (N, 2) array
+            amoeba_size (int): size the engine keeps track of
+            density (float): check that the number of bacteria matches the density, only true after add_bacteria
+            edited (bool): the map was just updated by get_periphery_info(True), so every periphery cell borders
+                an empty cell
+        Returns:
+            List[str]: broken rules, empty if the board is consistent
+    """
+    problems = []
+    amoeba = map_state > 0
+    if int(amoeba.sum()) != amoeba_size:
+        problems.append("amoeba_size is {} but {} cells are amoeba".format(amoeba_size, int(amoeba.sum())))
+    if not is_single_component(amoeba):
+        problems.append("amoeba is not connected")
+
+    cells = np.asarray(bacteria, dtype=np.int64).reshape(-1, 2)
+    flat = cells[:, 0] * constants.map_dim + cells[:, 1]
+    if len(np.unique(flat)) != len(flat):
+        problems.append("{} bacteria share a cell".format(len(flat) - len(np.unique(flat))))
+    misplaced = int((map_state[cells[:, 0], cells[:, 1]] != -1).sum())
+    if misplaced:
+        problems.append("{} bacteria are not on a bacteria cell".format(misplaced))
+    if int((map_state == -1).sum()) != len(cells):
+        problems.append("{} bacteria cells but {} bacteria".format(int((map_state == -1).sum()), len(cells)))
+    if density is not None:
+        target = math.floor(density * (constants.total_cells - amoeba_size))
+        if len(cells) != target:
+            problems.append("{} bacteria but the density asks for {}".format(len(cells), target))
+
+    next_to_empty = any_neighbor(map_state == 0)
+    interior = int(((map_state == 1) & next_to_empty).sum())
+    if interior:
+        problems.append("{} interior cells border an empty cell".format(interior))
+    if edited:
+        periphery = int(((map_state == 2) & ~next_to_empty).sum())
+        if periphery:
+            problems.append("{} periphery cells do not border an empty cell".format(periphery))
+    unknown = int((map_state < -1).sum() + (map_state > 2).sum())
+    if unknown:
+        problems.append("{} cells have an unknown code".format(unknown))
+
+    return problems
@@ -1,4 +1,5 @@
 import argparse
+import os
 from amoeba_game import AmoebaGame
 
 if __name__ == '__main__':
@@ -24,10 +25,38 @@ if __name__ == '__main__':
     parser.add_argument("--player", "-p", default="d", help="Specifying player")
     parser.add_argument("--vid_name", "-v", default="game", help="Naming the video file")
     parser.add_argument("--no_vid", "-nv", action="store_true", help="Stops generating video of the session")
+    parser.add_argument("--env_cache", "-ec", action="store_true", help="Cache the initial board and RNG state for "
+                                                                        "(seed, A, d) under precomp/env and reuse it "
+                                                                        "across players")
+    parser.add_argument("--allow_fork", action="store_true", help="Expose a fork() of the engine state on the current "
+                                                                  "percept for lookahead search")
+    parser.add_argument("--checkpoint", default=None, help="Path of the checkpoint file, defaults to "
+                                                           "checkpoint_p<player>_s<seed>.npz next to the logs")
+    parser.add_argument("--checkpoint_every", "-ce", type=int, default=0, help="Save a checkpoint every n turns, "
+                                                                              "specify 0 to disable checkpoints")
+    parser.add_argument("--resume", default=None, help="Resume the game from a checkpoint file")
+    parser.add_argument("--stall_turns", type=int, default=0, help="End the game if the amoeba size did not change for "
+                                                                   "n turns, specify 0 to disable")
+    parser.add_argument("--repeat_limit", type=int, default=0, help="End the game if the same amoeba layout is seen n "
+                                                                    "times, specify 0 to disable")
+    parser.add_argument("--invalid_turns", type=int, default=0, help="End the game after n rejected moves in a row, "
+                                                                     "specify 0 to disable")
+    parser.add_argument("--debug_overlay", action="store_true", help="Draw the debug overlays players push on the "
+                                                                      "rendered frames")
+    parser.add_argument("--bacteria_field", action="store_true", help="Expose a coarse bacteria density grid and a "
+                                                                       "nearest bacteria query on the current percept")
+    parser.add_argument("--check_invariants", "-ci", type=int, default=0, help="Check the board invariants every n "
+                                                                             "turns and log broken ones, specify 0 "
+                                                                             "to disable")
     args = parser.parse_args()
 
     if args.disable_logging:
         if args.log_path == "log":
             args.log_path = "results.log"
 
+    if args.checkpoint is None:
+        # one file per game, so that games run in parallel do not overwrite each other's checkpoints
+        log_dir = os.path.dirname(args.log_path) if args.disable_logging else args.log_path
+        args.checkpoint = os.path.join(log_dir, "checkpoint_p{}_s{}.npz".format(args.player, args.seed))
+
     amoeba_game = AmoebaGame(args)
@@ -0,0 +1,46 @@
+import numpy as np
+from cell_set import CellSet
+
+
+class MorphPlanner:
+    def __init__(self):
+        """Outstanding difference between the amoeba and a target formation, kept until the next update.
+
+            A player keeps one planner for the whole game and hands it the amoeba map of every percept together with
+            the formation it aims for. Both sides of the difference are CellSets built with a few vectorized passes
+            over the board, so a call costs about the same whatever changed, but no cell becomes a tuple unless diff
+            returns it. Eaten bacteria and rejected moves need no repair of their own, they show up in the amoeba map
+            of the next percept.
+
+            Cells come out in row-major order, the ascending linear index, and the sorts of the player break ties
+            in that order.
+        """
+        self.surplus = CellSet()
+        self.missing = CellSet()
+
+    def update(self, amoeba_map, target_map):
+        """Bring the difference up to date with the amoeba and the target formation.
+
+            Args:
+                amoeba_map (numpy array): map of the percept, cells > 0 are amoeba
+                target_map (numpy array): map of the formation, cells > 0 belong to it
+        """
+        amoeba = np.asarray(amoeba_map) > 0
+        target = np.asarray(target_map) > 0
+        self.surplus = CellSet.from_mask(amoeba & ~target)
+        self.missing = CellSet.from_mask(target & ~amoeba)
+
+    def diff(self, amoeba_map, target_map, retractable=None, extendable=None):
+        """Update, then the cells to retract and the cells to extend to in row-major order.
+
+            Args:
+                retractable (numpy array): mask the cells to retract are restricted to, None for no restriction
+                extendable (numpy array): mask the cells to extend to are restricted to, None for no restriction
+            Returns:
+                Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]: amoeba cells outside the formation and cells of
+                    the formation outside the amoeba
+        """
+        self.update(amoeba_map, target_map)
+        surplus = self.surplus if retractable is None else self.surplus.intersection(retractable)
+        missing = self.missing if extendable is None else self.missing.intersection(extendable)
+        return surplus.cells(), missing.cells()
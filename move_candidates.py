@@ -0,0 +1,117 @@
+import math
+import numpy as np
+import constants
+from amoeba_kernels import cell_neighbors, exposure
+from connectivity import NEIGHBORS
+
+
+def cut_cells(occupied):
+    """Cells of a boolean map whose removal alone splits the 4-connected component holding them on the torus.
+
+        Iterative Tarjan search over the set cells, linear in their number.
+
+        Returns:
+            Set[Tuple[int, int]]: articulation cells
+    """
+    inside = np.asarray(occupied, dtype=bool).tobytes()
+    depth = {}
+    low = {}
+    cuts = set()
+    for root in np.flatnonzero(occupied).tolist():
+        if root in depth:
+            continue
+        depth[root] = low[root] = 0
+        children = 0
+        stack = [(root, None, iter(NEIGHBORS[root]))]
+        while stack:
+            cell, parent, nbrs = stack[-1]
+            for nbr in nbrs:
+                if not inside[nbr] or nbr == parent:
+                    continue
+                if nbr in depth:
+                    low[cell] = min(low[cell], depth[nbr])
+                else:
+                    depth[nbr] = low[nbr] = depth[cell] + 1
+                    stack.append((nbr, cell, iter(NEIGHBORS[nbr])))
+                    break
+            else:
+                stack.pop()
+                if parent is None:
+                    continue
+                low[parent] = min(low[parent], low[cell])
+                if parent == root:
+                    children += 1
+                elif low[cell] >= depth[parent]:
+                    cuts.add(parent)
+        if children > 1:
+            cuts.add(root)
+    return {divmod(cell, constants.map_dim) for cell in cuts}
+
+
+class MoveCandidates:
+    def __init__(self, current_size, amoeba_map, periphery, movable_cells, bacteria):
+        """Hashed retract and extend candidates of a percept, built once and shared by everything the player calls.
+
+            Args:
+                current_size (int): size of the amoeba
+                amoeba_map (numpy array): 1 for amoeba cells, 0 otherwise
+                periphery (List[Tuple[int, int]]): cells that can be retracted
+                movable_cells (List[Tuple[int, int]]): cells that can be extended to
+                bacteria (List[Tuple[int, int]]): bacteria eaten before the move is applied
+        """
+        self.current_size = current_size
+        self.amoeba_map = amoeba_map
+        self.retractable = set(periphery)
+        self.extendable = set(movable_cells)
+        self.bacteria = set(bacteria)
+        # periphery cells next to a bacterium, retracting them gives up the cell the bacterium is eaten from
+        self.bacteria_adjacent = self.retractable.intersection(
+            map(tuple, cell_neighbors(list(self.bacteria)).reshape(-1, 2).tolist()))
+        self.safe_retracts = self.retractable - self.bacteria_adjacent
+        self._masks = {}
+        self._exposure = None
+        self._cut_cells = None
+
+    def max_moves(self, metabolism):
+        """Largest number of cells the engine lets the amoeba move this turn, it counts the bacteria eaten first."""
+        return math.ceil(metabolism * (self.current_size + len(self.bacteria)))
+
+    def mask(self, cells):
+        mask = np.zeros((constants.map_dim, constants.map_dim), dtype=bool)
+        if cells:
+            x, y = zip(*cells)
+            mask[list(x), list(y)] = True
+        return mask
+
+    def cached_mask(self, name):
+        """Read-only mask of one of the candidate sets, built on first use"""
+        if name not in self._masks:
+            self._masks[name] = self.mask(getattr(self, name))
+            self._masks[name].setflags(write=False)
+        return self._masks[name]
+
+    @property
+    def retractable_mask(self):
+        return self.cached_mask("retractable")
+
+    @property
+    def extendable_mask(self):
+        return self.cached_mask("extendable")
+
+    @property
+    def safe_retracts_mask(self):
+        return self.cached_mask("safe_retracts")
+
+    @property
+    def exposure(self):
+        """Number of neighbors outside the amoeba of every cell, see amoeba_kernels.exposure."""
+        if self._exposure is None:
+            self._exposure = exposure(self.amoeba_map)
+        return self._exposure
+
+    @property
+    def cut_cells(self):
+        """Cells of the amoeba, eaten bacteria included, that cannot be retracted on their own without splitting it."""
+        if self._cut_cells is None:
+            self._cut_cells = cut_cells((self.amoeba_map > 0) | self.mask(self.bacteria))
+        return self._cut_cells
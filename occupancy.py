@@ -0,0 +1,130 @@
+import numpy as np
+
+
+def circular_runs(line):
+    """Runs of set cells along a line of the torus, a run crossing the border is merged into one.
+
+        Args:
+            line (numpy array): 1D boolean array
+        Returns:
+            List[Tuple[int, int]]: (start, length) of every run, sorted by start, start + length may go past the end
+    """
+    n = len(line)
+    padded = np.concatenate(([False], line, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[::2], edges[1::2]
+    runs = [(int(s), int(e - s)) for s, e in zip(starts, ends)]
+    if len(runs) > 1 and runs[0][0] == 0 and runs[-1][0] + runs[-1][1] == n:
+        first = runs.pop(0)
+        start, length = runs.pop()
+        runs.append((start, length + first[1]))
+    return runs
+
+
+def circular_extent(line):
+    """Shortest arc of a line of the torus holding all of its set cells.
+
+        Returns:
+            Tuple[int, int]: (low, high) with low < map_dim and high >= low, high may go past the end of the line when
+                the arc crosses the border (take it modulo map_dim), None if no cell is set
+    """
+    runs = circular_runs(line)
+    if not runs:
+        return None
+    n = len(line)
+    if len(runs) == 1:
+        start, length = runs[0]
+        return start, start + length - 1
+
+    # the arc is everything but the widest gap between two consecutive runs
+    gaps = [(runs[(k + 1) % len(runs)][0] - (runs[k][0] + runs[k][1])) % n for k in range(len(runs))]
+    k = int(np.argmax(gaps))
+    low = runs[(k + 1) % len(runs)][0]
+    high = runs[k][0] + runs[k][1] - 1
+    while high < low:
+        high += n
+    return low, high
+
+
+class OccupancyProfile:
+    def __init__(self, occupied):
+        """Per-column and per-row occupancy of the amoeba, kept up to date cell by cell as the amoeba moves.
+
+            Columns are indexed by x, the first index of the map, and rows by y. Runs and extents of a line are
+            computed on first use and cached until a cell of that line changes.
+
+            Args:
+                occupied (numpy array): boolean map of the amoeba cells, copied
+        """
+        self.occupied = np.array(occupied, dtype=bool)
+        self.column_counts = self.occupied.sum(axis=1)
+        self.row_counts = self.occupied.sum(axis=0)
+        self.cache = {}
+
+    def copy(self):
+        profile = OccupancyProfile.__new__(OccupancyProfile)
+        profile.occupied = self.occupied.copy()
+        profile.column_counts = self.column_counts.copy()
+        profile.row_counts = self.row_counts.copy()
+        profile.cache = dict(self.cache)
+        return profile
+
+    def update(self, removed=(), added=()):
+        """Remove then add amoeba cells, cells already in the right state are skipped.
+
+            Args:
+                removed (List[Tuple[int, int]]): cells leaving the amoeba
+                added (List[Tuple[int, int]]): cells joining the amoeba
+        """
+        for value, cells in ((False, removed), (True, added)):
+            step = 1 if value else -1
+            for x, y in cells:
+                x, y = int(x), int(y)
+                if self.occupied[x, y] == value:
+                    continue
+                self.occupied[x, y] = value
+                self.column_counts[x] += step
+                self.row_counts[y] += step
+                self.cache.pop(("column", x), None)
+                self.cache.pop(("row", y), None)
+        if removed or added:
+            self.cache.pop("columns", None)
+            self.cache.pop("rows", None)
+
+    def cached(self, key, line):
+        if key not in self.cache:
+            self.cache[key] = (circular_runs(line), circular_extent(line))
+        return self.cache[key]
+
+    def column_runs(self, x):
+        """(start y, length) of the runs of amoeba cells in column x."""
+        return self.cached(("column", x), self.occupied[x, :])[0]
+
+    def row_runs(self, y):
+        """(start x, length) of the runs of amoeba cells in row y."""
+        return self.cached(("row", y), self.occupied[:, y])[0]
+
+    def column_extent(self, x):
+        """(low y, high y) of the amoeba cells in column x, see circular_extent."""
+        return self.cached(("column", x), self.occupied[x, :])[1]
+
+    def row_extent(self, y):
+        """(low x, high x) of the amoeba cells in row y, see circular_extent."""
+        return self.cached(("row", y), self.occupied[:, y])[1]
+
+    def x_extent(self):
+        """(low x, high x) of the columns holding amoeba cells, see circular_extent."""
+        return self.cached("columns", self.column_counts > 0)[1]
+
+    def y_extent(self):
+        """(low y, high y) of the rows holding amoeba cells, see circular_extent."""
+        return self.cached("rows", self.row_counts > 0)[1]
+
+    def x_runs(self):
+        """(start x, length) of the runs of columns holding amoeba cells."""
+        return self.cached("columns", self.column_counts > 0)[0]
+
+    def y_runs(self):
+        """(start y, length) of the runs of rows holding amoeba cells."""
+        return self.cached("rows", self.row_counts > 0)[0]
+
@@ -1,5 +1,3 @@
-import os
-import pickle
 import numpy as np
 import logging
 from amoeba_state import AmoebaState
@@ -18,20 +16,11 @@ class Player:
                 precomp_dir (str): Directory path to store/load pre-computation
         """
 
-        # precomp_path = os.path.join(precomp_dir, "{}.pkl".format(map_path))
-
-        # # precompute check
-        # if os.path.isfile(precomp_path):
-        #     # Getting back the objects:
-        #     with open(precomp_path, "rb") as f:
-        #         self.obj0, self.obj1, self.obj2 = pickle.load(f)
-        # else:
-        #     # Compute objects to store
-        #     self.obj0, self.obj1, self.obj2 = _
-
-        #     # Dump the objects
-        #     with open(precomp_path, 'wb') as f:
-        #         pickle.dump([self.obj0, self.obj1, self.obj2], f)
+        # from precomp_store import PrecompStore
+        # store = PrecompStore(precomp_dir, metabolism, goal_size)
+        #
+        # # precompute check, computed and stored on the first run, memory-mapped afterwards
+        # self.obj0 = store.get("obj0", lambda: _)
 
         self.rng = rng
         self.logger = logger
@@ -67,11 +56,14 @@ class Player:
 
     def find_movable_cells(self, retract, periphery, amoeba_map, bacteria, mini):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         movable += retract
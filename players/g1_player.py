@@ -149,15 +149,13 @@ class Player:
         if not set(retract).issubset(set(periphery)):
             return False
 
-        movable = retract[:]
+        movable = set(retract)
+        bacteria = set(current_precept.bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j, current_precept.amoeba_map, current_precept.bacteria )
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
+            movable.update(self.find_movable_neighbor(i, j, current_precept.amoeba_map, bacteria))
 
-        if not set(move).issubset(set(movable)):
+        if not set(move).issubset(movable):
             return False
 
         amoeba = np.copy(current_precept.amoeba_map)
@@ -281,11 +279,14 @@ class Player:
 
     def find_movable_cells(self, periphery, amoeba_map, bacteria, mini):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         #movable += retract
@@ -10,7 +10,13 @@ import numpy as np
 import numpy.typing as npt
 
 import constants
+from amoeba_kernels import free_neighbors
 from amoeba_state import AmoebaState
+from base_player import BasePlayer
+from cell_set import CellSet
+from assignment import assign_moves
+from formations import Formation, formation_cache
+from info_codec import InfoCodec
 
 turn = 0
 
@@ -24,6 +30,7 @@ CENTER_Y = constants.map_dim // 2
 
 COMB_SEPARATION_DIST = 4
 TEETH_GAP = 3
+FORMATION_VERSION = 2
 
 VERTICAL_SHIFT_PERIOD = 2
 VERTICAL_SHIFT_LIST = (
@@ -40,14 +47,11 @@ VERTICAL_SHIFT_LIST = (
 
 
 def map_to_coords(amoeba_map: npt.NDArray) -> list[Tuple[int, int]]:
-    return list(map(tuple, np.transpose(amoeba_map.nonzero()).tolist()))
+    return CellSet.from_mask(amoeba_map).cells()
 
 
-def coords_to_map(coords: list[tuple[int, int]], size=constants.map_dim) -> npt.NDArray:
-    amoeba_map = np.zeros((size, size), dtype=np.int8)
-    for x, y in coords:
-        amoeba_map[x, y] = 1
-    return amoeba_map
+def coords_to_map(coords: list[tuple[int, int]]) -> npt.NDArray:
+    return CellSet.from_cells(coords).mask(np.int8)
 
 
 def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[], title="") -> None:
@@ -79,74 +83,41 @@ def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[], title="")
 # ---------------------------------------------------------------------------- #
 
 
+# the backbone column takes the 7 bits above the initialized flag
+INFO_CODEC = InfoCodec(("initialized", 1), ("backbone_col", 7))
+
+
 class MemoryFields(Enum):
     Initialized = 0
-    Translating = 1
 
 
 def read_memory(memory: int) -> dict[MemoryFields, bool]:
-    out = {}
-    for field in MemoryFields:
-        value = True if (memory & (1 << field.value)) >> field.value else False
-        out[field] = value
-    return out
+    return {field: bool(INFO_CODEC.get(memory, field.name.lower())) for field in MemoryFields}
 
 
 def change_memory_field(memory: int, field: MemoryFields, value: bool) -> int:
-    bit = 1 if value else 0
-    mask = 1 << field.value
-    # Unset the bit, then or in the new bit
-    return (memory & ~mask) | ((bit << field.value) & mask)
+    return INFO_CODEC.replace(memory, **{field.name.lower(): 1 if value else 0})
 
 
 if __name__ == "__main__":
     memory = 0
     fields = read_memory(memory)
     assert fields[MemoryFields.Initialized] == False
-    assert fields[MemoryFields.Translating] == False
+    assert INFO_CODEC.get(memory, "backbone_col") == 0
 
     memory = change_memory_field(memory, MemoryFields.Initialized, True)
     fields = read_memory(memory)
     assert fields[MemoryFields.Initialized] == True
-    assert fields[MemoryFields.Translating] == False
 
-    memory = change_memory_field(memory, MemoryFields.Translating, True)
+    memory = INFO_CODEC.replace(memory, backbone_col=99)
     fields = read_memory(memory)
     assert fields[MemoryFields.Initialized] == True
-    assert fields[MemoryFields.Translating] == True
-
-    memory = change_memory_field(memory, MemoryFields.Translating, False)
-    fields = read_memory(memory)
-    assert fields[MemoryFields.Initialized] == True
-    assert fields[MemoryFields.Translating] == False
+    assert INFO_CODEC.get(memory, "backbone_col") == 99
 
     memory = change_memory_field(memory, MemoryFields.Initialized, False)
     fields = read_memory(memory)
     assert fields[MemoryFields.Initialized] == False
-    assert fields[MemoryFields.Translating] == False
-
-
-# ---------------------------------------------------------------------------- #
-#                               Formation Class                                #
-# ---------------------------------------------------------------------------- #
-
-
-class Formation:
-    def __init__(self, initial_formation=None) -> None:
-        self.map = (
-            initial_formation
-            if initial_formation
-            else np.zeros((constants.map_dim, constants.map_dim), dtype=np.int8)
-        )
-
-    def add_cell(self, x, y) -> None:
-        self.map[x % constants.map_dim, y % constants.map_dim] = 1
-        
-    def get_cell(self, x, y) -> int:
-        return self.map[x % constants.map_dim, y % constants.map_dim]
-
-    def merge_formation(self, formation_map: npt.NDArray):
-        self.map = np.logical_or(self.map, formation_map)
+    assert INFO_CODEC.get(memory, "backbone_col") == 99
 
 
 # ---------------------------------------------------------------------------- #
@@ -154,7 +125,9 @@ class Formation:
 # ---------------------------------------------------------------------------- #
 
 
-class Player:
+class Player(BasePlayer):
+    info_codec = INFO_CODEC
+
     def __init__(
         self,
         rng: np.random.Generator,
@@ -188,35 +161,34 @@ class Player:
         #     with open(precomp_path, 'wb') as f:
         #         pickle.dump([self.obj0, self.obj1, self.obj2], f)
 
-        self.rng = rng
-        self.logger = logger
-        self.metabolism = metabolism
-        self.goal_size = goal_size
-        self.current_size = goal_size / 4
+        super().__init__(rng, logger, metabolism, goal_size, precomp_dir)
 
-        # Class accessible percept variables, written at the start of each turn
-        self.current_size: int = None
-        self.amoeba_map: npt.NDArray = None
-        self.bacteria_cells: set[Tuple[int, int]] = None
-        self.retractable_cells: List[Tuple[int, int]] = None
-        self.extendable_cells: List[Tuple[int, int]] = None
-        self.num_available_moves: int = None
+        self.formations = formation_cache("g2", precomp_dir, version=FORMATION_VERSION)
 
     def generate_comb_formation(
         self, size: int, tooth_offset=0, center_x=CENTER_X, center_y=CENTER_Y, comb_idx=0
+    ) -> npt.NDArray:
+        return self.formations.get(
+            ("comb", size, tooth_offset, center_x, center_y, comb_idx, TEETH_GAP, COMB_SEPARATION_DIST),
+            lambda: self.build_comb_formation(size, tooth_offset, center_x, center_y, comb_idx),
+        )
+
+    def build_comb_formation(
+        self, size: int, tooth_offset=0, center_x=CENTER_X, center_y=CENTER_Y, comb_idx=0
     ) -> npt.NDArray:
         formation = Formation()
         comb_0_center_x = center_x
 
         if size < 2:
-            return formation.map
+            return formation.mask
 
         teeth_size = min((size // ((TEETH_GAP + 1) * 2 + 1)), 49)
         backbone_size = min((size - teeth_size) // 2, 99)
         cells_used = backbone_size * 2 + teeth_size
+        two_combs = backbone_size == 99 and comb_idx == 0
 
         # If we have hit our max size, form an additional comb and connect it via a bridge
-        if backbone_size == 99 and comb_idx == 0:
+        if two_combs:
             center_x_offset = np.absolute(center_x - CENTER_X)
 
             if size > cells_used * 2:
@@ -234,46 +206,38 @@ class Player:
                 center_y,
                 1
             )
-            formation.merge_formation(second_comb)
+            formation.merge(second_comb)
 
             # Bridge between the two combs
-            for i in range(comb_0_center_x, comb_1_center_x):
-                formation.add_cell(i, center_y)
-
-        # Build first comb formation
-        formation.add_cell(comb_0_center_x, center_y)
-        formation.add_cell(comb_0_center_x - 1, center_y)
-        for i in range(1, round((backbone_size - 1) / 2 + 0.1) + 1):
-            # first layer of backbone
-            formation.add_cell(comb_0_center_x, center_y + i)
-            formation.add_cell(comb_0_center_x, center_y - i)
-            # second layer of backbone
-            formation.add_cell(comb_0_center_x - 1, center_y + i)
-            formation.add_cell(comb_0_center_x - 1, center_y - i)
-        for i in range(
-            1,
-            round(min((teeth_size * (TEETH_GAP + 1)) / 2, backbone_size / 2) + 0.1),
-            TEETH_GAP + 1,
-        ):
-            formation.add_cell(comb_0_center_x + 1, center_y + tooth_offset + i)
-            formation.add_cell(comb_0_center_x + 1, center_y + tooth_offset - i)   
-
-        # If we build a second comb, build up additional cells in the center
-        if backbone_size == 99 and comb_idx == 0:
-            cells_remaining = size - np.count_nonzero(formation.map)
-            bridge_offset = 1
-            while cells_remaining > 0 and bridge_offset < 99:
-                for i in range(comb_0_center_x, comb_1_center_x):
-                    offset = bridge_offset if bridge_offset <= 49 else 50 - bridge_offset
-                    if formation.get_cell(i, center_y + offset) == 0:
-                        formation.add_cell(i, center_y + offset)
-                        cells_remaining -= 1
-                        if cells_remaining <= 0:
-                            break
-                bridge_offset += 1
-                
-        # show_amoeba_map(formation.map)
-        return formation.map
+            bridge_xs = np.arange(comb_0_center_x, comb_1_center_x)
+            formation.add(bridge_xs, center_y)
+
+        # Build first comb formation: two layers of backbone and the teeth
+        backbone = np.arange(1, round((backbone_size - 1) / 2 + 0.1) + 1)
+        formation.add([[comb_0_center_x], [comb_0_center_x - 1]],
+                      np.concatenate(([center_y], center_y + backbone, center_y - backbone)))
+        teeth = np.arange(1, round(min((teeth_size * (TEETH_GAP + 1)) / 2, backbone_size / 2) + 0.1), TEETH_GAP + 1)
+        formation.add(comb_0_center_x + 1, np.concatenate((center_y + tooth_offset + teeth,
+                                                           center_y + tooth_offset - teeth)))
+
+        if not two_combs:
+            return formation.mask
+
+        # If we build a second comb, build up additional cells in the center, row by row
+        comb_map = formation.mask.astype(bool)
+        cells_remaining = size - np.count_nonzero(comb_map)
+        bridge_offset = 1
+        bridge_xs = bridge_xs % constants.map_dim
+        while cells_remaining > 0 and bridge_offset < 99:
+            offset = bridge_offset if bridge_offset <= 49 else 50 - bridge_offset
+            row = (center_y + offset) % constants.map_dim
+            free = bridge_xs[~comb_map[bridge_xs, row]][:cells_remaining]
+            comb_map[free, row] = True
+            cells_remaining -= len(free)
+            bridge_offset += 1
+
+        # the two comb formation is a boolean map, the single comb one an int8 map
+        return comb_map
 
     def get_morph_moves(
         self, desired_amoeba: npt.NDArray
@@ -282,48 +246,24 @@ class Player:
         to morph the amoeba shape towards the desired shape.
         """
 
-        current_points = map_to_coords(self.amoeba_map)
-        desired_points = map_to_coords(desired_amoeba)
-
-        potential_retracts = [
-            p
-            for p in list(set(current_points).difference(set(desired_points)))
-            if p in self.retractable_cells
-        ]
-        potential_extends = [
-            p
-            for p in list(set(desired_points).difference(set(current_points)))
-            if p in self.extendable_cells
-        ]
+        current_points = CellSet.from_mask(self.amoeba_map)
+        desired_points = CellSet.from_mask(desired_amoeba)
+
+        potential_retracts = current_points.difference(desired_points).intersection(
+            self.candidates.retractable_mask
+        ).cells()
+        potential_extends = desired_points.difference(current_points).intersection(
+            self.candidates.extendable_mask
+        ).cells()
         potential_extends.sort(key=lambda p: p[1])
 
         # show_amoeba_map(desired_amoeba, title="Desired Amoeba")
         # show_amoeba_map(self.amoeba_map, potential_retracts, potential_extends, title="Current Amoeba, Potential Retracts and Extends")
 
-        # Loop through potential extends, searching for a matching retract
-        retracts = []
-        extends = []
-        check_calls = 0
-        for potential_extend in [p for p in potential_extends]:
-            # Ensure we only move as much as possible given our current metabolism
-            if len(extends) >= self.num_available_moves:
-                break
-
-            matching_retracts = list(potential_retracts)
-            matching_retracts.sort(key=lambda p: math.dist(p, potential_extend))
-
-            for i in range(len(matching_retracts)):
-                retract = matching_retracts[i]
-                # Matching retract found, add the extend and retract to our lists
-                if self.check_move(retracts + [retract], extends + [potential_extend]):
-                    check_calls += 1
-                    retracts.append(retract)
-                    potential_retracts.remove(retract)
-                    extends.append(potential_extend)
-                    potential_extends.remove(potential_extend)
-                    break
-                check_calls += 1
-        # print(f"Check calls: {check_calls} / {self.current_size}")
+        # Loop through potential extends, pairing each with the closest retract that keeps the move legal,
+        # while we have metabolism left
+        retracts, extends = assign_moves(potential_extends, potential_retracts, self.num_available_moves,
+                                         self.check_move)
 
         # If we have moves remaining, try and get closer to the desired formation
         # if len(extends) < self.num_available_moves and len(potential_retracts):
@@ -346,15 +286,19 @@ class Player:
         #                 break
 
         # show_amoeba_map(self.amoeba_map, retracts, extends, title="Current Amoeba, Selected Retracts and Extends")
+        self.overlay.push(retract=retracts, extend=extends, target=desired_points, label="morph")
         return retracts, extends
 
     def find_movable_cells(self, retract, periphery, amoeba_map, bacteria, mini):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         movable += retract
@@ -385,11 +329,7 @@ class Player:
 
         movable = set(retracts[:])
         new_periphery = list(set(self.retractable_cells).difference(set(retracts)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j, self.amoeba_map, self.bacteria_cells)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.add((x, y))
+        movable.update(free_neighbors(new_periphery, self.amoeba_map == 0))
 
         if not set(extends).issubset(movable):
             return False
@@ -433,16 +373,6 @@ class Player:
 
         return (amoeba == check).all()
 
-    def store_current_percept(self, current_percept: AmoebaState) -> None:
-        self.current_size = current_percept.current_size
-        self.amoeba_map = current_percept.amoeba_map
-        self.retractable_cells = current_percept.periphery
-        self.bacteria_cells = set(current_percept.bacteria)
-        self.extendable_cells = current_percept.movable_cells
-        self.num_available_moves = int(
-            np.ceil(self.metabolism * current_percept.current_size)
-        )
-
     def move(
         self, last_percept: AmoebaState, current_percept: AmoebaState, info: int
     ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], int]:
@@ -473,12 +403,12 @@ class Player:
             )
             if len(moves) == 0:
                 info = change_memory_field(info, MemoryFields.Initialized, True)
-                info = (50 << 1) | info
+                info = INFO_CODEC.replace(info, backbone_col=50)
                 memory_fields = read_memory(info)
 
         if memory_fields[MemoryFields.Initialized]:
             # Extract backbone column from memory
-            curr_backbone_col = info >> 1
+            curr_backbone_col = INFO_CODEC.get(info, "backbone_col")
             vertical_shift = VERTICAL_SHIFT_LIST[curr_backbone_col]
             next_comb = self.generate_comb_formation(
                 self.current_size, vertical_shift, curr_backbone_col, CENTER_Y
@@ -501,6 +431,6 @@ class Player:
                     self.current_size, vertical_shift, prev_backbone_col, CENTER_Y
                 )
                 retracts, moves = self.get_morph_moves(next_comb)
-                info = new_backbone_col << 1 | 1
+                info = INFO_CODEC.pack(initialized=1, backbone_col=new_backbone_col)
 
         return retracts, moves, info
@@ -2,7 +2,10 @@ import os
 import pickle
 import numpy as np
 import logging
+from amoeba_kernels import free_neighbors
 from amoeba_state import AmoebaState
+from formations import formation_cache
+from info_codec import InfoCodec
 import constants
 
 from typing import Tuple, List
@@ -11,7 +14,12 @@ import math
 
 MAP_LENGTH = 100
 
+# 0 == initialization, 1 - 100 => 0 - 99 == x_cord, the first bit is unused right now
+INFO_CODEC = InfoCodec(("x_cord", 7), ("unused", 1))
+
 class Player:
+    info_codec = INFO_CODEC
+
     def __init__(self, rng: np.random.Generator, logger: logging.Logger, metabolism: float, goal_size: int,
                  precomp_dir: str) -> None:
         """Initialise the player with the basic amoeba information
@@ -48,6 +56,7 @@ class Player:
         self.amoeba_map = None
         self.periphery = None
         self.bacteria = None
+        self.formations = formation_cache("g3", precomp_dir)
         self.movable_cells = None
         self.num_available_moves = 0
         self.static_center = [50, 50]
@@ -61,15 +70,11 @@ class Player:
         if not set(retracts).issubset(self.periphery):
             return False
 
-        movable = retracts[:]
+        movable = set(retracts)
         new_periphery = list(self.periphery.difference(set(retracts)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j, self.amoeba_map, self.bacteria)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
+        movable.update(free_neighbors(new_periphery, self.amoeba_map == 0))
 
-        if not set(extends).issubset(set(movable)):
+        if not set(extends).issubset(movable):
             return False
 
         amoeba = np.copy(self.amoeba_map)
@@ -112,11 +117,14 @@ class Player:
 
     def find_movable_cells(self, retract, periphery, amoeba_map, bacteria, mini):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         movable += retract
@@ -155,6 +163,10 @@ class Player:
 
     # Find shape given size of anoemba, in the form of a list of offsets from center
     def get_desired_shape(self, shape=1):
+        offsets = self.formations.get(("shape", self.current_size, shape), lambda: frozenset(self.build_desired_shape(shape)))
+        return set(offsets)
+
+    def build_desired_shape(self, shape=1):
         # Assume base shape given size is always > 5
         offsets = {(0,0), (0,1), (0,-1), (1,1), (1,-1)}
         total_cells = self.current_size-5
@@ -325,10 +337,7 @@ class Player:
         #     center_point = self.get_center_point(current_percept, 0)
         
         ### PARSE INFO BYTE ###
-        info_bin = format(info, '08b')
-        info_first_bit = info_bin[0]    # first bit of the info byte
-        info_L7_bits = info_bin[1:]     # last 7 bits of the info byte
-        info_L7_int = int(info_L7_bits, 2)  # info_L7_int holds int value of last 7 bits (stores coordinate)
+        info_L7_int, info_first_bit = INFO_CODEC.unpack(info)  # info_L7_int holds int value of last 7 bits (stores coordinate)
 
 
         ### GET DESIRED OFFSETS FOR CURRENT MORPH ###
@@ -373,12 +382,9 @@ class Player:
         # 0 == initialization
         # 1 - 100 => 0 - 99 == x_cord
         if init_phase:
-            info_L7_bits = format(0, '07b')
+            info = INFO_CODEC.pack(unused=info_first_bit, x_cord=0)
         else:
-            info_L7_bits = format(x_cord + 1, '07b')
-        
-        info_bin = info_first_bit + info_L7_bits
-        info = int(info_bin, 2)
+            info = INFO_CODEC.pack(unused=info_first_bit, x_cord=x_cord + 1)
 
         return retracts, moves, info
     
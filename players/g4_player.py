@@ -3,16 +3,17 @@ from enum import Enum
 import logging
 import math
 import os
-import shutil
 import sys
 from typing import Optional
 
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 import numpy as np
 
 sys.path.append(os.getcwd())
+from amoeba_kernels import exposure as empty_neighbors
 from amoeba_state import AmoebaState
+from connectivity import ConnectivityOracle
+from formations import formation_cache
+from info_codec import InfoCodec
 import constants
 
 
@@ -20,16 +21,7 @@ import constants
 #  Miscellaneous
 #------------------------------------------------------------------------------
 
-debug_png_dir = "render/debug"
 debug = 0
-debug_since = 50
-turns = 0
-
-if debug:
-    if os.path.exists(debug_png_dir):
-        shutil.rmtree(debug_png_dir)
-
-    os.mkdir(debug_png_dir)
 
 
 #------------------------------------------------------------------------------
@@ -42,83 +34,6 @@ class State(Enum):
     empty, ameoba, bacteria = range(3)
 
 
-#------------------------------------------------------------------------------
-#  Debug Helpers
-#------------------------------------------------------------------------------
-
-def visualize_reshape(
-    target: list[cell], ameoba: list[cell], bacteria: list[cell],
-    occupiable: list[cell], retractable: list[cell],
-    retract: list[cell], extend: list[cell]):
-
-    global turns
-    turns += 1
-
-    if not debug or turns < debug_since:
-        return
-
-
-    axes = []
-    for fig_no in [2, 3]:
-        plt.figure(fig_no)
-        plt.cla()
-        plt.title(f"turn {turns}")
-        ax = plt.gca()
-        axes.append(ax)
-
-    ax1, ax2 = axes
-    
-    # marker sizes
-    size_xs = mpl.rcParams['lines.markersize'] / 4
-    size_s = (mpl.rcParams['lines.markersize'] / 4) ** 2
-
-    # common: ameoba
-    for ax in [ax1, ax2]:
-        ax.plot(*list(zip(*ameoba)), 'g.', label='ameoba', markersize=size_xs)
-
-    def scatter(ax: plt.Axes, pts: list[cell], **kwargs) -> None:
-        if len(pts) == 0:
-            return
-
-        ax.scatter(*list(zip(*pts)), **kwargs)
-
-
-    # subplot 1: ameoba & target
-    ax1.plot(*list(zip(*target)), 'rs', label='target', markersize=size_s, markerfacecolor='none')
-
-    # subplot 2: retract, extend, bacteria
-    scatter(
-        ax2, retract, label='retract',
-        facecolors='none', edgecolors='forestgreen', marker='s', s=size_s
-    )
-    scatter(
-        ax2, extend, label='extend',
-        facecolors='none', edgecolors='tab:purple', s=size_s
-    )
-    scatter(
-        ax2, bacteria, label='bacteria',
-        facecolors='none', edgecolors='orange', marker='s', s=size_s
-    )
-
-    # legend
-    ax1.legend(
-        loc='upper center', bbox_to_anchor=(0.5, 1.1),
-        ncol=4, fancybox=True, shadow=True
-    )
-    ax2.legend(
-        loc='upper center', bbox_to_anchor=(0.5, 1.1),
-        ncol=5, fancybox=True, shadow=True
-    )
-
-    plt.figure(2)
-    plt.savefig(f"render/debug/fig2_{turns}", dpi=300)
-    plt.figure(3)
-    plt.savefig(f"render/debug/fig3_{turns}", dpi=300)
-
-    # switch back to figure 1: ameoba simulator
-    plt.figure(1)
-
-
 #------------------------------------------------------------------------------
 #  Helpers
 #------------------------------------------------------------------------------
@@ -155,6 +70,7 @@ def find_movable_cells(
 ) -> list[cell]:
 
     movable = set()
+    bacteria = set(bacteria)
     new_periphery = list(set(periphery) - set(retract))
     for i, j in new_periphery:
         nbr = find_movable_neighbor(i, j, amoeba_map, bacteria)
@@ -186,34 +102,28 @@ def retract_k(
     Note: This function might return n < k cells to retract because retracting any
     more cells would cause separation.
     """
-    def exposure(cell) -> int:
-        x, y = cell
-        exposure = 0
-
-        for xn, yn in [
-            # index of 4 neighboring cells
-            (x, (y-1) % 100),
-            (x, (y+1) % 100),
-            ((x-1) % 100, y),
-            ((x+1) % 100, y)
-        ]:
-            if state.amoeba_map[xn][yn] == State.empty.value:
-                exposure += 1
-
-        return exposure
+    # number of empty neighbors of every cell, computed for the whole board at once
+    exposure = empty_neighbors(state.amoeba_map, State.empty.value)
 
     sorted_choices = sorted(
-        [(cell, exposure(cell)) for cell in choices],
+        [(cell, exposure[cell]) for cell in choices],
         key=lambda x: x[1],
         reverse=True
     )
 
+    # built once, every probe below only searches around the changed cells
+    oracle = ConnectivityOracle(
+        state.amoeba_map,
+        state.periphery,
+        state.amoeba_map == State.empty.value
+    )
+
     # fast path: optimistically try if selecting topk, return if
     # it passes check_move, in the best case this reduces # invocations
     # of check_moves from O(max(len(choices), len(possible_moves))) to 1
     _k = min(k, len(choices), len(possible_moves))
     top_k = [ cell for cell, _ in sorted_choices[:_k] ]
-    if check_move(top_k, possible_moves[:_k], state):
+    if oracle.check_move(top_k, possible_moves[:_k]):
         return top_k
 
     # slow path: use binary search to find the first prefix that passes
@@ -224,7 +134,7 @@ def retract_k(
         mid = math.floor((lo + hi) / 2)
         prefix = [ cell for cell, _ in sorted_choices[:mid] ]
 
-        if check_move(prefix, possible_moves[:mid], state):
+        if oracle.check_move(prefix, possible_moves[:mid]):
             return prefix
         else:
             hi = mid - 1
@@ -239,20 +149,17 @@ def check_move(
 
     periphery = state.periphery
     amoeba_map = state.amoeba_map
-    bacteria = state.bacteria
+    bacteria = set(state.bacteria)
 
     if not set(retract).issubset(set(periphery)):
         return False
 
-    movable = retract[:]
+    movable = set(retract)
     new_periphery = list(set(periphery).difference(set(retract)))
     for i, j in new_periphery:
-        nbr = find_movable_neighbor(i, j, amoeba_map, bacteria)
-        for x, y in nbr:
-            if (x, y) not in movable:
-                movable.append((x, y))
+        movable.update(find_movable_neighbor(i, j, amoeba_map, bacteria))
 
-    if not set(move).issubset(set(movable)):
+    if not set(move).issubset(movable):
         return False
 
     amoeba = np.copy(amoeba_map)
@@ -292,6 +199,9 @@ def check_move(
 
 class Strategy(ABC):
 
+    # layout of the memory byte, strategies that keep no memory use no fields
+    info_codec = InfoCodec()
+
     def __init__(self, metabolism: float) -> None:
         self.metabolism = metabolism
         self.shifted = 1
@@ -307,8 +217,8 @@ class Strategy(ABC):
 
     def _get_cog(self, curr_state: AmoebaState) -> tuple[int, int]:
         """Compute center of gravity of current Ameoba."""
-        ameoba_cells = np.array(list(zip(*np.where(curr_state.amoeba_map == State.ameoba.value))))
-        cog = (round(np.average(ameoba_cells[:,0])),round(np.average(ameoba_cells[:,1])))
+        x, y = curr_state.centroid
+        cog = (round(x) % constants.map_dim, round(y) % constants.map_dim)
 
         return cog
     
@@ -354,12 +264,8 @@ class Strategy(ABC):
         if debug and not check_move(retract, extend, curr_state):
             print("[ G4 ] problematic move")
 
-        # debug
-        visualize_reshape(
-            list(target), ameoba_cells, curr_state.bacteria,
-            occupiable_cells, list(retractable_cells),
-            retract, extend
-        )
+        # debug: drawn on the frame when the game runs with --debug_overlay
+        curr_state.overlay.push(retract=retract, extend=extend, target=target, label="reshape")
 
         return retract, extend, memory
 
@@ -391,6 +297,8 @@ class RandomWalk(Strategy):
 
 class BoxFarm(Strategy):
 
+    info_codec = InfoCodec(("corner", 7), ("initialize", 1))
+
     def _make_box(self, size, top_left_corner):
         #perimeter = math.floor(size/4)
         square_length = (size // 4) + 1
@@ -438,23 +346,16 @@ class BoxFarm(Strategy):
         loop = True
         while loop:
             loop = False
-            mem = f'{memory:b}'
-            while len(mem) < 8:
-                mem = '0' + mem
-            initialize = int(mem[0])
-            corner = int(mem[1:],2)
+            mem = memory
+            corner, initialize = self.info_codec.unpack(mem)
             if initialize == 0:
                 target_cells, corner_new = self._init(ameoba_cells,size,corner)
                 #print(target_cells)
-                mem_corner = f'{corner_new[0]:b}'
-                while len(mem_corner) < 8:
-                    mem_corner = '0' + mem_corner
-                mem = mem_corner
+                mem = self.info_codec.pack(corner=corner_new[0])
                 over = len(set(ameoba_cells_set))
                 if set(target_cells) == set(ameoba_cells_set):
                     initialize = 1
-                    mem_initialize = f'{initialize:b}'
-                    mem = mem_initialize + mem[1:]
+                    mem = self.info_codec.replace(mem, initialize=initialize)
 
             if initialize == 1:
                 print("SWEEP")
@@ -510,11 +411,8 @@ class BoxFarm(Strategy):
                     top = ameoba_cells[min_ind]
                     corner = min(ameoba_cells[:,0]) + 1
                     initialize = 0
-                    mem_corner = f'{corner:b}'
-                    while len(mem_corner) < 8:
-                        mem_corner = '0' + mem_corner
-                    mem = mem_corner
-                    memory = int(mem,2)
+                    mem = self.info_codec.pack(corner=corner)
+                    memory = mem
                     loop = True
             
             # for cell in sweep_cells:
@@ -525,26 +423,30 @@ class BoxFarm(Strategy):
 
         #target_cells = self._get_target_cells(size, ameoba_cells)
 
-        memory = int(mem,2)
+        memory = mem
         #print(target_cells)
         return self._reshape(state, memory, set(target_cells))
 
 
 class BucketAttack(Strategy):
 
-    def __init__(self, metabolism, bucket_width=1, shift_n=-1, v_size=200):
+    info_codec = InfoCodec(("shifted", 1), ("xmax", 7))
+
+    def __init__(self, metabolism, bucket_width=1, shift_n=-1, v_size=200, formations=None):
         """Initializes BucketAttack.
         
         kwargs:
           bucket_width: # cells between bucket arms, default to 1
           shift_n: shift bucket arms up/down every n turns, acceptable n value
                    is [1, 16], otherwise the shifting behavior is disabled
+          formations: cache for target shapes, defaults to the shared g4 cache
         """
         super().__init__(metabolism)
         self.bucket_width = bucket_width
         self.shift_enabled = shift_n >= 1 and shift_n <= 16
         self.shift_n = shift_n
         self.v_size = v_size
+        self.formations = formations if formations is not None else formation_cache("g4")
 
         # derived statistics
         self.wall_cost = self.bucket_width + 1
@@ -614,6 +516,16 @@ class BucketAttack(Strategy):
         @size: current size of ameoba
         @cog: center of gravity for the target shape (only y-value used currently)
         """
+        # the shape only depends on size, it is built once at the origin and
+        # translated to the column of xmax and the row of cog
+        _, y_cog = cog
+        offsets = self.formations.get(
+            ("bucket", size, self.wall_cost, self.bucket_cost),
+            lambda: tuple(self._build_target_cells(size, (0, 0), 0))
+        )
+        return [ ( (x + xmax) % 100, (y + y_cog) % 100 ) for x, y in offsets ]
+
+    def _build_target_cells(self, size: int, cog: cell, xmax: int) -> list[cell]:
         wall_cost = self.wall_cost
         bucket_cost = self.bucket_cost
 
@@ -779,8 +691,8 @@ class BucketAttack(Strategy):
 
     def _get_cog(self, curr_state: AmoebaState) -> tuple[int, int]:
         """Compute center of gravity of current Ameoba."""
-        ameoba_cells = np.array(list(zip(*np.where(curr_state.amoeba_map == State.ameoba.value))))
-        cog = (round(np.average(ameoba_cells[:,0])),round(np.average(ameoba_cells[:,1])))
+        x, y = curr_state.centroid
+        cog = (round(x) % constants.map_dim, round(y) % constants.map_dim)
 
         return cog
     
@@ -799,17 +711,12 @@ class BucketAttack(Strategy):
                       (xmax
         """
 
-        # we concatenate the ameoba map along the x-axis forming a 200 * 100 map
-        #               x = 0 ... x = 99 x=100 ... x=199
-
-        ameoba_map = np.vstack((curr_state.amoeba_map, curr_state.amoeba_map))
-        ameoba_xs, _ = np.where(ameoba_map == State.ameoba.value)
-
-        # we operate a subset (x=50 -> x=149) of this new map to find @xmax by
-        # searching from xmax=xmin, and increment xmax whenever we see a x-value
-        # immediately larger by 1
-        x_filter = (ameoba_xs >= constants.map_dim / 2) & (ameoba_xs < constants.map_dim * 1.5)
-        xs = sorted(set(ameoba_xs[x_filter]))
+        # we unroll the columns holding ameoba cells along the x-axis so they
+        # fall in x=50 -> x=149, and find @xmax by searching from xmax=xmin,
+        # and increment xmax whenever we see a x-value immediately larger by 1
+        half = constants.map_dim // 2
+        ameoba_xs = np.flatnonzero(curr_state.occupancy.column_counts)
+        xs = sorted((ameoba_xs - half) % constants.map_dim + half)
         xmax = min(xs)
         for x in xs:
             xmax += int(x == xmax + 1)
@@ -817,8 +724,8 @@ class BucketAttack(Strategy):
         return xmax % constants.map_dim
 
     def _reach_border(self, curr_state: AmoebaState) -> bool:
-        _, ameoba_ys = np.where(curr_state.amoeba_map == State.ameoba.value)
-        lower_bound, upper_bound = min(ameoba_ys), max(ameoba_ys)
+        ameoba_ys = np.flatnonzero(curr_state.occupancy.row_counts)
+        lower_bound, upper_bound = ameoba_ys[0], ameoba_ys[-1]
 
         return abs(upper_bound - lower_bound) >= 98
 
@@ -838,7 +745,7 @@ class BucketAttack(Strategy):
         that we don't risk moving and not able to eat any bacteria along the
         way.
         """
-        arms_got = len(np.where(curr_state.amoeba_map[xmax,:] == State.ameoba.value)[0])
+        arms_got = curr_state.occupancy.column_counts[xmax]
 
         if not self._reach_border:
             arms_expected = 1 + math.floor((curr_state.current_size - 3) / self.bucket_cost)
@@ -854,9 +761,7 @@ class BucketAttack(Strategy):
         # ----------------
         #  Decode Memory
         # ----------------
-        mem = f'{memory:b}'.rjust(8, '0')
-        old_xmax = int(mem[:7], 2)
-        shifted = int(mem[-1])
+        shifted, old_xmax = self.info_codec.unpack(memory)
 
         # ---------------
         #  State Update
@@ -880,9 +785,7 @@ class BucketAttack(Strategy):
         # ----------------
         #  Update Memory
         # ----------------
-        arm_xval_bin = '{0:07b}'.format(arm_xval)
-        shifted_bin  = '{0:01b}'.format(shifted)
-        memory = int(arm_xval_bin + shifted_bin, 2)
+        memory = self.info_codec.pack(xmax=arm_xval, shifted=shifted)
 
 
         size = state.current_size
@@ -957,7 +860,8 @@ class Player:
                 metabolism,
                 bucket_width=BUCKET_WIDTH,
                 shift_n=SHIFT_CYCLE,
-                v_size=V_SIZE
+                v_size=V_SIZE,
+                formations=formation_cache("g4", precomp_dir)
             )
         )
 
@@ -996,6 +900,7 @@ class Player:
         else:
             strategy = "bucket_attack"
 
+        self.info_codec = self.strategies[strategy].info_codec
         return self.strategies[strategy].move(last_percept, current_percept, info)
 
 
@@ -7,6 +7,11 @@ import numpy.typing as npt
 from typing import Tuple, List
 import logging
 from amoeba_state import AmoebaState
+from base_player import BasePlayer
+from cell_set import CellSet
+from morph_planner import MorphPlanner
+from formations import bar, formation_cache, rake, translate
+from info_codec import InfoCodec
 import math
 import time
 import matplotlib.pyplot as plt
@@ -24,6 +29,7 @@ SHIFTING_FREQ = 6       # 6 best for high metabolisms, 4 better for low
 SIZE_MULTIPLIER = 4     # 4 best for density = 0.1 metabolism = 0.1
 MOVING_TYPE = 'center_teeth_first'  # 'center' best for low metabolisms - 'center_teeth_first' better for high
 TWO_RAKE = True
+FORMATION_VERSION = 2
 
 # Best configs so far #
 # m = 0.1; A = 5; s = 2 -> 1 6 4 'center' -> 202 moves
@@ -35,14 +41,11 @@ TWO_RAKE = True
 
 # the following 3 methods are borrowed from G2
 def map_to_coords(amoeba_map: npt.NDArray) -> list[Tuple[int, int]]:
-    return list(map(tuple, np.transpose(amoeba_map.nonzero()).tolist()))
+    return CellSet.from_mask(amoeba_map).cells()
 
 
-def coords_to_map(coords: list[tuple[int, int]], size=MAP_DIM) -> npt.NDArray:
-    amoeba_map = np.zeros((size, size), dtype=np.int8)
-    for x, y in coords:
-        amoeba_map[x, y] = 1
-    return amoeba_map
+def coords_to_map(coords: list[tuple[int, int]]) -> npt.NDArray:
+    return CellSet.from_cells(coords).mask(np.int8)
 
 
 def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[]) -> None:
@@ -68,30 +71,6 @@ def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[]) -> None:
     plt.show()
 
 
-# the following 2 methods are borrowed from myself from project 3
-def tree_index(factors, max_factors):
-    index = 0
-    for i in range(len(factors)):
-        n_children = 1
-        for factor in max_factors[i + 1:]:
-            n_children *= factor
-        index += factors[i] * n_children
-    return index
-
-
-def tree_factors(index, max_factors):
-    factors = []
-    for i in range(len(max_factors)):
-        n_children = 1
-        for factor in max_factors[i + 1:]:
-            n_children *= factor
-        factor = index // n_children
-        factors.append(factor)
-        index %= n_children
-
-    return factors
-
-
 # search the list for the element that causes check(li) to fail and remove the element
 def binary_search(li, check):
     mid = len(li) // 2
@@ -135,10 +114,7 @@ def iter_from_middle(lst):
 
 # ********* BYTE INFO ******** #
 
-class MaxVals(Enum):
-    #is_rake = 2
-    x_val = 100
-    tooth_shift = 2
+INFO_CODEC = InfoCodec(("tooth_shift", 1), ("x_val", 7))
 
 
 class Memory:
@@ -162,22 +138,22 @@ class Memory:
 
 
 def get_byte_info(byte: int):
-    max_vals = [field.value for field in MaxVals]
-    factors = tree_factors(byte, max_vals)
+    tooth_shift, x_val = INFO_CODEC.unpack(byte)
 
-    return factors
+    return [x_val, tooth_shift]
 
 
 def set_byte_info(values):
-    max_vals = [field.value for field in MaxVals]
-    byte = tree_index(values, max_vals)
+    x_val, tooth_shift = values
 
-    return byte
+    return INFO_CODEC.pack(x_val=x_val, tooth_shift=tooth_shift)
 
 
 # ********* MAIN CODE ********* #
 
-class Player:
+class Player(BasePlayer):
+    info_codec = INFO_CODEC
+
     def __init__(self, rng: np.random.Generator, logger: logging.Logger, metabolism: float, goal_size: int,
                  precomp_dir: str) -> None:
         """Initialise the player with the basic amoeba information
@@ -205,22 +181,22 @@ class Player:
         #     with open(precomp_path, 'wb') as f:
         #         pickle.dump([self.obj0, self.obj1, self.obj2], f)
 
-        self.rng = rng
-        self.logger = logger
-        self.metabolism = metabolism
-        self.goal_size = goal_size
-        self.current_size = goal_size / 4
+        super().__init__(rng, logger, metabolism, goal_size, precomp_dir)
 
-        self.current_size: int = None
-        self.amoeba_map: npt.NDArray = None
-        self.bacteria_cells: List[Tuple[int, int]] = None
-        self.retractable_cells: List[Tuple[int, int]] = None
-        self.extendable_cells: List[Tuple[int, int]] = None
-        self.num_available_moves: int = None
-        self.map_state: npt.NDArray = None
+        # formations only depend on their arguments and the constants above, so they are built once per key
+        self.formations = formation_cache("g5", precomp_dir, version=FORMATION_VERSION)
+        # difference to the target formation, kept across turns and the formation shifts tried in a turn
+        self.planner = MorphPlanner()
 
     def generate_tooth_formation(self, amoeba_size: int) -> npt.NDArray:
-        formation = np.zeros((MAP_DIM, MAP_DIM), dtype=np.int8)
+        return self.formations.get(("tooth", amoeba_size, TOOTH_SPACING, MAX_BASE_LEN),
+                                   lambda: self.build_tooth_formation(amoeba_size))
+
+    def generate_tworake_formation(self, amoeba_size: int, curr_x: int, shift: int) -> npt.NDArray:
+        return self.formations.get(("tworake", amoeba_size, curr_x, shift, TOOTH_SPACING, MAX_BASE_LEN),
+                                   lambda: self.build_tworake_formation(amoeba_size, curr_x, shift))
+
+    def build_tooth_formation(self, amoeba_size: int) -> npt.NDArray:
         center_x = MAP_DIM // 2
         center_y = MAP_DIM // 2
         spacing = TOOTH_SPACING + 1
@@ -240,11 +216,7 @@ class Player:
         start_y = center_y - base_len // 2
 
         # add the 2-cell-wide base and teeth
-        for y in range(start_y, start_y + base_len):
-            formation[center_x, y%100] = 1
-            formation[center_x - 1, y%100] = 1
-            if y%100 % spacing == 0:
-                formation[center_x + 1, y%100] = 1
+        formation = rake(base_len, center_x, start_y, spacing, 0).mask
 
         # add the teeth
         # start_modules = start_y  # +(additional_sections+1)//2
@@ -262,8 +234,7 @@ class Player:
         # show_amoeba_map(formation)
         return formation
 
-    def generate_tworake_formation(self, amoeba_size: int, curr_x: int, shift: int) -> npt.NDArray:
-        formation = np.zeros((MAP_DIM, MAP_DIM), dtype=np.int8)
+    def build_tworake_formation(self, amoeba_size: int, curr_x: int, shift: int) -> npt.NDArray:
         center_x = MAP_DIM // 2
         center_y = MAP_DIM // 2
         spacing = TOOTH_SPACING + 1
@@ -297,17 +268,10 @@ class Player:
         start_x = curr_x
 
         # add the 2-cell-wide base and teeth
-        cells_used = 0
-        for y in range(start_y, start_y + base_len):
-            formation[start_x, y % 100] = 1
-            formation[(start_x - 1) % 100, y % 100] = 1
-            cells_used += 2
-            if y % 100 % spacing == shift:
-                formation[(start_x + 1) % 100, y % 100] = 1
-                cells_used += 1
+        formation = rake(base_len, start_x, start_y, spacing, shift)
 
         # ADD THE MIDDLE BAR
-        cells_used = (formation == 1).sum()
+        cells_used = formation.count()
         available = amoeba_size - cells_used
 
         # bar_length = min(100, available)
@@ -316,11 +280,10 @@ class Player:
         else:
             bar_length = min((curr_x - 50) * 2, available)
 
-        for offset in range(1, bar_length + 1):
-            formation[(curr_x - offset) % 100, center_y] = 1
+        formation.merge(bar(bar_length, curr_x, center_y))
 
         # ADD THE SECOND RAKE
-        cells_used = (formation == 1).sum()
+        cells_used = formation.count()
         available = amoeba_size - cells_used
 
         complete_modules = available // 5
@@ -338,14 +301,10 @@ class Player:
         # start_x = (center_x + offset_x)%100
 
         start_x = (99 - curr_x) % 100
-        for y in range(start_y, start_y + base_len):
-            formation[start_x, y % 100] = 1
-            formation[(start_x + 1) % 100, y % 100] = 1
-            if y % 100 % spacing == shift ^ 1:
-                formation[(start_x - 1) % 100, y % 100] = 1
+        formation.merge(rake(base_len, start_x, start_y, spacing, shift ^ 1, back=1))
 
         # DO SOMETHING WITH EXCESS CELLS
-        cells_used = (formation == 1).sum()
+        cells_used = formation.count()
         available = amoeba_size - cells_used
         # cube_side = math.ceil((available ** 0.5))
 
@@ -371,7 +330,7 @@ class Player:
 
 
         # show_amoeba_map(formation)
-        return formation
+        return formation.mask
 
     # sort potential retracts based on the number of neighbors (less members -> higher priority)
     def sort_retracts(self, potential_retracts):
@@ -420,13 +379,9 @@ class Player:
             to morph the amoeba shape towards the desired shape.
         """
 
-        current_points = map_to_coords(self.amoeba_map)
-        desired_points = map_to_coords(desired_amoeba)
-
-        potential_retracts = [p for p in list(set(current_points).difference(set(desired_points))) if
-                              (p in self.retractable_cells) and not any([neighbor in self.bacteria_cells for neighbor in self.get_neighbors(p)])]
-        potential_extends = [p for p in list(set(desired_points).difference(set(current_points))) if
-                             p in self.extendable_cells]
+        potential_retracts, potential_extends = self.planner.diff(self.amoeba_map, desired_amoeba,
+                                                                  self.candidates.safe_retracts_mask,
+                                                                  self.candidates.extendable_mask)
 
         # potential_retracts.sort(key=lambda pos: pos[1])
         if MOVING_TYPE == 'top_down':
@@ -503,67 +458,11 @@ class Player:
         print('Search ended')
 
         # show_amoeba_map(self.amoeba_map, retracts, extends)
+        self.overlay.push(retract=retracts, extend=extends, label="morph")
         # truncate to account for smaller metabolism
         print(self.check_move(retracts, extends))
         return retracts, extends
 
-    # adapted from amoeba game code
-    def check_move(self, retracts: List[Tuple[int, int]], extends: List[Tuple[int, int]]) -> bool:
-        if not set(retracts).issubset(set(self.retractable_cells)):
-            return False
-        movable = retracts[:]
-        new_periphery = list(set(self.retractable_cells).difference(set(retracts)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
-
-        if not set(extends).issubset(set(movable)):
-            return False
-
-        amoeba = np.copy(self.map_state)
-        amoeba[amoeba < 0] = 0
-        amoeba[amoeba > 0] = 1
-
-        for i, j in retracts:
-            amoeba[i][j] = 0
-
-        for i, j in extends:
-            amoeba[i][j] = 1
-
-        tmp = np.where(amoeba == 1)
-        result = list(zip(tmp[0], tmp[1]))
-        check = np.zeros((MAP_DIM, MAP_DIM), dtype=int)
-
-        stack = result[0:1]
-        while len(stack):
-            a, b = stack.pop()
-            check[a][b] = 1
-
-            if (a, (b - 1) % MAP_DIM) in result and check[a][(b - 1) % MAP_DIM] == 0:
-                stack.append((a, (b - 1) % MAP_DIM))
-            if (a, (b + 1) % MAP_DIM) in result and check[a][(b + 1) % MAP_DIM] == 0:
-                stack.append((a, (b + 1) % MAP_DIM))
-            if ((a - 1) % MAP_DIM, b) in result and check[(a - 1) % MAP_DIM][b] == 0:
-                stack.append(((a - 1) % MAP_DIM, b))
-            if ((a + 1) % MAP_DIM, b) in result and check[(a + 1) % MAP_DIM][b] == 0:
-                stack.append(((a + 1) % MAP_DIM, b))
-
-        return (amoeba == check).all()
-
-    # copied from G2
-    def store_current_percept(self, current_percept: AmoebaState) -> None:
-        self.current_size = current_percept.current_size
-        self.amoeba_map = current_percept.amoeba_map
-        self.retractable_cells = current_percept.periphery
-        self.bacteria_cells = current_percept.bacteria
-        self.extendable_cells = current_percept.movable_cells
-        self.num_available_moves = int(np.ceil(self.metabolism * current_percept.current_size))
-        self.map_state = np.copy(self.amoeba_map)
-        for bacteria in self.bacteria_cells:
-            self.map_state[bacteria] = 1
-
     def move(self, last_percept: AmoebaState, current_percept: AmoebaState, info: int) -> Tuple[
         List[Tuple[int, int]], List[Tuple[int, int]], int]:
         """Function which retrieves the current state of the amoeba map and returns an amoeba movement
@@ -614,8 +513,7 @@ class Player:
                     target_formation = self.generate_tooth_formation(target_size)
 
                 # target_formation = self.generate_tooth_formation(last_percept.current_size)
-                target_formation = np.roll(target_formation, offset_x, 0)
-                target_formation = np.roll(target_formation, offset_y, 1)
+                target_formation = translate(target_formation, offset_x, offset_y)
             else:
                 target_size = self.goal_size // 4 + SIZE_MULTIPLIER * (
                             (100 + offset_x) % 100)  # calculate the desired size with regard
@@ -625,7 +523,8 @@ class Player:
                 target_formation = self.generate_tworake_formation(self.current_size, x_val, offset_y + 1)
                 # target_formation = self.generate_tworake_formation(target_size, x_val, offset_y + 1)
 
-            diff = np.count_nonzero(target_formation & self.amoeba_map != target_formation)
+            self.planner.update(self.amoeba_map, target_formation)
+            diff = len(self.planner.missing)
             if diff/self.current_size <= 0.15 and diff <= 30:
                 retracts, moves = [], []
             else:
@@ -651,16 +550,7 @@ class Player:
         return arr2
 
     def bounds(self, current_percept):
-        min_x, max_x, min_y, max_y = 100, -1, 100, -1
-        for y, x in current_percept.periphery:
-            if y < min_y:
-                min_y = y
-            elif y > max_y:
-                max_y = y
-            if x < min_x:
-                min_x = x
-            elif x > max_x:
-                max_x = x
+        (min_y, max_y), (min_x, max_x) = current_percept.bounds
 
         return min_x, max_x, min_y, max_y
 
@@ -671,44 +561,3 @@ class Player:
         if len_x == len_y and len_x * len_y == current_percept.current_size:
             return True
         return False
-
-    def find_movable_cells(self, retract, periphery, amoeba_map, bacteria, mini):
-        movable = []
-        new_periphery = list(set(periphery).difference(set(retract)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
-
-        movable += retract
-
-        return movable[:mini]
-
-    # def find_movable_neighbor(self, x, y, amoeba_map, bacteria):
-    #     out = []
-    #     if (x, y) not in bacteria:
-    #         if amoeba_map[x][(y - 1) % 100] == 0:
-    #             out.append((x, (y - 1) % 100))
-    #         if amoeba_map[x][(y + 1) % 100] == 0:
-    #             out.append((x, (y + 1) % 100))
-    #         if amoeba_map[(x - 1) % 100][y] == 0:
-    #             out.append(((x - 1) % 100, y))
-    #         if amoeba_map[(x + 1) % 100][y] == 0:
-    #             out.append(((x + 1) % 100, y))
-    #
-    #     return out
-
-    def find_movable_neighbor(self, x, y):
-        out = []
-        if self.map_state[x][(y - 1) % MAP_DIM] < 1:
-            out.append((x, (y - 1) % MAP_DIM))
-        if self.map_state[x][(y + 1) % MAP_DIM] < 1:
-            out.append((x, (y + 1) % MAP_DIM))
-        if self.map_state[(x - 1) % MAP_DIM][y] < 1:
-            out.append(((x - 1) % MAP_DIM, y))
-        if self.map_state[(x + 1) % MAP_DIM][y] < 1:
-            out.append(((x + 1) % MAP_DIM, y))
-
-        return out
-
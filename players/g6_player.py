@@ -3,46 +3,7 @@ import pickle
 import numpy as np
 import logging
 from amoeba_state import AmoebaState
-from matplotlib import pyplot as plt
 
-EXTEND_COLOR = (np.random.rand(1,1,3) * 255).astype(int)
-RETRACT_COLOR = (np.random.rand(1,1,3) * 255).astype(int)
-AMOEABA_COLOR = (np.random.rand(1,1,3) * 255).astype(int)
-
-class Drawer:
-    def __init__(self):
-        self.base = np.zeros((100, 100, 3))
-    
-    def draw(self, curr_percept, extract_coord, extend_coord):
-        self.clear_graph()
-        self._draw_amoeba(curr_percept)
-        if len(extend_coord) != 0:
-            self._draw_extend(extend_coord)
-        if len(extract_coord) != 0:
-            self._draw_retract(extract_coord)
-        self.save()
-    
-    def _draw_extend(self, coord):
-        x = np.array(coord)[:, 0]
-        y = np.array(coord)[:, 1]
-        self.base[x, y] = EXTEND_COLOR
-    
-    def _draw_retract(self, coord):
-        x = np.array(coord)[:, 0]
-        y = np.array(coord)[:, 1]
-        self.base[x, y] = RETRACT_COLOR
-    
-    def _draw_amoeba(self, current_percept):
-        coord = np.stack(np.where(current_percept.amoeba_map != 0), axis= 1)
-        x = np.array(coord)[:, 0]
-        y = np.array(coord)[:, 1]
-        self.base[x, y] = AMOEABA_COLOR
-    
-    def clear_graph(self):
-        self.base = np.zeros((100, 100, 3))
-    
-    def save(self, name='tmp.png'):
-        plt.imsave(name, self.base.astype(np.uint8))
 
 class Player:
     def __init__(self, rng: np.random.Generator, logger: logging.Logger, metabolism: float, goal_size: int,
@@ -76,7 +37,6 @@ class Player:
         self.metabolism = metabolism
         self.goal_size = goal_size
         self.current_size = goal_size / 4
-        self.drawer = Drawer()
 
     def move(self, last_percept, current_percept, info) -> (list, list, int):
         """Function which retrieves the current state of the amoeba map and returns an amoeba movement
@@ -95,7 +55,8 @@ class Player:
 
         info_binary  = format(info, '04b')
         
-        split, split_row = self.split_amoeba(current_percept.amoeba_map)
+        occupancy = current_percept.occupancy
+        split, split_row = self.split_amoeba(occupancy.row_counts > 0)
         amoeba_map = self.concat_map(current_percept.amoeba_map, split, split_row)
         self.logger.info(f'split_row (exclusive): {split_row}')
 
@@ -114,10 +75,11 @@ class Player:
                     amoeba_map, current_percept.periphery, current_percept.bacteria, split_row)
             else:
                 retract_list, expand_list = self.init_organize(
-                    amoeba_map, current_percept.periphery, current_percept.bacteria)
+                    amoeba_map, current_percept.periphery, current_percept.bacteria, occupancy.column_counts)
         elif stage == 1:
             retract_list, expand_list = self.forward(
-                amoeba_map, current_percept.amoeba_map, current_percept.periphery, current_percept.bacteria, split_row)
+                amoeba_map, current_percept.amoeba_map, current_percept.periphery, current_percept.bacteria, split_row,
+                occupancy.column_counts)
         else:
 
             ##amoeba_loc = np.stack(np.where(amoeba_map == 1)).T.astype(int)
@@ -144,7 +106,7 @@ class Player:
         self.logger.info(f'retract: {retract_list[:mini]}')
         self.logger.info(f'expand: {expand_list[:mini]}')
 
-        self.drawer.draw(current_percept, retract_list[:mini], expand_list[:mini])
+        current_percept.overlay.push(retract=retract_list[:mini], extend=expand_list[:mini])
         return retract_list[:mini], expand_list[:mini], info+1
 
     def concat_map(self, amoeba_map, split, split_row):
@@ -158,14 +120,14 @@ class Player:
 
         return amoeba_map
     
-    def forward(self, amoeba_map, amoeba_map_old, periphery, bacteria, split_row):
-        retract_list = self.organize_retract(amoeba_map, periphery, min_num_per_col=1)
+    def forward(self, amoeba_map, amoeba_map_old, periphery, bacteria, split_row, column_counts):
+        retract_list = self.organize_retract(amoeba_map, periphery, column_counts, min_num_per_col=1)
         movable = self.find_movable_cells(retract_list, periphery, amoeba_map_old, bacteria)
         expand_list = self.forward_expand(amoeba_map, movable, split_row)
         return retract_list, expand_list
 
-    def init_organize(self, amoeba_map, periphery, bacteria):
-        retract_list = self.organize_retract(amoeba_map, periphery)
+    def init_organize(self, amoeba_map, periphery, bacteria, column_counts):
+        retract_list = self.organize_retract(amoeba_map, periphery, column_counts)
         movable = self.find_movable_cells(retract_list, periphery, amoeba_map, bacteria)
         expand_list = self.organize_expand(amoeba_map, movable)
         return retract_list, expand_list
@@ -201,10 +163,7 @@ class Player:
 
         # check if min_row is too large, if so wait
         amoeba_loc = np.stack(np.where(amoeba_map == 1)).T.astype(int)
-        cols, _ = np.unique(amoeba_loc[:, 0], return_counts=True)
-        min_row_all = min_row - 1
-        for col in cols:
-            min_row_all = min(min_row_all, amoeba_loc[amoeba_loc[:, 0]==col][:, 1].max())
+        min_row_all = min([min_row - 1] + list(self.column_bottoms(amoeba_loc).values()))
 
         # print(frontline, min_row)
         # print(amoeba_loc, min_row_all)
@@ -219,12 +178,23 @@ class Player:
 
         return expand_cells
 
-    def organize_retract(self, amoeba_map, periphery, min_num_per_col=2):
+    def column_bottoms(self, amoeba_loc):
+        """Largest y of every column of the concatenated map"""
+        bottoms = {}
+        for x, y in amoeba_loc.tolist():
+            if y > bottoms.get(x, -1):
+                bottoms[x] = y
+        return bottoms
+
+    def organize_retract(self, amoeba_map, periphery, column_counts, min_num_per_col=2):
         amoeba_loc = np.stack(np.where(amoeba_map == 1)).T.astype(int)
         amoeba_loc = amoeba_loc[amoeba_loc[:, 1].argsort()]
         top_side = np.min(amoeba_loc[:, 1])
         bottom_side = np.max(amoeba_loc[:, 1])
         retract_list = []
+        # cells left per column, the bottom of a column never moves as it is never retracted
+        num_columns = column_counts.copy()
+        max_rows = self.column_bottoms(amoeba_loc)
 
         for row in range(top_side, bottom_side):
 
@@ -234,20 +204,18 @@ class Player:
 
             for col in columns:
                 # never move bottom-most row
-                max_row = amoeba_loc[amoeba_loc[:, 0]==col][:, 1].max()
-                if row == max_row: 
+                if row == max_rows[col]:
                     continue
 
-                num_column = np.size(np.where(amoeba_loc[:, 0] == col)[0])
-                #self.logger.info(f'num_col: {num_column}')
-                if num_column > min_num_per_col:
+                #self.logger.info(f'num_col: {num_columns[col]}')
+                if num_columns[col] > min_num_per_col:
                     cell = (col%100, row%100)
                     if cell in periphery:
                         retract_list.append(cell)
                         #self.logger.info(f'cell retract: {cell}')
-                        cell_idx = (amoeba_loc[:, 0] == cell[0]) * (amoeba_loc[:, 1] == cell[1])
-                        #self.logger.info(f'cell idx : {np.where(cell_idx==True)[0]}')
-                        amoeba_loc = np.delete(amoeba_loc, np.where(cell_idx==True)[0], axis=0)
+                        # only cells of the first copy of the map are found again and dropped from their column
+                        if cell == (col, row):
+                            num_columns[col] -= 1
 
         return retract_list
 
@@ -497,11 +465,14 @@ class Player:
 
     def find_movable_cells(self, retract, periphery, amoeba_map, bacteria):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         #movable += retract
@@ -522,23 +493,21 @@ class Player:
 
         return out
 
-    def split_amoeba(self, amoeba_map):
+    def split_amoeba(self, occupied_rows):
         split = False
         amoeba_begin = False
         amoeba_end = False
         split_row = 0
 
         for i in range(100):
-            curr_row = amoeba_map[:, i]
-            value = np.max(curr_row)
-            if value == 1:
+            if occupied_rows[i]:
                 if not amoeba_begin:
                     amoeba_begin = True
                 elif amoeba_end:
                     split = True
                     split_row = i - 1
                     break
-            elif value == 0:
+            else:
                 if amoeba_begin:
                     amoeba_end = True
 
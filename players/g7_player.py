@@ -2,7 +2,10 @@ import numpy as np
 import numpy.typing as npt
 import logging
 from typing import Tuple, List
-from amoeba_state import AmoebaState
+from base_player import BasePlayer
+from cell_set import CellSet
+from formations import bar, formation_cache, rake
+from info_codec import InfoCodec
 
 # ---------------------------------------------------------------------------- #
 #                               Helper Functions                               #
@@ -36,37 +39,28 @@ def generate_rake(formation, move_teeth, available, spacing, x_position, center_
     start_y = center_y - base_length // 2
 
     if not reverse:
-        start_x = x_position
-
-        for i in range(start_y, start_y + base_length):
-            formation[start_x, i % 100] = 1
-            formation[(start_x - 1) % 100, i % 100] = 1
-            if i % 100 % spacing == move_teeth:
-                formation[(start_x + 1) % 100, i % 100] = 1
+        cells = rake(base_length, x_position, start_y, spacing, move_teeth).cells
     else:
         start_x = (99 - x_position) % 100
+        cells = rake(base_length, start_x, start_y, spacing, move_teeth ^ 1, back=1).cells
 
-        for i in range(start_y, start_y + base_length):
-            formation[start_x, i % 100] = 1
-            formation[(start_x + 1) % 100, i % 100] = 1
-            if i % 100 % spacing == move_teeth ^ 1:
-                formation[(start_x - 1) % 100, i % 100] = 1
-
+    formation[cells[:, 0], cells[:, 1]] = 1
     return formation
 
 def generate_bar(formation, available, x_position, center_y):
     bar_length = min((x_position - 50) * 2, available)
     if x_position < 50: bar_length = min(100, available)
-        
-    for offset in range(1, bar_length + 1):
-        formation[wrap_point((x_position - offset), center_y)] = 1
-    
+
+    cells = bar(bar_length, x_position, center_y).cells
+    formation[cells[:, 0], cells[:, 1]] = 1
     return formation
 
 # ---------------------------------------------------------------------------- #
 #                                Info Byte Class                               #
 # ---------------------------------------------------------------------------- #
 
+INFO_CODEC = InfoCodec(("x_position", 7), ("move_teeth", 1))
+
 class Infobyte:
     def __init__(self, byte=None, x_position=None, move_teeth=None):
         if x_position is not None:
@@ -79,15 +73,15 @@ class Infobyte:
         else:
             self.move_teeth = 1
         
-        self.infobyte = encode_info(self.x_position, self.move_teeth)
+        self.infobyte = encode_info(self.move_teeth, self.x_position)
 
     def set_x_position(self, x_position):
         self.x_position = x_position
-        self.infobyte = encode_info(self.x_position, self.move_teeth)
+        self.infobyte = encode_info(self.move_teeth, self.x_position)
     
     def set_move_teeth(self, move_teeth):
         self.move_teeth = move_teeth
-        self.infobyte = encode_info(self.x_position, self.move_teeth)
+        self.infobyte = encode_info(self.move_teeth, self.x_position)
     
 def encode_info(move_teeth: int, x_position: int) -> int:
     """Encode the information to be sent
@@ -97,11 +91,7 @@ def encode_info(move_teeth: int, x_position: int) -> int:
         Returns:
             int: the encoded information as an int
     """
-    move_teeth_binary = bin(move_teeth)[2:].zfill(1)
-    x_position_binary = bin(x_position)[2:].zfill(7)
-    info_binstr = move_teeth_binary + x_position_binary
-
-    return int("0b" + info_binstr, 2)
+    return INFO_CODEC.pack(move_teeth=move_teeth, x_position=x_position)
 
 def decode_info(info: int) -> Tuple[int, int]:
     """Decode the information received
@@ -110,9 +100,8 @@ def decode_info(info: int) -> Tuple[int, int]:
         Returns:
             Tuple[int, int]: move_teeth, x_position, 
     """
-    info_str = bin(info)[2:].zfill(8)
-
-    return int(info_str[0:1], 2), int(info_str[1:8], 2)
+    x_position, move_teeth = INFO_CODEC.unpack(info)
+    return move_teeth, x_position
 
 # ---------------------------------------------------------------------------- #
 #                               Main Player Class                              #
@@ -120,8 +109,11 @@ def decode_info(info: int) -> Tuple[int, int]:
 
 TOOTH_SPACING = 1
 SHIFTING_FREQUENCY = 6
+FORMATION_VERSION = 2
+
+class Player(BasePlayer):
+    info_codec = INFO_CODEC
 
-class Player:
     def __init__(self, rng: np.random.Generator, logger: logging.Logger, metabolism: float, goal_size: int,
                  precomp_dir: str) -> None:
         """Initialise the player with the basic amoeba information
@@ -134,24 +126,19 @@ class Player:
                 precomp_dir (str): Directory path to store/load pre-computation
         """
 
-        self.rng = rng
-        self.logger = logger
-        self.metabolism = metabolism
-        self.goal_size = goal_size
-
-        self.current_size = None
-        self.amoeba_map = None
-        self.bacteria_cells = None
-        self.retractable_cells = None
-        self.extendable_cells = None
-        self.num_available_moves = None
-        self.map_state = None
+        super().__init__(rng, logger, metabolism, goal_size, precomp_dir)
 
         # InfoByte
         self.x_position = None
         self.move_teeth = None
-    
+
+        self.formations = formation_cache("g7", precomp_dir, version=FORMATION_VERSION)
+
     def make_two_rakes(self, amoeba_size: int, x_position: int, move_teeth: int) -> npt.NDArray:
+        return self.formations.get(("two_rakes", amoeba_size, x_position, move_teeth, TOOTH_SPACING),
+                                   lambda: self.build_two_rakes(amoeba_size, x_position, move_teeth))
+
+    def build_two_rakes(self, amoeba_size: int, x_position: int, move_teeth: int) -> npt.NDArray:
         formation = np.zeros((100, 100), dtype=np.int8)
         center_y = 50
         spacing = TOOTH_SPACING + 1
@@ -181,13 +168,13 @@ class Player:
             to morph the amoeba shape towards the desired shape.
         """
         
-        current_points = list(map(tuple, np.transpose(self.amoeba_map.nonzero()).tolist()))
-        desired_points = list(map(tuple, np.transpose(desired_amoeba.nonzero()).tolist()))
+        current_points = CellSet.from_mask(self.amoeba_map)
+        desired_points = CellSet.from_mask(desired_amoeba)
 
-        potential_retracts = [p for p in list(set(current_points).difference(set(desired_points))) if
-                              (p in self.retractable_cells) and not any([neighbor in self.bacteria_cells for neighbor in get_neighbors(p)])]
-        potential_extends = [p for p in list(set(desired_points).difference(set(current_points))) if
-                             p in self.extendable_cells]
+        potential_retracts = current_points.difference(desired_points).intersection(
+            self.candidates.safe_retracts_mask).cells()
+        potential_extends = desired_points.difference(current_points).intersection(
+            self.candidates.extendable_mask).cells()
         potential_extends.sort(key=lambda pos: abs(50 - pos[1]))
 
         retracts = []
@@ -236,74 +223,16 @@ class Player:
 
         return retracts, extends
 
-    # Borrowed from the simulator and adjusted to our functionalities
-    def check_move(self, retracts: List[Tuple[int, int]], extends: List[Tuple[int, int]]) -> bool:
-        if not set(retracts).issubset(set(self.retractable_cells)):
-            return False
-        movable = retracts[:]
-        new_periphery = list(set(self.retractable_cells).difference(set(retracts)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
-
-        if not set(extends).issubset(set(movable)):
-            return False
-
-        amoeba = np.copy(self.map_state)
-        amoeba[amoeba < 0] = 0
-        amoeba[amoeba > 0] = 1
-
-        for i, j in retracts:
-            amoeba[i][j] = 0
-
-        for i, j in extends:
-            amoeba[i][j] = 1
-
-        tmp = np.where(amoeba == 1)
-        result = list(zip(tmp[0], tmp[1]))
-        check = np.zeros((100, 100), dtype=int)
-
-        stack = result[0:1]
-        while len(stack):
-            a, b = stack.pop()
-            check[a][b] = 1
-
-            if (a, (b - 1) % 100) in result and check[a][(b - 1) % 100] == 0:
-                stack.append((a, (b - 1) % 100))
-            if (a, (b + 1) % 100) in result and check[a][(b + 1) % 100] == 0:
-                stack.append((a, (b + 1) % 100))
-            if ((a - 1) % 100, b) in result and check[(a - 1) % 100][b] == 0:
-                stack.append(((a - 1) % 100, b))
-            if ((a + 1) % 100, b) in result and check[(a + 1) % 100][b] == 0:
-                stack.append(((a + 1) % 100, b))
-
-        return (amoeba == check).all()
-
-    # Borrowed from Group 2
-    def store_current_percept(self, current_percept: AmoebaState) -> None:
-        self.current_size = current_percept.current_size
-        self.amoeba_map = current_percept.amoeba_map
-        self.retractable_cells = current_percept.periphery
-        self.bacteria_cells = current_percept.bacteria
-        self.extendable_cells = current_percept.movable_cells
-        self.num_available_moves = int(np.ceil(self.metabolism * current_percept.current_size))
-        self.map_state = np.copy(self.amoeba_map)
-        for bacteria in self.bacteria_cells:
-            self.map_state[bacteria] = 1
-
     def move(self, last_percept, current_percept, info) -> Tuple[list, list, int]:
         self.store_current_percept(current_percept)
 
         retract = []
         move = []
-        info_str = bin(info)[2:].zfill(8)
 
         # set to none to show that we don't store info across turns
         self.move_teeth, self.x_position = None, None
 
-        self.move_teeth, self.x_position = int(info_str[0:1], 2), int(info_str[1:8], 2)
+        self.move_teeth, self.x_position = decode_info(info)
         move_teeth, x_position = self.move_teeth, self.x_position
 
         if self.is_square(current_percept):
@@ -334,25 +263,10 @@ class Player:
                 else:
                     self.move_teeth = 1
         
-        move_teeth_binary = bin(self.move_teeth)[2:].zfill(1)
-        x_position_binary = bin(self.x_position)[2:].zfill(7)
-        info = int(move_teeth_binary + x_position_binary, 2)
+        info = encode_info(self.move_teeth, self.x_position)
 
         return retract, move, info
 
-    def find_movable_neighbor(self, x, y):
-        out = []
-        if self.map_state[x][(y - 1) % 100] == 0:
-            out.append((x, (y - 1) % 100))
-        if self.map_state[x][(y + 1) % 100] == 0:
-            out.append((x, (y + 1) % 100))
-        if self.map_state[(x - 1) % 100][y] == 0:
-            out.append(((x - 1) % 100, y))
-        if self.map_state[(x + 1) % 100][y] == 0:
-            out.append(((x + 1) % 100, y))
-
-        return out
-
     def is_square(self, current_percept):
         min_x, max_x, min_y, max_y = 100, -1, 100, -1
 
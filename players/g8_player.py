@@ -2,7 +2,13 @@ import os
 import pickle
 import numpy as np
 import logging
+from amoeba_kernels import free_neighbors
 from amoeba_state import AmoebaState
+from base_player import BasePlayer
+from cell_set import CellSet
+from assignment import assign_moves
+from formations import Formation, formation_cache
+from info_codec import InfoCodec
 from typing import Tuple, List, Dict
 import numpy.typing as npt
 import constants
@@ -21,6 +27,7 @@ CENTER_X = constants.map_dim // 2
 CENTER_Y = constants.map_dim // 2
 
 COMB_SEPARATION_DIST = 24
+FORMATION_VERSION = 2
 
 
 # ---------------------------------------------------------------------------- #
@@ -29,14 +36,11 @@ COMB_SEPARATION_DIST = 24
 
 
 def map_to_coords(amoeba_map: npt.NDArray) -> List[Tuple[int, int]]:
-    return list(map(tuple, np.transpose(amoeba_map.nonzero()).tolist()))
+    return CellSet.from_mask(amoeba_map).cells()
 
 
-def coords_to_map(coords: List[Tuple[int, int]], size=constants.map_dim) -> npt.NDArray:
-    amoeba_map = np.zeros((size, size), dtype=np.int8)
-    for x, y in coords:
-        amoeba_map[x, y] = 1
-    return amoeba_map
+def coords_to_map(coords: List[Tuple[int, int]]) -> npt.NDArray:
+    return CellSet.from_cells(coords).mask(np.int8)
 
 
 def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[]) -> None:
@@ -67,24 +71,20 @@ def show_amoeba_map(amoeba_map: npt.NDArray, retracts=[], extends=[]) -> None:
 # ---------------------------------------------------------------------------- #
 
 
+INFO_CODEC = InfoCodec(("initialized", 1), ("translating", 1))
+
+
 class MemoryFields(Enum):
     Initialized = 0
     Translating = 1
 
 
 def read_memory(memory: int) -> Dict[MemoryFields, bool]:
-    out = {}
-    for field in MemoryFields:
-        value = True if (memory & (1 << field.value)) >> field.value else False
-        out[field] = value
-    return out
+    return {field: bool(INFO_CODEC.get(memory, field.name.lower())) for field in MemoryFields}
 
 
 def change_memory_field(memory: int, field: MemoryFields, value: bool) -> int:
-    bit = 1 if value else 0
-    mask = 1 << field.value
-    # Unset the bit, then or in the new bit
-    return (memory & ~mask) | ((bit << field.value) & mask)
+    return INFO_CODEC.replace(memory, **{field.name.lower(): 1 if value else 0})
 
 
 if __name__ == "__main__":
@@ -115,27 +115,13 @@ if __name__ == "__main__":
 
 
 
-# ---------------------------------------------------------------------------- #
-#                               Formation Class                                #
-# ---------------------------------------------------------------------------- #
-
-class Formation:        
-    def __init__(self, initial_formation=None) -> None:
-        self.map = initial_formation if initial_formation else np.zeros((constants.map_dim, constants.map_dim), dtype=np.int8)
-    
-    def add_cell(self, x, y):
-        self.map[x % constants.map_dim, y % constants.map_dim] = 1
-    
-    def merge_formation(self, formation_map: npt.NDArray):
-        self.map = np.logical_or(self.map, formation_map)
-
-
-
 # ---------------------------------------------------------------------------- #
 #                               Main Player Class                              #
 # ---------------------------------------------------------------------------- #
 
-class Player:
+class Player(BasePlayer):
+    info_codec = INFO_CODEC
+
     def __init__(
         self,
         rng: np.random.Generator,
@@ -168,27 +154,21 @@ class Player:
         #     with open(precomp_path, 'wb') as f:
         #         pickle.dump([self.obj0, self.obj1, self.obj2], f)
 
-        self.rng = rng
-        self.logger = logger
-        self.metabolism = metabolism
-        self.goal_size = goal_size
-        self.current_size = goal_size / 4
+        super().__init__(rng, logger, metabolism, goal_size, precomp_dir)
 
         self.vertical_shift = 0
 
-        # Class accessible percept variables, written at the start of each turn
-        self.current_size: int = None
-        self.amoeba_map: npt.NDArray = None
-        self.bacteria_cells: List[Tuple[int, int]] = None
-        self.retractable_cells: List[Tuple[int, int]] = None
-        self.extendable_cells: List[Tuple[int, int]] = None
-        self.num_available_moves: int = None
+        self.formations = formation_cache("g8", precomp_dir, version=FORMATION_VERSION)
         
     def generate_comb_formation(self, size: int, tooth_offset=0, center_x=CENTER_X, center_y=CENTER_Y) -> npt.NDArray:
+        return self.formations.get(("comb", size, tooth_offset, center_x, center_y, COMB_SEPARATION_DIST),
+                                   lambda: self.build_comb_formation(size, tooth_offset, center_x, center_y))
+
+    def build_comb_formation(self, size: int, tooth_offset=0, center_x=CENTER_X, center_y=CENTER_Y) -> npt.NDArray:
         formation = Formation()
         
         if size < 2:
-            return formation.map
+            return formation.mask
 
         teeth_size = min((size // 6), 48) # new tooth for every 2 backbone
         # remaining_cells = size - teeth_size
@@ -228,28 +208,23 @@ class Player:
 
         #print("size: {}, backbone_size: {}, teeth_size: {}, divider_size: {}".format(size, backbone_size, teeth_size, divider))
 
-        formation.add_cell(center_x, center_y)
+        formation.add(center_x, center_y)
 
-        for i in range(1, divider // 2): # Adding the divider
-            formation.add_cell(center_x, center_y - i)
-            formation.add_cell(center_x, center_y + i)
-        
-        for i in range(1, math.ceil((backbone_size - 1) / 2 ) + 1): # Adding the two backbones
-            formation.add_cell(center_x - i, center_y - tooth_offset)
-            formation.add_cell(center_x + i, center_y + tooth_offset)
-            # formation.add_cell(center_x, center_y - i)
-            # formation.add_cell(center_x, center_y + i)
-
-        for i in range(1, (teeth_size // 2) + 1): # Adding the teeth
-            # formation.add_cell(center_x + (2 * i + tooth_offset), center_y + 1)
-            # formation.add_cell(center_x - (2 * i + tooth_offset), center_y - 1)
-            formation.add_cell(center_x + 2 * i, center_y + 1 + tooth_offset)
-            formation.add_cell(center_x - 2 * i, center_y - 1 - tooth_offset)
+        divider_cells = np.arange(1, divider // 2) # Adding the divider
+        formation.add(center_x, np.concatenate((center_y - divider_cells, center_y + divider_cells)))
+
+        backbone = np.arange(1, math.ceil((backbone_size - 1) / 2 ) + 1) # Adding the two backbones
+        formation.add(center_x - backbone, center_y - tooth_offset)
+        formation.add(center_x + backbone, center_y + tooth_offset)
+
+        teeth = 2 * np.arange(1, (teeth_size // 2) + 1) # Adding the teeth
+        formation.add(center_x + teeth, center_y + 1 + tooth_offset)
+        formation.add(center_x - teeth, center_y - 1 - tooth_offset)
 
         # global turn
         # if turn > 79:
-        #     show_amoeba_map(formation.map)
-        return formation.map
+        #     show_amoeba_map(formation.mask)
+        return formation.mask
 
     def get_morph_moves(
         self, desired_amoeba: npt.NDArray
@@ -258,44 +233,24 @@ class Player:
         to morph the amoeba shape towards the desired shape.
         """
 
-        current_points = map_to_coords(self.amoeba_map)
-        desired_points = map_to_coords(desired_amoeba)
-
-        potential_retracts = [
-            p
-            for p in list(set(current_points).difference(set(desired_points)))
-            if p in self.retractable_cells
-        ]
-        potential_extends = [
-            p
-            for p in list(set(desired_points).difference(set(current_points)))
-            if p in self.extendable_cells
-        ]
+        current_points = CellSet.from_mask(self.amoeba_map)
+        desired_points = CellSet.from_mask(desired_amoeba)
+
+        potential_retracts = current_points.difference(desired_points).intersection(
+            self.candidates.retractable_mask
+        ).cells()
+        potential_extends = desired_points.difference(current_points).intersection(
+            self.candidates.extendable_mask
+        ).cells()
         potential_extends.sort(key=lambda p: p[1])
 
         # show_amoeba_map(desired_amoeba, title="Desired Amoeba")
         # show_amoeba_map(self.amoeba_map, potential_retracts, potential_extends, title="Current Amoeba, Potential Retracts and Extends")
 
-        # Loop through potential extends, searching for a matching retract
-        retracts = []
-        extends = []
-        for potential_extend in [p for p in potential_extends]:
-            # Ensure we only move as much as possible given our current metabolism
-            if len(extends) >= self.num_available_moves:
-                break
-
-            matching_retracts = list(potential_retracts)
-            matching_retracts.sort(key=lambda p: math.dist(p, potential_extend))
-
-            for i in range(len(matching_retracts)):
-                retract = matching_retracts[i]
-                # Matching retract found, add the extend and retract to our lists
-                if self.check_move(retracts + [retract], extends + [potential_extend]):
-                    retracts.append(retract)
-                    potential_retracts.remove(retract)
-                    extends.append(potential_extend)
-                    potential_extends.remove(potential_extend)
-                    break
+        # Loop through potential extends, pairing each with the closest retract that keeps the move legal,
+        # while we have metabolism left
+        retracts, extends = assign_moves(potential_extends, potential_retracts, self.num_available_moves,
+                                         self.check_move)
 
         # If we have moves remaining, try and get closer to the desired formation
         # if len(extends) < self.num_available_moves and len(potential_retracts):
@@ -318,15 +273,19 @@ class Player:
         #                 break
 
         # show_amoeba_map(self.amoeba_map, retracts, extends, title="Current Amoeba, Selected Retracts and Extends")
+        self.overlay.push(retract=retracts, extend=extends, target=desired_points, label="morph")
         return retracts, extends
 
     def find_movable_cells(self, retract, periphery, amoeba_map, bacteria, mini):
         movable = []
+        seen = set()
+        bacteria = set(bacteria)
         new_periphery = list(set(periphery).difference(set(retract)))
         for i, j in new_periphery:
             nbr = self.find_movable_neighbor(i, j, amoeba_map, bacteria)
             for x, y in nbr:
-                if (x, y) not in movable:
+                if (x, y) not in seen:
+                    seen.add((x, y))
                     movable.append((x, y))
 
         movable += retract
@@ -355,15 +314,11 @@ class Player:
         if not set(retracts).issubset(set(self.retractable_cells)):
             return False
 
-        movable = retracts[:]
+        movable = set(retracts)
         new_periphery = list(set(self.retractable_cells).difference(set(retracts)))
-        for i, j in new_periphery:
-            nbr = self.find_movable_neighbor(i, j, self.amoeba_map, self.bacteria_cells)
-            for x, y in nbr:
-                if (x, y) not in movable:
-                    movable.append((x, y))
+        movable.update(free_neighbors(new_periphery, self.amoeba_map == 0))
 
-        if not set(extends).issubset(set(movable)):
+        if not set(extends).issubset(movable):
             return False
 
         amoeba = np.copy(self.amoeba_map)
@@ -404,16 +359,6 @@ class Player:
 
         return (amoeba == check).all()
 
-    def store_current_percept(self, current_percept: AmoebaState) -> None:
-        self.current_size = current_percept.current_size
-        self.amoeba_map = current_percept.amoeba_map
-        self.retractable_cells = current_percept.periphery
-        self.bacteria_cells = current_percept.bacteria
-        self.extendable_cells = current_percept.movable_cells
-        self.num_available_moves = int(
-            np.ceil(self.metabolism * current_percept.current_size)
-        )
-
     def move(
         self, last_percept: AmoebaState, current_percept: AmoebaState, info: int
     ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], int]:
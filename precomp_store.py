@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import constants
+from utils import save_npy_atomic
+
+
+class PrecompStore:
+    def __init__(self, precomp_dir, metabolism=None, goal_size=None, version=1, map_dim=constants.map_dim):
+        """Persistent store for precomputed arrays of a player, to be created from the precomp_dir passed to Player.
+
+            Arrays are kept as .npy files under a directory keyed by the store version, the metabolism, the goal size
+            and the map dimension, so a change of any of them never loads stale data. Loads are memory-mapped and
+            writes go through a temporary file and os.replace, so parallel games never read a partial file.
+
+            Args:
+                precomp_dir (str): directory path passed to the player
+                metabolism (float, optional): the percentage of amoeba cells, that can move, None if the arrays do
+                    not depend on it
+                goal_size (int, optional): the size the amoeba must reach, None if the arrays do not depend on it
+                version (int): bump to invalidate everything stored by an older version of the player
+                map_dim (int): length of a side of the map
+        """
+        parts = ["v{}".format(version)]
+        if metabolism is not None:
+            parts.append("m{}".format(metabolism))
+        if goal_size is not None:
+            parts.append("g{}".format(goal_size))
+        parts.append("d{}".format(map_dim))
+        self.path = os.path.join(precomp_dir, "_".join(parts))
+
+    def file(self, name):
+        return os.path.join(self.path, "{}.npy".format(name))
+
+    def has(self, name):
+        return os.path.isfile(self.file(name))
+
+    def load(self, name, mmap=True):
+        """Load a stored array, read-only and memory-mapped unless mmap is False."""
+        return np.load(self.file(name), mmap_mode="r" if mmap else None)
+
+    def save(self, name, array):
+        save_npy_atomic(self.file(name), np.asarray(array))
+
+    def get(self, name, build, mmap=True):
+        """Load the array stored under name, or compute it with build() and store it first."""
+        if not self.has(name):
+            self.save(name, build())
+        return self.load(name, mmap)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = PrecompStore(tmp_dir, 0.3, 400)
+        builds = []
+        array = store.get("obj0", lambda: builds.append(1) or np.arange(12).reshape(3, 4))
+        assert builds == [1] and store.has("obj0")
+        assert isinstance(array, np.memmap) and array.mode == "r" and not array.flags.writeable
+        assert np.array_equal(array, np.arange(12).reshape(3, 4))
+
+        # a new store on the same directory reads the array back without building it
+        again = PrecompStore(tmp_dir, 0.3, 400).get("obj0", lambda: builds.append(2) or np.zeros(1))
+        assert builds == [1] and np.array_equal(again, array)
+        assert np.array_equal(PrecompStore(tmp_dir, 0.3, 400).load("obj0", mmap=False), array)
+
+        # a new version, metabolism or goal size uses a directory of its own
+        for other in (PrecompStore(tmp_dir, 0.3, 400, version=2), PrecompStore(tmp_dir, 0.1, 400),
+                      PrecompStore(tmp_dir, 0.3, 900), PrecompStore(tmp_dir)):
+            assert other.path != store.path and not other.has("obj0")
+        assert PrecompStore(tmp_dir, 0.3, 400, version=2).get("obj0", lambda: np.zeros(2)).shape == (2,)
+        assert store.load("obj0").shape == (3, 4)
+    print("PrecompStore checks passed")
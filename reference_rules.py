@@ -0,0 +1,205 @@
+import math
+import numpy as np
+import constants
+
+
+class ReferenceRules:
+    """Frozen copy of the pure-Python game rules the engine started from, the reference of differential.py.
+
+        Do not optimize or otherwise change this class: every speedup of AmoebaRules and AmoebaFork is checked
+        against it, so it has to stay the rules exactly as they were. Subclasses provide map_state, bacteria (list of
+        tuples), rng, amoeba_size, metabolism and density, like they do for AmoebaRules.
+    """
+
+    def resolve_action(self, action, periphery):
+        if not self.check_action(action):
+            return constants.move_malformed
+
+        retract, move, self.player_byte = action
+        if not self.check_move(retract, move, periphery):
+            return constants.move_separated
+
+        self.amoeba_move(retract, move)
+        return constants.move_accepted
+
+    def find_indices(self, value):
+        result = np.where(self.map_state == value)
+        return list(zip(result[0], result[1]))
+
+    def bacteria_move(self):
+        for i, (x, y) in enumerate(self.bacteria):
+            avail = {'up': self.map_state[x][(y - 1) % constants.map_dim] == 0,
+                     'down': self.map_state[x][(y + 1) % constants.map_dim] == 0,
+                     'left': self.map_state[(x - 1) % constants.map_dim][y] == 0,
+                     'right': self.map_state[(x + 1) % constants.map_dim][y] == 0}
+            free_cells = [i for i in list(avail.keys()) if avail[i]]
+            move = None
+            if len(free_cells) == 2:
+                move = self.rng.choice(free_cells, replace=False)
+            elif len(free_cells) == 3:
+                if 'up' in free_cells and 'down' in free_cells:
+                    move = free_cells[-1]
+                else:
+                    move = free_cells[0]
+
+            if move:
+                self.map_state[x][y] = 0
+                if move == 'up':
+                    y = (y - 1) % constants.map_dim
+                elif move == 'down':
+                    y = (y + 1) % constants.map_dim
+                elif move == 'left':
+                    x = (x - 1) % constants.map_dim
+                else:
+                    x = (x + 1) % constants.map_dim
+
+                self.map_state[x][y] = -1
+                self.bacteria[i] = (x, y)
+
+    def get_periphery_info(self, edit):
+        periphery = self.find_indices(2)
+        eatable_bacteria = []
+        movable_cells = []
+        rem_idx = []
+        for i, j in periphery:
+            nbr = self.find_movable_neighbor(i, j)
+            rem = True
+            for x, y in nbr:
+                if (x, y) not in eatable_bacteria and (x, y) not in movable_cells:
+                    if self.map_state[x][y] == -1:
+                        eatable_bacteria.append((x, y))
+                    else:
+                        rem = False
+                        movable_cells.append((x, y))
+                elif self.map_state[x][y] == 0:
+                    rem = False
+
+            if rem and edit:
+                self.map_state[i][j] = 1
+                rem_idx.append((i, j))
+
+        periphery = list(set(periphery).difference(set(rem_idx)))
+
+        amoeba = np.copy(self.map_state)
+        amoeba[amoeba < 0] = 0
+        amoeba[amoeba > 0] = 1
+
+        return periphery, eatable_bacteria, movable_cells, amoeba
+
+    def find_movable_neighbor(self, x, y):
+        out = []
+        if self.map_state[x][(y - 1) % constants.map_dim] < 1:
+            out.append((x, (y - 1) % constants.map_dim))
+        if self.map_state[x][(y + 1) % constants.map_dim] < 1:
+            out.append((x, (y + 1) % constants.map_dim))
+        if self.map_state[(x - 1) % constants.map_dim][y] < 1:
+            out.append(((x - 1) % constants.map_dim, y))
+        if self.map_state[(x + 1) % constants.map_dim][y] < 1:
+            out.append(((x + 1) % constants.map_dim, y))
+
+        return out
+
+    def find_neighbor(self, x, y, val):
+        out = []
+        if self.map_state[x][(y - 1) % constants.map_dim] == val:
+            out.append((x, (y - 1) % constants.map_dim))
+        if self.map_state[x][(y + 1) % constants.map_dim] == val:
+            out.append((x, (y + 1) % constants.map_dim))
+        if self.map_state[(x - 1) % constants.map_dim][y] == val:
+            out.append(((x - 1) % constants.map_dim, y))
+        if self.map_state[(x + 1) % constants.map_dim][y] == val:
+            out.append(((x + 1) % constants.map_dim, y))
+
+        return out
+
+    def eat_bacteria(self, bacteria):
+        for i, j in bacteria:
+            self.bacteria.remove((i, j))
+            self.map_state[i][j] = 2
+            self.amoeba_size += 1
+
+    def check_action(self, action):
+        if not action:
+            return False
+        if type(action) is not tuple:
+            return False
+        if len(action) != 3:
+            return False
+        if type(action[2]) is not int:
+            return False
+        if action[2] < 0 or action[2] >= 256:
+            return False
+        if type(action[0]) is not list or type(action[1]) is not list:
+            return False
+        if len(action[0]) != len(set(action[0])) or len(action[1]) != len(set(action[1])):
+            return False
+        if len(action[0]) != len(action[1]) or len(action[0]) > math.ceil(self.metabolism * self.amoeba_size):
+            return False
+
+        return True
+
+    def check_move(self, retract, move, periphery):
+        if not set(retract).issubset(set(periphery)):
+            return False
+
+        movable = retract[:]
+        new_periphery = list(set(periphery).difference(set(retract)))
+        for i, j in new_periphery:
+            nbr = self.find_movable_neighbor(i, j)
+            for x, y in nbr:
+                if (x, y) not in movable:
+                    movable.append((x, y))
+
+        if not set(move).issubset(set(movable)):
+            return False
+
+        amoeba = np.copy(self.map_state)
+        amoeba[amoeba < 0] = 0
+        amoeba[amoeba > 0] = 1
+
+        for i, j in retract:
+            amoeba[i][j] = 0
+
+        for i, j in move:
+            amoeba[i][j] = 1
+
+        tmp = np.where(amoeba == 1)
+        result = list(zip(tmp[0], tmp[1]))
+        check = np.zeros((constants.map_dim, constants.map_dim), dtype=int)
+
+        stack = result[0:1]
+        while len(stack):
+            a, b = stack.pop()
+            check[a][b] = 1
+
+            if (a, (b - 1) % constants.map_dim) in result and check[a][(b - 1) % constants.map_dim] == 0:
+                stack.append((a, (b - 1) % constants.map_dim))
+            if (a, (b + 1) % constants.map_dim) in result and check[a][(b + 1) % constants.map_dim] == 0:
+                stack.append((a, (b + 1) % constants.map_dim))
+            if ((a - 1) % constants.map_dim, b) in result and check[(a - 1) % constants.map_dim][b] == 0:
+                stack.append(((a - 1) % constants.map_dim, b))
+            if ((a + 1) % constants.map_dim, b) in result and check[(a + 1) % constants.map_dim][b] == 0:
+                stack.append(((a + 1) % constants.map_dim, b))
+
+        return (amoeba == check).all()
+
+    def amoeba_move(self, retract, move):
+        for i, j in retract:
+            self.map_state[i][j] = 0
+            nbr = self.find_neighbor(i, j, 1)
+            for x, y in nbr:
+                self.map_state[x][y] = 2
+
+        for i, j in move:
+            self.map_state[i][j] = 2
+            nbr = self.find_neighbor(i, j, 2)
+            for x, y in nbr:
+                if len(self.find_movable_neighbor(x, y)) == 0:
+                    self.map_state[x][y] = 1
+
+    def add_bacteria(self):
+        new_bacteria = [tuple(i) for i in self.rng.choice(self.find_indices(0), replace=False, size=math.floor(
+            self.density * (constants.total_cells - self.amoeba_size)) - len(self.bacteria))]
+        self.bacteria += new_bacteria
+        for i, j in new_bacteria:
+            self.map_state[i][j] = -1
@@ -0,0 +1,81 @@
+import hashlib
+import numpy as np
+import constants
+
+stall_reasons = {
+    constants.game_stall_size: "amoeba size did not change",
+    constants.game_stall_repeat: "amoeba layout repeated",
+    constants.game_stall_invalid: "moves kept getting rejected",
+}
+
+
+class StallDetector:
+    def __init__(self, stall_turns=0, repeat_limit=0, invalid_turns=0):
+        """Ends a game early when the amoeba stops making progress, a limit of 0 disables the detector.
+
+            Args:
+                stall_turns (int): end the game if the size did not change for this many turns
+                repeat_limit (int): end the game if the same amoeba layout is seen this many times
+                invalid_turns (int): end the game if this many moves in a row were rejected
+        """
+        self.stall_turns = stall_turns
+        self.repeat_limit = repeat_limit
+        self.invalid_turns = invalid_turns
+
+        self.last_size = None
+        self.turns_without_growth = 0
+        self.seen_layouts = {}
+        self.invalid_streak = 0
+
+    def enabled(self):
+        return bool(self.stall_turns or self.repeat_limit or self.invalid_turns)
+
+    def update(self, amoeba_size, map_state, move_status):
+        """Record the state after a turn.
+
+            Args:
+                amoeba_size (int): size of the amoeba after the turn
+                map_state (numpy array): board after the turn
+                move_status (int): outcome of resolving the move of the turn
+            Returns:
+                int: constants.game_stall_size, game_stall_repeat or game_stall_invalid if the game stalled,
+                    None otherwise
+        """
+        if self.stall_turns:
+            if amoeba_size == self.last_size:
+                self.turns_without_growth += 1
+            else:
+                self.turns_without_growth = 0
+            self.last_size = amoeba_size
+            if self.turns_without_growth >= self.stall_turns:
+                return constants.game_stall_size
+
+        if self.repeat_limit:
+            # bacteria keep moving, so only the amoeba cells are compared, the digest is stable across processes
+            # so that it can be checkpointed
+            layout = hashlib.blake2b(np.packbits(map_state > 0).tobytes(), digest_size=16).hexdigest()
+            self.seen_layouts[layout] = self.seen_layouts.get(layout, 0) + 1
+            if self.seen_layouts[layout] >= self.repeat_limit:
+                return constants.game_stall_repeat
+
+        if self.invalid_turns:
+            if move_status == constants.move_accepted:
+                self.invalid_streak = 0
+            else:
+                self.invalid_streak += 1
+            if self.invalid_streak >= self.invalid_turns:
+                return constants.game_stall_invalid
+
+        return None
+
+    def get_state(self):
+        """Counters of the detector as a JSON serializable dict, see set_state."""
+        return {"last_size": self.last_size, "turns_without_growth": self.turns_without_growth,
+                "seen_layouts": self.seen_layouts, "invalid_streak": self.invalid_streak}
+
+    def set_state(self, state):
+        """Restore the counters saved by get_state, the limits stay the ones the detector was created with."""
+        self.last_size = state["last_size"]
+        self.turns_without_growth = state["turns_without_growth"]
+        self.seen_layouts = dict(state["seen_layouts"])
+        self.invalid_streak = state["invalid_streak"]
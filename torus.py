@@ -0,0 +1,63 @@
+import numpy as np
+import constants
+from occupancy import circular_extent
+
+
+def unwrap(values, low, n=constants.map_dim):
+    """Coordinates moved by whole turns of the torus into [low, low + n)."""
+    return (np.asarray(values) - low) % n + low
+
+
+def line_mean(weights):
+    """Weighted mean position along a line of the torus, taken inside the shortest arc holding every weighted position
+    so that a group of cells crossing the border is not averaged to the middle of the map.
+
+        Args:
+            weights (numpy array): weight of every position of the line, e.g. the number of cells in each column
+        Returns:
+            float: mean position in [0, len(weights)), None if every weight is 0
+    """
+    weights = np.asarray(weights)
+    extent = circular_extent(weights > 0)
+    if extent is None:
+        return None
+    n = len(weights)
+    return float(np.average(unwrap(np.arange(n), extent[0], n), weights=weights)) % n
+
+
+def projections(cells):
+    """Number of cells in every column (x) and every row (y) of the map."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    return (np.bincount(cells[:, 0], minlength=constants.map_dim),
+            np.bincount(cells[:, 1], minlength=constants.map_dim))
+
+
+def bounds(cells):
+    """Smallest bounding box of the cells on the torus.
+
+        Args:
+            cells (List[Tuple[int, int]]): cells, a list of tuples or an (N, 2) array
+        Returns:
+            Tuple[Tuple[int, int], Tuple[int, int]]: ((low x, high x), (low y, high y)), a high value past the end of
+                the map means the box crosses the border (see occupancy.circular_extent), None if there are no cells
+    """
+    columns, rows = projections(cells)
+    if not columns.any():
+        return None
+    return circular_extent(columns > 0), circular_extent(rows > 0)
+
+
+def centroid(cells):
+    """Mean (x, y) of the cells on the torus, see line_mean, None if there are no cells."""
+    columns, rows = projections(cells)
+    if not columns.any():
+        return None
+    return line_mean(columns), line_mean(rows)
+
+
+def unwrap_cells(cells, box):
+    """Cells as an (N, 2) array with the coordinates moved into the bounding box returned by bounds, so that plain
+    differences and comparisons between them hold across the border."""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    (low_x, _), (low_y, _) = box
+    return np.stack((unwrap(cells[:, 0], low_x), unwrap(cells[:, 1], low_y)), axis=1)
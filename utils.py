@@ -1,6 +1,8 @@
+import os
 import logging
 import unicodedata
 import re
+import numpy as np
 
 
 def slugify(value, allow_unicode=False):
@@ -60,3 +62,25 @@ def isiterable(obj):
 
 def count_iterable(i):
     return sum(1 for e in i)
+
+
+def save_npz_atomic(path, **arrays):
+    """Write a compressed .npz file through a temporary file, so concurrent readers never see a partial file."""
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def save_npy_atomic(path, array):
+    """Write a .npy file through a temporary file, so concurrent readers never see a partial file."""
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)